@@ -9,3 +9,23 @@ REDIS_URL = f"redis://{os.environ.get('REDIS_HOST', 'redis')}:{os.environ.get('R
 
 LANGGRAPH_SERVICE_URL = os.environ.get("LANGGRAPH_SERVICE_URL", "http://langgraph-service:8003")
 SERVICE_API_KEY = os.environ.get("SERVICE_API_KEY", "default-orchestrator-key")  # used to call LangGraph
+
+# Handshake header naming the caller's tenant, set by the authenticating gateway in front of /ws
+# (LangGraph admission fairness); without it each session is its own tenant
+TENANT_HEADER = os.environ.get("TENANT_HEADER", "x-tenant-id")
+
+# Redis ring buffer of recent messages per session (prompt assembly)
+HISTORY_RECENT_MESSAGES = int(os.environ.get("HISTORY_RECENT_MESSAGES", 40))
+HISTORY_TTL_SECONDS = int(os.environ.get("HISTORY_TTL_SECONDS", 86400))
+
+# Multi-node WebSockets: session ownership registry + pub/sub routing in Redis
+MULTI_NODE = os.environ.get("MULTI_NODE", "false").lower() == "true"
+
+# In-process retrieval (rag_engine.RAGEngine): results are sent to LangGraph with the request
+RAG_IN_PROCESS = os.environ.get("RAG_IN_PROCESS", "true").lower() == "true"
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", 5))
+RAG_MAX_CONCURRENCY = int(os.environ.get("RAG_MAX_CONCURRENCY", 4))  # concurrent embed + search threads
+RAG_PRELOAD_NAMESPACES = [n.strip() for n in os.environ.get("RAG_PRELOAD_NAMESPACES", "").split(",") if n.strip()]
+# Background cosine used to calibrate match scores when a namespace has no document index
+# (mean-pooled BioBERT cosines between unrelated texts sit around this value)
+RAG_SCORE_BASELINE = float(os.environ.get("RAG_SCORE_BASELINE", 0.8))
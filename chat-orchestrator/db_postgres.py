@@ -1,14 +1,17 @@
 # chat-orchestrator/db_postgres.py
-from typing import Optional, List
+import base64
+from datetime import datetime
+from typing import Optional, List, Tuple
 
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy import select, update
+from sqlalchemy import select, update, tuple_
 
 from model import Base, ChatSession, ChatMessage, UploadedFile
+from message_writer import MessageWriter, SessionIdCache, resolve_session_ids
 
 
 class AsyncPostgresDB:
@@ -17,7 +20,7 @@ class AsyncPostgresDB:
     Used ONLY by chat-orchestrator.
     """
 
-    def __init__(self, dsn: str):
+    def __init__(self, dsn: str, write_batch_size: int = 200, write_interval: float = 0.2):
         self._engine = create_async_engine(
             dsn,
             echo=False,
@@ -28,6 +31,13 @@ class AsyncPostgresDB:
             class_=AsyncSession,
             expire_on_commit=False,
         )
+        self._session_ids = SessionIdCache()
+        self._writer = MessageWriter(
+            self._sessionmaker,
+            self._session_ids,
+            batch_size=write_batch_size,
+            interval=write_interval,
+        )
 
     async def init_db(self):
         """
@@ -36,10 +46,17 @@ class AsyncPostgresDB:
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
+    def start_writer(self):
+        """
+        Start the background chat message writer (call from the app lifespan).
+        """
+        self._writer.start()
+
     async def close(self):
         """
-        Dispose the async database engine.
+        Flush buffered chat messages and dispose the async database engine.
         """
+        await self._writer.stop()
         await self._engine.dispose()
 
     async def get_or_create_session(self, session_key: str) -> ChatSession:
@@ -47,19 +64,22 @@ class AsyncPostgresDB:
         Retrieve a ChatSession by session_id, or create one if it does not exist.
         """
         async with self._sessionmaker() as session:
-            result = await session.execute(
-                select(ChatSession).where(ChatSession.session_id == session_key)
-            )
-            chat_session = result.scalar_one_or_none()
-
-            if chat_session:
-                return chat_session
-
-            chat_session = ChatSession(session_id=session_key)
-            session.add(chat_session)
+            ids = await resolve_session_ids(session, [session_key], self._session_ids)
             await session.commit()
-            await session.refresh(chat_session)
-            return chat_session
+            return await session.get(ChatSession, ids[session_key])
+
+    def enqueue_message(
+        self,
+        session_key: str,
+        role: str,
+        content: str,
+        meta: Optional[dict] = None,
+    ):
+        """
+        Queue a chat message for the background writer. Never blocks;
+        the message is persisted with the next batch.
+        """
+        self._writer.enqueue(session_key, role, content, meta)
 
     async def save_message(
         self,
@@ -69,13 +89,13 @@ class AsyncPostgresDB:
         meta: Optional[dict] = None,
     ):
         """
-        Persist a single chat message associated with a session.
+        Persist a single chat message associated with a session, synchronously.
         """
         async with self._sessionmaker() as session:
-            chat_session = await self.get_or_create_session(session_key)
+            ids = await resolve_session_ids(session, [session_key], self._session_ids)
 
             msg = ChatMessage(
-                session_id=chat_session.id,
+                session_id=ids[session_key],
                 role=role,
                 content=content,
                 meta=meta,
@@ -83,24 +103,53 @@ class AsyncPostgresDB:
             session.add(msg)
             await session.commit()
 
+    def writer_stats(self) -> dict:
+        return self._writer.stats()
+
     async def get_history(
         self,
         session_key: str,
         limit: int = 50,
     ) -> List[dict]:
         """
-        Retrieve ordered chat history for a session.
+        Retrieve the most recent `limit` messages for a session, oldest first.
+        """
+        page, _ = await self.get_history_page(session_key, limit=limit)
+        return list(reversed(page))
+
+    async def get_history_page(
+        self,
+        session_key: str,
+        before: Optional[str] = None,
+        limit: int = 50,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Keyset-paginated history, newest first.
+        `before` is the opaque cursor returned by the previous page; the
+        returned cursor is None when there are no older messages.
+        Served by the (session_id, created_at, id) index on chat_messages.
         """
         async with self._sessionmaker() as session:
-            result = await session.execute(
+            query = (
                 select(ChatMessage)
                 .join(ChatSession)
                 .where(ChatSession.session_id == session_key)
-                .order_by(ChatMessage.created_at.asc())
-                .limit(limit)
+            )
+            if before:
+                created_at, msg_id = _decode_cursor(before)
+                query = query.where(
+                    tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, msg_id)
+                )
+            result = await session.execute(
+                query
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                .limit(limit + 1)
             )
 
             rows = result.scalars().all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]) if has_more else None
 
             return [
                 {
@@ -110,7 +159,7 @@ class AsyncPostgresDB:
                     "created_at": r.created_at.isoformat(),
                 }
                 for r in rows
-            ]
+            ], next_cursor
 
     async def save_uploaded_file(
         self,
@@ -151,3 +200,13 @@ class AsyncPostgresDB:
                 .values(status=status)
             )
             await session.commit()
+
+
+def _encode_cursor(msg: ChatMessage) -> str:
+    raw = f"{msg.created_at.isoformat()}|{msg.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    created_at, msg_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+    return datetime.fromisoformat(created_at), int(msg_id)
@@ -0,0 +1,127 @@
+# chat-orchestrator/idle_monitor.py
+# Deadline min-heap for idle-session warnings and timeouts
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+
+class SessionState:
+    """All per-connection state in one compact record."""
+    __slots__ = ("session_id", "ws", "last_active", "last_warning", "due")
+
+    def __init__(self, session_id: str, ws: WebSocket, now: float):
+        self.session_id = session_id
+        self.ws = ws
+        self.last_active = now          # monotonic seconds
+        self.last_warning: Optional[int] = None
+        self.due: Optional[float] = None  # due time of this record's live heap entry
+
+
+class IdleMonitor:
+    """
+    Wakes only when a session is due a warning or a close.
+
+    Each session has at most one live heap entry. touch() is O(1): it only
+    moves last_active forward. When a stale entry fires, the record is
+    re-pushed at its real next deadline (O(log n)); entries for removed or
+    replaced records are skipped on pop.
+
+    Schedule per session (defaults): warnings at 30, 25, ... 5 seconds
+    before the idle timeout, then close.
+    """
+
+    def __init__(self, idle_timeout: float, warning_seconds: int, warning_interval: int,
+                 clock: Callable[[], float] = time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.warning_seconds = warning_seconds
+        self.warning_interval = warning_interval
+        self._clock = clock
+        self.sessions: Dict[str, SessionState] = {}
+        self._heap: List[Tuple[float, int, SessionState]] = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._io_tasks: Set[asyncio.Task] = set()
+
+    def add(self, session_id: str, ws: WebSocket) -> SessionState:
+        now = self._clock()
+        rec = SessionState(session_id, ws, now)
+        self.sessions[session_id] = rec
+        self._schedule(rec, now + self.idle_timeout - self.warning_seconds)
+        return rec
+
+    def touch(self, session_id: str):
+        rec = self.sessions.get(session_id)
+        if rec is not None:
+            rec.last_active = self._clock()
+            rec.last_warning = None
+
+    def remove(self, session_id: str, ws: Optional[WebSocket] = None) -> Optional[SessionState]:
+        """Drop a session; with `ws`, only if it still belongs to that socket (reconnects)."""
+        rec = self.sessions.get(session_id)
+        if rec is None or (ws is not None and rec.ws is not ws):
+            return None
+        del self.sessions[session_id]
+        rec.due = None
+        return rec
+
+    def _schedule(self, rec: SessionState, due: float):
+        rec.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), rec))
+        if self._heap[0][2] is rec:
+            self._wake.set()
+
+    async def run(
+        self,
+        on_warning: Callable[[SessionState, int], Awaitable[None]],
+        on_timeout: Callable[[SessionState], Awaitable[None]],
+    ):
+        while True:
+            now = self._clock()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, rec = heapq.heappop(self._heap)
+                if self.sessions.get(rec.session_id) is not rec or rec.due != due:
+                    continue  # stale entry
+                self._fire(rec, now, on_warning, on_timeout)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, rec: SessionState, now: float, on_warning, on_timeout):
+        close_at = rec.last_active + self.idle_timeout
+        remaining = close_at - now
+
+        if remaining <= 0:
+            self.remove(rec.session_id)
+            self._spawn(on_timeout(rec))
+            return
+
+        if remaining <= self.warning_seconds:
+            secs = int(round(remaining))
+            if secs > 0 and secs != rec.last_warning:
+                rec.last_warning = secs
+                self._spawn(on_warning(rec, secs))
+            # next point on the warning grid (close_at - k * interval), or the close itself
+            steps = math.floor((remaining - 1e-6) / self.warning_interval)
+            self._schedule(rec, close_at - steps * self.warning_interval)
+        else:
+            # activity moved the deadline; sleep until the first warning
+            self._schedule(rec, close_at - self.warning_seconds)
+
+    def _spawn(self, coro):
+        # socket I/O runs outside the timer loop so one slow client cannot delay the rest
+        task = asyncio.create_task(coro)
+        self._io_tasks.add(task)
+        task.add_done_callback(self._io_tasks.discard)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self.sessions), "timer_entries": len(self._heap)}
@@ -1,31 +1,84 @@
 import os
 import asyncio
-from fastapi import FastAPI
+import logging
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query
 from contextlib import asynccontextmanager
 from websocket_manager import WebSocketManager
 from db_postgres import AsyncPostgresDB
+from recent_history import RecentHistory
 from rag_engine import RAGEngine
-from config import POSTGRES_DSN, REDIS_URL
+from config import POSTGRES_DSN, REDIS_URL, HISTORY_RECENT_MESSAGES, HISTORY_TTL_SECONDS, MULTI_NODE
 import uvicorn
 
+logger = logging.getLogger(__name__)
+
 class AppServer:
     def __init__(self, db_dsn=None, redis_url=REDIS_URL):
         self.app = FastAPI(lifespan=self._lifespan)
         self.db = AsyncPostgresDB(dsn=db_dsn or POSTGRES_DSN)
         self.rag = RAGEngine(redis_url=redis_url)
-        self.websocket_manager = WebSocketManager(db=self.db, rag=self.rag)
+        self.history = RecentHistory(
+            redis_url,
+            db=self.db,
+            max_messages=HISTORY_RECENT_MESSAGES,
+            ttl_seconds=HISTORY_TTL_SECONDS,
+        )
+        self.websocket_manager = WebSocketManager(
+            db=self.db,
+            rag=self.rag,
+            history=self.history,
+            redis_url=redis_url if MULTI_NODE else None,
+        )
         self.websocket_manager.setup_routes(self.app)
+        self._setup_routes()
+
+    def _setup_routes(self):
+        @self.app.get("/sessions/{session_id}/history")
+        async def session_history(
+            session_id: str,
+            before: Optional[str] = None,
+            limit: int = Query(50, ge=1, le=200),
+        ):
+            """
+            Scroll back through a session, newest first.
+            Pass the returned next_cursor as `before` to fetch older messages.
+            """
+            try:
+                messages, next_cursor = await self.db.get_history_page(session_id, before=before, limit=limit)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            return {"messages": messages, "next_cursor": next_cursor}
+
+        @self.app.get("/stats/message_writer")
+        async def message_writer_stats():
+            return self.db.writer_stats()
+
+        @self.app.get("/stats/rag_engine")
+        async def rag_engine_stats():
+            return self.rag.stats() if self.rag else {"enabled": False}
 
     @asynccontextmanager
     async def _lifespan(self, app: FastAPI):
         await self.db.init_db()
+        self.db.start_writer()
         try:
             await self.rag.init_redis()
             await self.rag.load_index()
         except FileNotFoundError:
             print("⚠️ No existing RAG index found.")
+        except Exception:
+            # model or index unusable: run without in-process retrieval, LangGraph retrieves
+            logger.exception("In-process RAG failed to start; LangGraph will do retrieval")
+            await self.rag.close()
+            self.rag = self.websocket_manager.rag = None
+        await self.websocket_manager.start()
         asyncio.create_task(self.websocket_manager.monitor_idle_sessions())
         yield
+        await self.websocket_manager.close()
+        if self.rag:
+            await self.rag.close()
+        await self.history.close()
         await self.db.close()
 
     def run(self, host="0.0.0.0", port=8000):
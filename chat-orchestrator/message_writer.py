@@ -0,0 +1,240 @@
+# chat-orchestrator/message_writer.py
+# Write-behind batched persistence of chat messages
+
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import exc, select
+from sqlalchemy.dialects.postgresql import insert
+
+from model import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# errors that say the database is unreachable, not that a row is bad
+_OUTAGE_ERRORS = (OSError, asyncio.TimeoutError, exc.OperationalError, exc.InterfaceError,
+                  exc.DisconnectionError, exc.TimeoutError)
+
+
+def _is_outage(e: Exception) -> bool:
+    return isinstance(e, _OUTAGE_ERRORS) or getattr(e, "connection_invalidated", False)
+
+
+async def resolve_session_ids(session, session_keys: Iterable[str], cache: "SessionIdCache") -> Dict[str, int]:
+    """
+    Map session keys to chat_sessions.id, creating missing rows with one
+    INSERT ... ON CONFLICT DO NOTHING and one SELECT. Known ids come from cache.
+    """
+    keys = set(session_keys)
+    ids = {k: cache.get(k) for k in keys}
+    missing = [k for k, v in ids.items() if v is None]
+    if missing:
+        await session.execute(
+            insert(ChatSession)
+            .values([{"session_id": k, "created_at": datetime.now(timezone.utc)} for k in missing])
+            .on_conflict_do_nothing(index_elements=["session_id"])
+        )
+        result = await session.execute(
+            select(ChatSession.session_id, ChatSession.id).where(ChatSession.session_id.in_(missing))
+        )
+        for key, pk in result.all():
+            ids[key] = pk
+            cache.put(key, pk)
+    return ids
+
+
+class SessionIdCache:
+    """Bounded LRU of session key -> chat_sessions.id."""
+    def __init__(self, max_size: int = 100_000):
+        self._data: "OrderedDict[str, int]" = OrderedDict()
+        self._max_size = max_size
+
+    def get(self, key: str) -> Optional[int]:
+        pk = self._data.get(key)
+        if pk is not None:
+            self._data.move_to_end(key)
+        return pk
+
+    def put(self, key: str, pk: int):
+        self._data[key] = pk
+        self._data.move_to_end(key)
+        if len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+
+    def discard(self, key: str):
+        self._data.pop(key, None)
+
+
+class MessageWriter:
+    """
+    Buffers chat messages and writes them in multi-row INSERTs from a
+    background task, every `interval` seconds or as soon as `batch_size`
+    messages are pending. enqueue() never blocks the caller; when
+    `max_pending` messages are already buffered (database down) new ones
+    are dropped and counted.
+
+    A failed batch stays at the head of the buffer and is retried, with
+    its cached session ids forgotten (the session may have been deleted).
+    After `max_retries` failures that are not an outage, the batch is
+    bisected so the rows the database rejects (e.g. a NUL byte in the
+    content) are logged and dropped instead of blocking everything behind
+    them. stop() flushes everything still buffered.
+    """
+
+    def __init__(self, sessionmaker, session_ids: SessionIdCache,
+                 batch_size: int = 200, interval: float = 0.2,
+                 max_pending: int = 50_000, max_retries: int = 3):
+        self._sessionmaker = sessionmaker
+        self._session_ids = session_ids
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._buffer: List[dict] = []
+        self._retries = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.flushed_messages = 0
+        self.flushed_batches = 0
+        self.failed_batches = 0
+        self.dropped_messages = 0  # buffer full
+        self.dead_lettered = 0  # rejected by the database
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, session_key: str, role: str, content: str, meta: Optional[dict] = None):
+        if len(self._buffer) >= self.max_pending:
+            if not self.dropped_messages % 1000:
+                logger.error(f"Chat message buffer full ({self.max_pending}); dropping new messages")
+            self.dropped_messages += 1
+            return
+        # timestamp at enqueue time so history order reflects the conversation
+        self._buffer.append({
+            "session_key": session_key,
+            "role": role,
+            "content": content,
+            "meta": meta,
+            "created_at": datetime.now(timezone.utc),
+        })
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer and not self._stopping:
+                if not await self._flush_once():
+                    await asyncio.sleep(min(self.interval * 5, 2.0))
+                    break
+
+    async def _flush_once(self) -> bool:
+        batch = self._buffer[: self.batch_size]
+        error = await self._write(batch)
+        if error is None:
+            self._retries = 0
+            del self._buffer[: len(batch)]
+            return True
+
+        self._retries += 1
+        if self._retries < self.max_retries or _is_outage(error):
+            logger.error(f"Chat message batch of {len(batch)} failed, will retry: {error}")
+            return False
+        logger.error(f"Chat message batch of {len(batch)} failed {self._retries} times, "
+                     f"isolating rejected rows: {error}")
+        self._retries = 0
+        handled = await self._isolate(batch)
+        # only the head of the buffer is ours; enqueue() may have appended meanwhile
+        self._buffer[: len(batch)] = [m for m in batch if id(m) not in handled]
+        return len(handled) == len(batch)
+
+    async def _isolate(self, batch: List[dict]) -> set:
+        """
+        Write `batch` in halves, recursing into the halves that fail, until
+        the failing rows are single and can be dead-lettered. Stops at the
+        first outage error. Returns the ids of the rows written or dropped.
+        """
+        handled = set()
+
+        async def write(rows: List[dict]) -> bool:
+            error = await self._write(rows)
+            if error is None:
+                handled.update(id(m) for m in rows)
+                return True
+            if _is_outage(error):
+                return False
+            if len(rows) == 1:
+                m = rows[0]
+                self.dead_lettered += 1
+                handled.add(id(m))
+                logger.error(f"Dropping chat message rejected by the database ({error}): "
+                             f"session={m['session_key']!r} role={m['role']!r} content={m['content'][:200]!r}")
+                return True
+            mid = len(rows) // 2
+            return await write(rows[:mid]) and await write(rows[mid:])
+
+        await write(batch)
+        return handled
+
+    async def _write(self, batch: List[dict]) -> Optional[Exception]:
+        """INSERT one batch in its own transaction; the error if it failed."""
+        try:
+            async with self._sessionmaker() as session:
+                ids = await resolve_session_ids(session, (m["session_key"] for m in batch), self._session_ids)
+                await session.execute(
+                    insert(ChatMessage).values([
+                        {
+                            "session_id": ids[m["session_key"]],
+                            "role": m["role"],
+                            "content": m["content"],
+                            "meta": m["meta"],
+                            "created_at": m["created_at"],
+                        }
+                        for m in batch
+                    ])
+                )
+                await session.commit()
+        except Exception as e:
+            self.failed_batches += 1
+            for m in batch:
+                self._session_ids.discard(m["session_key"])
+            return e
+
+        self.flushed_messages += len(batch)
+        self.flushed_batches += 1
+        return None
+
+    async def stop(self):
+        """Stop the background task and flush whatever is still buffered."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        failures = 0
+        while self._buffer and failures < 3:
+            if not await self._flush_once():
+                failures += 1
+        if self._buffer:
+            logger.error(f"Dropping {len(self._buffer)} unflushed chat messages on shutdown")
+            self._buffer.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._buffer),
+            "flushed_messages": self.flushed_messages,
+            "flushed_batches": self.flushed_batches,
+            "failed_batches": self.failed_batches,
+            "dropped_messages": self.dropped_messages,
+            "dead_lettered": self.dead_lettered,
+        }
@@ -9,6 +9,7 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     JSON,
+    Index,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -60,6 +61,11 @@ class ChatMessage(Base):
 
     session = relationship("ChatSession", back_populates="messages")
 
+    # keyset pagination over a session's history: (session_id, created_at, id)
+    __table_args__ = (
+        Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),
+    )
+
 
 class UploadedFile(Base):
     __tablename__ = "uploaded_files"
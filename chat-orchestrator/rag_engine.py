@@ -0,0 +1,234 @@
+# chat-orchestrator/rag_engine.py
+# In-process retrieval over the vector partitions written by the ingestion worker
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import redis.asyncio as redis
+
+from config import RAG_IN_PROCESS, RAG_MAX_CONCURRENCY, RAG_PRELOAD_NAMESPACES, RAG_SCORE_BASELINE, RAG_TOP_K
+
+try:
+    from embedding_service import biobert_embedder
+    from embedding_service.partitions import INDEX_UPDATES_CHANNEL
+    RAG_ENGINE_AVAILABLE = True
+except ImportError:  # orchestrator image built without the embedding stack
+    biobert_embedder = None
+    INDEX_UPDATES_CHANNEL = "index_updates"
+    RAG_ENGINE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class RAGEngine:
+    """
+    Retrieves chunks inside the orchestrator process (BioBERT query
+    embedding + FAISS/BM25 search + on-disk chunk store, see
+    embedding_service.biobert_embedder) and hands the matches to LangGraph
+    in the request, instead of LangGraph calling the RAG service.
+
+    Embedding and search are CPU-bound, so they run in worker threads,
+    at most `max_concurrency` at a time. Partitions reload when their files
+    change; the ingestion worker also announces every index write on
+    INDEX_UPDATES_CHANNEL, and partitions this process holds are reloaded
+    right away so the next query does not pay for it.
+
+    search() returns None whenever in-process retrieval is unavailable
+    (disabled, not loaded, no vectors for the namespace, failed); LangGraph
+    then retrieves as before.
+    """
+
+    def __init__(self, redis_url: str, top_k: int = RAG_TOP_K,
+                 max_concurrency: int = RAG_MAX_CONCURRENCY,
+                 preload_namespaces: Optional[List[str]] = None):
+        self.redis_url = redis_url
+        self.top_k = top_k
+        self.preload_namespaces = RAG_PRELOAD_NAMESPACES if preload_namespaces is None else preload_namespaces
+        self.enabled = RAG_IN_PROCESS and RAG_ENGINE_AVAILABLE
+        self.ready = False
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+        self.searches = 0
+        self.errors = 0
+        self.misses = 0  # namespaces with no local vectors, left to the RAG service
+        self.reloads = 0
+        self.listener_errors = 0
+        self.seconds_total = 0.0
+        self.recent = deque(maxlen=500)
+
+    async def init_redis(self):
+        if not self.enabled:
+            return
+        self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        # subscribes (and resubscribes after Redis errors) in the background
+        self._listener = asyncio.create_task(self._listen())
+
+    async def load_index(self):
+        """
+        Load the embedding model and the global + preconfigured namespace
+        partitions. Raises FileNotFoundError when none of them has vectors
+        yet; the engine is still ready, loading partitions on first use and
+        returning None for namespaces that have none.
+        """
+        if not self.enabled:
+            logger.info(f"In-process RAG disabled (RAG_IN_PROCESS={RAG_IN_PROCESS}, available={RAG_ENGINE_AVAILABLE})")
+            return
+        await asyncio.to_thread(biobert_embedder.load_model)
+        loaded = [ns for ns in [None, *self.preload_namespaces]
+                  if await asyncio.to_thread(biobert_embedder.preload, ns)]
+        self.ready = True
+        if not loaded:
+            raise FileNotFoundError("No vector index found")
+        logger.info(f"RAGEngine ready; preloaded namespaces: {[ns or '_global' for ns in loaded]}")
+
+    async def embed(self, query: str) -> Optional[List[float]]:
+        """
+        BioBERT query vector, computed once per message and shared by the
+        semantic cache lookup, retrieval (search(query_vec=...)) and
+        LangGraph's intent classifier. None when in-process retrieval is
+        unavailable.
+        """
+        if not self.ready or not query:
+            return None
+        try:
+            async with self._slots:
+                vec = await asyncio.to_thread(biobert_embedder.embed_text, query)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Query embedding failed: {e}")
+            return None
+        return vec.tolist()
+
+    async def search(self, query: str, namespace: Optional[str] = None,
+                     k: Optional[int] = None,
+                     query_vec: Optional[List[float]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Top-k matches in the RAG service /search match shape
+        ({"text", "score", "document_id", "chunk_index", "metadata"}).
+        `score` is calibrated to [0, 1] (see _calibrate) so LangGraph's
+        confidence threshold keeps its meaning; `similarity` is the raw
+        cosine. None when the namespace
+        has no vectors here (not ingested yet, or FAISS not deployed), so
+        LangGraph asks the RAG service instead of answering without context.
+        """
+        if not self.ready or not query:
+            return None
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                matches = await asyncio.to_thread(self._search, query, namespace, k or self.top_k, query_vec)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"In-process retrieval failed (namespace={namespace}): {e}")
+            return None
+        if matches is None:
+            self.misses += 1
+            return None
+        elapsed = time.perf_counter() - start
+        self.searches += 1
+        self.seconds_total += elapsed
+        self.recent.append(elapsed)
+        return matches
+
+    @staticmethod
+    def _search(query: str, namespace: Optional[str], k: int,
+                query_vec: Optional[List[float]] = None) -> Optional[List[Dict[str, Any]]]:
+        if not biobert_embedder.has_vectors(namespace):
+            return None
+        if query_vec is None:
+            query_vec = biobert_embedder.embed_text(query)
+        else:
+            query_vec = np.asarray(query_vec, dtype=np.float32)
+        chunks = biobert_embedder.retrieve(query, k=k, namespace=namespace, query_vec=query_vec)
+        similarities = biobert_embedder.chunk_similarities(query_vec, chunks, namespace=namespace)
+        background = biobert_embedder.background_similarity(query_vec, namespace=namespace)
+        return [
+            {
+                "text": c.text,
+                "score": RAGEngine._calibrate(sim, background),
+                "similarity": round(sim, 4) if sim is not None else None,
+                "rank_score": c.score,  # mode-specific: L2 distance or RRF score
+                "document_id": c.document_id,
+                "chunk_index": c.chunk_index,
+                "metadata": {"source_type": c.source_type, "document_id": c.document_id,
+                             "chunk_index": c.chunk_index},
+            }
+            for c, sim in zip(chunks, similarities)
+        ]
+
+    @staticmethod
+    def _calibrate(similarity: Optional[float], background: Optional[float]) -> float:
+        """
+        Raw BioBERT cosines sit close to 1 for any text, so they would pass
+        any fixed threshold tuned for the RAG service's scores. Rescale to
+        how far the chunk rises above the query's background similarity
+        (0 = no closer than an average document, 1 = identical).
+        """
+        if similarity is None:
+            return 0.0
+        base = RAG_SCORE_BASELINE if background is None else background
+        return round(min(1.0, max(0.0, (similarity - base) / max(1.0 - base, 1e-6))), 4)
+
+    async def _listen(self):
+        # reconnects with backoff; updates missed meanwhile are picked up on the
+        # next query, when the partition cache sees the changed files
+        delay = 1.0
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._redis.pubsub()
+                    await self._pubsub.subscribe(INDEX_UPDATES_CHANNEL)
+                async for message in self._pubsub.listen():
+                    delay = 1.0
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        namespace = json.loads(message["data"]).get("namespace")
+                        if await asyncio.to_thread(biobert_embedder.preload, namespace, True):
+                            self.reloads += 1
+                    except Exception as e:
+                        logger.warning(f"Index update reload failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.listener_errors += 1
+                logger.warning(f"Index update listener lost Redis ({e}); reconnecting in {delay:.0f}s")
+                pubsub, self._pubsub = self._pubsub, None
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    def stats(self) -> dict:
+        recent = sorted(self.recent)
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "searches": self.searches,
+            "errors": self.errors,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "listener_errors": self.listener_errors,
+            "avg_ms": round(1000 * self.seconds_total / self.searches, 1) if self.searches else 0.0,
+            "p95_ms": round(1000 * recent[int(len(recent) * 0.95)], 1) if recent else 0.0,
+            "partitions": biobert_embedder.partition_stats() if self.enabled else None,
+        }
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
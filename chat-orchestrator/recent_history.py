@@ -0,0 +1,57 @@
+# chat-orchestrator/recent_history.py
+import json
+from typing import List, Optional
+
+import redis.asyncio as redis
+
+
+class RecentHistory:
+    """
+    Capped per-session ring buffer in Redis holding the latest messages
+    for prompt assembly. Postgres stays the durable store; on a miss the
+    buffer is warmed from AsyncPostgresDB.get_history.
+
+    Key: history:{session_id}  (LIST, oldest -> newest, trimmed to max_messages)
+    """
+
+    KEY = "history:{session_id}"
+
+    def __init__(self, redis_url: str, db=None, max_messages: int = 40, ttl_seconds: int = 86400):
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        self.db = db
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+
+    async def append(self, session_id: str, role: str, content: str, meta: Optional[dict] = None):
+        key = self.KEY.format(session_id=session_id)
+        entry = json.dumps({"role": role, "content": content, "meta": meta})
+        pipe = self._redis.pipeline()
+        pipe.rpush(key, entry)
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl_seconds)
+        await pipe.execute()
+
+    async def recent(self, session_id: str) -> List[dict]:
+        """
+        Latest messages for a session, oldest first.
+        """
+        key = self.KEY.format(session_id=session_id)
+        raw = await self._redis.lrange(key, 0, -1)
+        if raw:
+            return [json.loads(r) for r in raw]
+        if self.db is None:
+            return []
+
+        # miss (new session or expired buffer): warm from Postgres
+        rows = await self.db.get_history(session_id, limit=self.max_messages)
+        messages = [{"role": r["role"], "content": r["content"], "meta": r["meta"]} for r in rows]
+        if messages:
+            pipe = self._redis.pipeline()
+            pipe.delete(key)
+            pipe.rpush(key, *[json.dumps(m) for m in messages])
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+        return messages
+
+    async def close(self):
+        await self._redis.close()
@@ -0,0 +1,159 @@
+# chat-orchestrator/scripts/simulate_scaleout.py
+"""
+Local multi-process simulation of the Redis session registry and routing.
+
+Spawns N node processes, each with its own SessionRouter, and simulates
+--connections sessions spread across them (no real sockets: a "connection"
+is an entry in the node's local session table). Three phases:
+
+  1. connect:   every node claims its slice of sessions
+  2. route:     every node sends --messages to random sessions cluster-wide;
+                most land on other nodes and go through pub/sub
+  3. reconnect: --reconnects sessions move to the next node (takeover);
+                the old node must drop them and new messages must follow them
+
+Needs a reachable Redis. Run from chat-orchestrator/:
+    python -m scripts.simulate_scaleout --redis-url redis://localhost:6379/0 \\
+        --nodes 4 --connections 10000 --messages 20000 --reconnects 1000
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import random
+import time
+
+import redis.asyncio as redis
+
+from session_router import SessionRouter
+
+
+def _session_ids(total: int, run_id: str):
+    return [f"sim-{run_id}-{i}" for i in range(total)]
+
+
+async def _node(idx: int, args, run_id: str, barrier, results):
+    local = {}
+    delivered = {"count": 0}
+    dropped = {"count": 0}
+
+    async def deliver(session_id, text):
+        delivered["count"] += 1
+
+    async def on_takeover(session_id):
+        if local.pop(session_id, None) is not None:
+            dropped["count"] += 1
+
+    router = SessionRouter(
+        args.redis_url,
+        is_local=lambda sid: sid in local,
+        deliver=deliver,
+        on_takeover=on_takeover,
+        node_id=f"sim-{run_id}-node{idx}",
+    )
+    await router.start()
+    wait = lambda: asyncio.to_thread(barrier.wait)
+
+    sessions = _session_ids(args.connections, run_id)
+    mine = sessions[idx::args.nodes]
+
+    # 1. connect
+    start = time.perf_counter()
+    for i in range(0, len(mine), 500):
+        batch = mine[i:i + 500]
+        for sid in batch:
+            local[sid] = True
+        await asyncio.gather(*(router.claim(sid) for sid in batch))
+    connect_s = time.perf_counter() - start
+    await wait()
+
+    # 2. route to random sessions anywhere in the cluster
+    rng = random.Random(idx)
+    per_node = args.messages // args.nodes
+    start = time.perf_counter()
+    sent = 0
+    for i in range(0, per_node, 500):
+        targets = [rng.choice(sessions) for _ in range(min(500, per_node - i))]
+        ok = await asyncio.gather(*(router.send(sid, "ping") for sid in targets))
+        sent += sum(ok)
+    route_s = time.perf_counter() - start
+    await asyncio.sleep(1.0)  # let in-flight pub/sub messages land
+    await wait()
+
+    # 3. reconnect: take over part of the previous node's slice
+    prev = (idx - 1) % args.nodes
+    moved = sessions[prev::args.nodes][: args.reconnects // args.nodes]
+    for sid in moved:
+        local[sid] = True
+    await asyncio.gather(*(router.claim(sid) for sid in moved))
+    await asyncio.sleep(1.0)
+    await wait()
+    before = delivered["count"]
+    ok = await asyncio.gather(*(router.send(sid, "after-move") for sid in moved))
+    await asyncio.sleep(1.0)
+    followed = delivered["count"] - before
+    await wait()
+
+    results.put({
+        "node": idx,
+        "local_sessions": len(local),
+        "connect_s": connect_s,
+        "route_s": route_s,
+        "sent": sent + sum(ok),
+        "moved_sent": sum(ok),
+        "moved_delivered": followed,
+        "delivered": delivered["count"],
+        "dropped_on_takeover": dropped["count"],
+        **router.stats(),
+    })
+    await router.close()
+
+
+def _run_node(idx, args, run_id, barrier, results):
+    asyncio.run(_node(idx, args, run_id, barrier, results))
+
+
+async def _cleanup(redis_url: str, run_id: str):
+    r = redis.from_url(redis_url)
+    keys = [k async for k in r.scan_iter(f"ws:owner:sim-{run_id}-*", count=1000)]
+    for i in range(0, len(keys), 1000):
+        await r.delete(*keys[i:i + 1000])
+    await r.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--reconnects", type=int, default=1_000)
+    args = parser.parse_args()
+
+    run_id = f"{int(time.time())}"
+    barrier = mp.Barrier(args.nodes)
+    results = mp.Queue()
+    procs = [mp.Process(target=_run_node, args=(i, args, run_id, barrier, results)) for i in range(args.nodes)]
+    for p in procs:
+        p.start()
+    rows = sorted((results.get() for _ in procs), key=lambda r: r["node"])
+    for p in procs:
+        p.join()
+    asyncio.run(_cleanup(args.redis_url, run_id))
+
+    for r in rows:
+        print(f"node{r['node']}: local={r['local_sessions']:>6} connect={r['connect_s']:.2f}s "
+              f"route={r['route_s']:.2f}s sent={r['sent']} delivered={r['delivered']} "
+              f"routed_in={r['routed_in']} takeovers={r['takeovers']} dropped={r['dropped_on_takeover']} "
+              f"followed={r['moved_delivered']}/{r['moved_sent']}")
+    sent = sum(r["sent"] for r in rows)
+    delivered = sum(r["delivered"] for r in rows)
+    local = sum(r["local_sessions"] for r in rows)
+    # messages sent after a move must reach the session on its new node
+    followed = all(r["moved_delivered"] == r["moved_sent"] for r in rows)
+    ok = sent == delivered and local == args.connections and followed
+    print(f"total: connections={args.connections} local_after_moves={local} "
+          f"sent={sent} delivered={delivered} {'OK' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
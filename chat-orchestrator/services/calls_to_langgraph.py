@@ -1,6 +1,7 @@
 # chat-orchestrator/services/calls_to_langgraph.py
+import json
 import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 from config import LANGGRAPH_SERVICE_URL, API_KEY
 
 class LangGraphClient:
@@ -15,20 +16,76 @@ class LangGraphClient:
 
     async def run_graph(self, session_id: str, message: Optional[str] = None,
                         file_meta: Optional[Dict[str, Any]] = None,
-                        history: Optional[list] = None, msg_type: str = "user_message") -> Dict[str, Any]:
+                        history: Optional[list] = None, msg_type: str = "user_message",
+                        namespace: Optional[str] = None,
+                        retrieved: Optional[list] = None,
+                        tenant: Optional[str] = None,
+                        query_embedding: Optional[list] = None,
+                        cache_checked: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Call LangGraph service /run_graph and return the parsed JSON response.
         """
-        payload = {
+        payload = self._payload(session_id, message, file_meta, history, msg_type, namespace, retrieved, tenant,
+                                query_embedding, cache_checked)
+        resp = await self._client.post(f"{LANGGRAPH_SERVICE_URL}/run_graph", json=payload)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def stream_graph(self, session_id: str, message: Optional[str] = None,
+                           file_meta: Optional[Dict[str, Any]] = None,
+                           history: Optional[list] = None,
+                           msg_type: str = "user_message",
+                           namespace: Optional[str] = None,
+                           retrieved: Optional[list] = None,
+                           tenant: Optional[str] = None,
+                           query_embedding: Optional[list] = None,
+                           cache_checked: Optional[Dict[str, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Call LangGraph service /run_graph/stream and yield each NDJSON item
+        ({"type": "event" | "token" | "final" | "busy" | "error", ...}) as it arrives.
+        A 503 from LangGraph is reported as a single "busy" item.
+        """
+        payload = self._payload(session_id, message, file_meta, history, msg_type, namespace, retrieved, tenant,
+                                query_embedding, cache_checked)
+        async with self._client.stream("POST", f"{LANGGRAPH_SERVICE_URL}/run_graph/stream", json=payload) as resp:
+            if resp.status_code == 503:
+                yield {"type": "busy", "retry_after": int(resp.headers.get("retry-after", 5))}
+                return
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line:
+                    yield json.loads(line)
+
+    async def cache_lookup(self, namespace: Optional[str], message: str,
+                           query_embedding: list) -> Optional[Dict[str, Any]]:
+        """
+        LangGraph's semantic cache lookup, before retrieval:
+        {"answer": str | None, "intent", "intent_source"}, or None when it failed.
+        """
+        try:
+            resp = await self._client.post(f"{LANGGRAPH_SERVICE_URL}/cache/lookup", json={
+                "namespace": namespace, "message": message, "query_embedding": query_embedding,
+            })
+            resp.raise_for_status()
+            return resp.json()
+        except Exception:
+            return None  # the graph run looks the cache up itself
+
+    @staticmethod
+    def _payload(session_id, message, file_meta, history, msg_type, namespace=None, retrieved=None,
+                 tenant=None, query_embedding=None, cache_checked=None) -> Dict[str, Any]:
+        return {
             "session_id": session_id,
             "type": msg_type,
+            "namespace": namespace,
+            "tenant": tenant,  # LangGraph admission fairness key; None means the session id
             "message": message,
             "file_meta": file_meta,
-            "history": history or []
+            "history": history or [],
+            "retrieved": retrieved,  # matches from the in-process RAGEngine; None lets LangGraph retrieve
+            "query_embedding": query_embedding,  # RAGEngine query vector for LangGraph's cache + intent classifier
+            "cache_checked": cache_checked,  # cache_lookup() missed; its intent, so LangGraph does not look up again
         }
-        resp = await self._client.post(f"{LANGGRAPH_SERVICE_URL}/run_graph", json=payload)
-        resp.raise_for_status()
-        return resp.json()
 
     async def close(self):
         await self._client.aclose()
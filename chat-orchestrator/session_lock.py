@@ -0,0 +1,74 @@
+# session_lock.py
+# Keyed async lock registry: ordered per session, concurrent across sessions
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class _SessionEntry:
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class SessionLockRegistry:
+    """One asyncio.Lock per session key.
+    - Messages for the same session run one at a time, in arrival order (FIFO).
+    - Different sessions never wait on each other.
+    - An entry is evicted as soon as no task holds or waits on it,
+      so idle sessions cost nothing.
+    """
+    def __init__(self):
+        self._entries: Dict[str, _SessionEntry] = {}
+        self.acquisitions = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = self._entries[session_id] = _SessionEntry()
+        entry.refs += 1
+
+        start = time.perf_counter()
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            self._unref(session_id, entry)
+            raise
+        waited = time.perf_counter() - start
+        self.acquisitions += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        try:
+            yield
+        finally:
+            entry.lock.release()
+            self._unref(session_id, entry)
+
+    def _unref(self, session_id: str, entry: _SessionEntry):
+        entry.refs -= 1
+        if entry.refs == 0 and self._entries.get(session_id) is entry:
+            del self._entries[session_id]
+
+    @property
+    def in_flight(self) -> int:
+        """Sessions currently processing a message."""
+        return sum(1 for e in self._entries.values() if e.lock.locked())
+
+    def stats(self) -> dict:
+        return {
+            "in_flight_sessions": self.in_flight,
+            "tracked_sessions": len(self._entries),
+            "waiting_tasks": sum(e.refs for e in self._entries.values()) - self.in_flight,
+            "acquisitions": self.acquisitions,
+            "lock_wait_seconds_total": round(self.wait_seconds_total, 6),
+            "lock_wait_seconds_avg": round(self.wait_seconds_total / self.acquisitions, 6) if self.acquisitions else 0.0,
+            "lock_wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
@@ -0,0 +1,210 @@
+# chat-orchestrator/session_router.py
+# Cross-node routing of WebSocket sessions via Redis (registry + pub/sub)
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+# Delete the owner key only if it still names this node (a reconnect may
+# already have moved the session elsewhere).
+_RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def default_node_id() -> str:
+    # one id per process, so uvicorn workers are separate nodes
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SessionRouter:
+    """
+    Lets several orchestrator replicas / uvicorn workers share WebSocket sessions.
+
+    Registry:  ws:owner:{session_id} -> node_id   (TTL, refreshed by heartbeat)
+    Channel:   ws:node:{node_id}                  (pub/sub, one per node)
+
+    - claim(): called on connect; records this node as owner. If another node
+      owned the session (reconnect landed elsewhere), it is told to close its
+      stale socket ("takeover").
+    - send(): delivers locally when possible, otherwise publishes to the
+      owning node's channel.
+    - release(): called on disconnect; removes ownership only if still ours.
+    """
+
+    OWNER_KEY = "ws:owner:{session_id}"
+    NODE_CHANNEL = "ws:node:{node_id}"
+
+    def __init__(
+        self,
+        redis_url: str,
+        is_local: Callable[[str], bool],
+        deliver: Callable[[str, str], Awaitable[None]],
+        on_takeover: Callable[[str], Awaitable[None]],
+        node_id: Optional[str] = None,
+        owner_ttl_seconds: int = 60,
+        max_connections: int = 64,
+    ):
+        # bounded blocking pool: a reconnect storm waits for a connection instead of erroring
+        self._redis = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+            redis_url, max_connections=max_connections, decode_responses=True,
+        ))
+        self.node_id = node_id or default_node_id()
+        self._is_local = is_local
+        self._deliver = deliver
+        self._on_takeover = on_takeover
+        self.owner_ttl_seconds = owner_ttl_seconds
+        self._owned: set = set()
+        self._release = self._redis.register_script(_RELEASE_IF_OWNER)
+        self._pubsub = None
+        self._tasks = []
+
+        self.routed_out = 0
+        self.routed_in = 0
+        self.undeliverable = 0
+        self.takeovers = 0
+        self.redis_errors = 0
+
+    @property
+    def channel(self) -> str:
+        return self.NODE_CHANNEL.format(node_id=self.node_id)
+
+    async def start(self):
+        # both loops survive Redis outages: they log, back off and carry on
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._heartbeat()),
+        ]
+
+    async def claim(self, session_id: str):
+        key = self.OWNER_KEY.format(session_id=session_id)
+        previous = await self._redis.set(key, self.node_id, ex=self.owner_ttl_seconds, get=True)
+        self._owned.add(session_id)
+        if previous and previous != self.node_id:
+            self.takeovers += 1
+            await self._publish(previous, {"op": "takeover", "session_id": session_id})
+
+    async def release(self, session_id: str):
+        self._owned.discard(session_id)
+        await self._release(keys=[self.OWNER_KEY.format(session_id=session_id)], args=[self.node_id])
+
+    async def send(self, session_id: str, text: str) -> bool:
+        """
+        Send a server-initiated message to a session wherever it is connected.
+        Returns False if no node currently owns the session.
+        """
+        if self._is_local(session_id):
+            await self._deliver(session_id, text)
+            return True
+        owner = await self._redis.get(self.OWNER_KEY.format(session_id=session_id))
+        if not owner or owner == self.node_id:
+            self.undeliverable += 1
+            return False
+        self.routed_out += 1
+        await self._publish(owner, {"op": "send", "session_id": session_id, "text": text})
+        return True
+
+    async def _publish(self, node_id: str, message: dict):
+        await self._redis.publish(self.NODE_CHANNEL.format(node_id=node_id), json.dumps(message))
+
+    async def _listen(self):
+        # messages published while unsubscribed are lost (pub/sub keeps nothing)
+        delay = 1.0
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._redis.pubsub()
+                    await self._pubsub.subscribe(self.channel)
+                async for message in self._pubsub.listen():
+                    delay = 1.0
+                    if message.get("type") != "message":
+                        continue
+                    await self._handle(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Lost subscription to {self.channel} ({e}); resubscribing in {delay:.0f}s")
+                pubsub, self._pubsub = self._pubsub, None
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _handle(self, message: dict):
+        try:
+            data = json.loads(message["data"])
+            session_id = data["session_id"]
+            if data["op"] == "send":
+                if self._is_local(session_id):
+                    self.routed_in += 1
+                    await self._deliver(session_id, data["text"])
+                else:
+                    self.undeliverable += 1
+            elif data["op"] == "takeover":
+                self._owned.discard(session_id)
+                await self._on_takeover(session_id)
+        except Exception as e:
+            logger.warning(f"Dropped routed message on {self.channel}: {e}")
+
+    async def _heartbeat(self):
+        # keep ownership alive while connected; a crashed node's keys simply expire
+        interval = self.owner_ttl_seconds / 3
+        delay = interval
+        while True:
+            await asyncio.sleep(delay)
+            owned = list(self._owned)
+            if not owned:
+                continue
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for session_id in owned:
+                    pipe.expire(self.OWNER_KEY.format(session_id=session_id), self.owner_ttl_seconds)
+                refreshed = await pipe.execute()
+                # keys that expired during an outage: reclaim unless another node took over
+                lapsed = [s for s, ok in zip(owned, refreshed) if not ok and s in self._owned]
+                if lapsed:
+                    pipe = self._redis.pipeline(transaction=False)
+                    for session_id in lapsed:
+                        pipe.set(self.OWNER_KEY.format(session_id=session_id), self.node_id,
+                                 ex=self.owner_ttl_seconds, nx=True)
+                    await pipe.execute()
+                delay = interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.redis_errors += 1
+                # retry sooner than the TTL so ownership survives short outages
+                delay = min(max(delay / 2, 1.0), interval)
+                logger.warning(f"Ownership heartbeat for {len(owned)} sessions failed ({e}); retrying in {delay:.0f}s")
+
+    def stats(self) -> dict:
+        return {
+            "node_id": self.node_id,
+            "owned_sessions": len(self._owned),
+            "routed_out": self.routed_out,
+            "routed_in": self.routed_in,
+            "undeliverable": self.undeliverable,
+            "takeovers": self.takeovers,
+            "redis_errors": self.redis_errors,
+        }
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self._redis.aclose()
@@ -1,38 +1,74 @@
 # chat-orchestrator/websocket_manager.py
 import asyncio
 import json
-from datetime import datetime, timezone, timedelta
-from typing import Dict, Optional
+import logging
+from datetime import timedelta
+from typing import Optional, Tuple
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 
+from config import TENANT_HEADER
 from services.calls_to_langgraph import LangGraphClient
-from rw_lock import RWLock
+from session_lock import SessionLockRegistry
+from idle_monitor import IdleMonitor, SessionState
+from session_router import SessionRouter
+
+logger = logging.getLogger(__name__)
 
 class WebSocketManager:
     IDLE_TIMEOUT = timedelta(seconds=180)
     WARNING_SECONDS = 30
     WARNING_INTERVAL = 5
 
-    def __init__(self, db=None):
+    def __init__(self, db=None, rag=None, history=None, redis_url: Optional[str] = None):
         self.db = db
+        self.rag = rag  # in-process RAGEngine (optional); its matches ride along to LangGraph
+        self.history = history  # RecentHistory ring buffer (optional)
         self.langgraph = LangGraphClient()
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.last_active: Dict[str, datetime] = {}
-        self._last_warning_sent: Dict[str, int] = {}
-        self._lock = RWLock()
+        self.idle = IdleMonitor(
+            idle_timeout=self.IDLE_TIMEOUT.total_seconds(),
+            warning_seconds=self.WARNING_SECONDS,
+            warning_interval=self.WARNING_INTERVAL,
+        )
+        self._session_locks = SessionLockRegistry()
+        # multi-node mode: session ownership + outbound routing through Redis
+        self.router = SessionRouter(
+            redis_url,
+            is_local=lambda sid: sid in self.idle.sessions,
+            deliver=self._deliver_local,
+            on_takeover=self._close_taken_over,
+        ) if redis_url else None
 
     def setup_routes(self, app: FastAPI):
+        @app.get("/stats/session_locks")
+        async def session_lock_stats():
+            return self._session_locks.stats()
+
+        @app.get("/stats/idle_monitor")
+        async def idle_monitor_stats():
+            return self.idle.stats()
+
+        @app.get("/stats/cluster")
+        async def cluster_stats():
+            return self.router.stats() if self.router else {"enabled": False}
+
         @app.websocket("/ws/{session_id}")
         async def ws_endpoint(ws: WebSocket, session_id: str):
             await ws.accept()
-            self.active_connections[session_id] = ws
-            self.last_active[session_id] = datetime.now(timezone.utc)
+            # admission tenant from the handshake, never from the client's messages
+            tenant = ws.headers.get(TENANT_HEADER) or session_id
+            self.idle.add(session_id, ws)
 
             try:
+                if self.router:
+                    try:
+                        await self.router.claim(session_id)
+                    except Exception as e:
+                        # degraded: the socket still works, but other nodes cannot route to it
+                        logger.warning(f"Session claim failed for {session_id}, serving locally only: {e}")
+
                 while True:
                     data = await ws.receive_text()
-                    self.last_active[session_id] = datetime.now(timezone.utc)
-                    self._last_warning_sent.pop(session_id, None)
+                    self.idle.touch(session_id)
 
                     # Expect JSON payloads for structured actions
                     try:
@@ -42,72 +78,178 @@ class WebSocketManager:
                         payload = None
                         p_type = "user_message"
 
-                    # Acquire write lock for session to ensure sequential processing
-                    await self._lock.acquire_write()
-                    try:
+                    # Per-session lock: sequential within a session, concurrent across sessions
+                    async with self._session_locks.hold(session_id):
                         # ---------------- FILE UPLOAD ----------------
                         if p_type == "file_upload":
                             await ws.send_text("📁 Received file, forwarding to LangGraph...")
-                            lg_resp = await self.langgraph.run_graph(
+                            stream = self.langgraph.stream_graph(
                                 session_id=session_id,
                                 file_meta=payload,
-                                msg_type="file_uploaded"
+                                msg_type="file_uploaded",
+                                namespace=payload.get("namespace"),
+                                tenant=tenant,
                             )
                         # ---------------- USER MESSAGE ----------------
                         else:
                             message = payload.get("message") if payload else data
+                            namespace = payload.get("namespace") if payload else None
+                            # embed in-process while history is read and the message persisted
+                            embed = asyncio.create_task(self.rag.embed(message)) if self.rag else None
+                            # recent turns for prompt assembly, read before adding this one
+                            recent = await self.history.recent(session_id) if self.history else None
                             # persist user message
-                            if self.db:
-                                await self.db.insert_chat(session_id, message, "User")
+                            await self._persist(session_id, "User", message)
+                            query_vec = await embed if embed else None
 
-                            lg_resp = await self.langgraph.run_graph(
+                            # semantic cache before retrieval; sessions with history never use it
+                            checked = None
+                            if query_vec is not None and not recent:
+                                checked = await self.langgraph.cache_lookup(namespace, message, query_vec)
+                            if checked and checked.get("answer"):
+                                await ws.send_text("WS:cache:hit")
+                                await self._persist(session_id, "Bot", checked["answer"])
+                                await ws.send_text(checked["answer"])
+                                continue
+
+                            # None: LangGraph retrieves through the RAG service itself
+                            retrieved = None
+                            if query_vec is not None:
+                                retrieved = await self.rag.search(message, namespace, query_vec=query_vec)
+
+                            stream = self.langgraph.stream_graph(
                                 session_id=session_id,
                                 message=message,
-                                msg_type="user_message"
+                                history=recent,
+                                msg_type="user_message",
+                                namespace=namespace,
+                                retrieved=retrieved,
+                                tenant=tenant,
+                                query_embedding=query_vec,
+                                cache_checked={k: checked[k] for k in ("intent", "intent_source")} if checked else None,
                             )
 
-                        # Forward LangGraph events
-                        for ev in lg_resp.get("events", []):
-                            await ws.send_text(ev)
-
-                        output = lg_resp.get("llm_output")
+                        output, streamed = await self._forward_stream(ws, stream)
                         if output:
-                            if self.db:
-                                await self.db.insert_chat(session_id, output, "Bot")
-                            await ws.send_text(output)
-
-                    finally:
-                        self._lock.release_write()
+                            # persist once the stream has completed
+                            await self._persist(session_id, "Bot", output)
+                            if streamed:
+                                # the client already has the tokens; this closes the reply
+                                await ws.send_text(json.dumps({"type": "final", "text": output}))
+                            else:
+                                await ws.send_text(output)
 
             except WebSocketDisconnect:
-                self._cleanup_session(session_id)
+                await self._cleanup_session(session_id, ws)
             except Exception as e:
                 try:
                     await ws.send_text(f"⚠️ Connection error: {e}")
                 except Exception:
                     pass
-                self._cleanup_session(session_id)
+                await self._cleanup_session(session_id, ws)
+
+    async def _persist(self, session_id: str, role: str, content: str):
+        """
+        Record a message in the recent-history ring buffer and in Postgres.
+        """
+        if self.history:
+            await self.history.append(session_id, role, content)
+        if self.db:
+            # write-behind: batched by the background writer, off the critical path
+            self.db.enqueue_message(session_id, role, content)
+
+    async def _forward_stream(self, ws: WebSocket, stream) -> Tuple[Optional[str], bool]:
+        """
+        Relay LangGraph stream items to the socket as they arrive.
+        Events go out as plain text (as before); token deltas go out as
+        {"type": "token", "delta": ...} frames and load shedding as a
+        {"type": "busy", "retry_after": ...} frame. Returns the final
+        llm_output and whether any tokens were sent.
+        """
+        output = None
+        streamed = False
+        async for item in stream:
+            kind = item.get("type")
+            if kind == "event":
+                await ws.send_text(item["data"])
+            elif kind == "token":
+                streamed = True
+                await ws.send_text(json.dumps({"type": "token", "delta": item["data"]}))
+            elif kind == "final":
+                output = item.get("llm_output")
+            elif kind == "busy":
+                # shed by admission control; nothing was generated
+                await ws.send_text(json.dumps({
+                    "type": "busy",
+                    "message": "⚠️ Service is busy, please retry shortly.",
+                    "retry_after": item.get("retry_after"),
+                }))
+            elif kind == "error":
+                await ws.send_text(f"⚠️ {item.get('detail')}")
+        return output, streamed
 
     async def monitor_idle_sessions(self):
-        while True:
-            now = datetime.now(timezone.utc)
-            for sid, ws in list(self.active_connections.items()):
-                idle = now - self.last_active.get(sid, now)
-                secs = int((self.IDLE_TIMEOUT - idle).total_seconds())
-                if secs <= 0:
-                    try: await ws.close()
-                    except Exception: pass
-                    self._cleanup_session(sid)
-                elif secs <= self.WARNING_SECONDS:
-                    last_warned = self._last_warning_sent.get(sid, -999)
-                    if secs % self.WARNING_INTERVAL == 0 and secs != last_warned:
-                        try:
-                            await ws.send_text(f"⚠️ Idle timeout in {secs} seconds")
-                        except Exception: pass
-                        self._last_warning_sent[sid] = secs
-            await asyncio.sleep(1)
-
-    def _cleanup_session(self, session_id: str):
-        self.active_connections.pop(session_id, None)
-        self.last_active.pop(session_id, None)
-        self._last_warning_sent.pop(session_id, None)
+        await self.idle.run(self._send_idle_warning, self._close_idle_session)
+
+    async def _send_idle_warning(self, state: SessionState, secs: int):
+        try:
+            await state.ws.send_text(f"⚠️ Idle timeout in {secs} seconds")
+        except Exception:
+            pass
+
+    async def _close_idle_session(self, state: SessionState):
+        try:
+            await state.ws.close()
+        except Exception:
+            pass
+        if self.router and state.session_id not in self.idle.sessions:
+            try:
+                await self.router.release(state.session_id)
+            except Exception:
+                pass
+
+    async def start(self):
+        if self.router:
+            await self.router.start()
+
+    async def close(self):
+        if self.router:
+            await self.router.close()
+        await self.langgraph.close()
+
+    async def send_to_session(self, session_id: str, text: str) -> bool:
+        """
+        Server-initiated message to a session, on whichever node holds its socket.
+        """
+        if self.router:
+            return await self.router.send(session_id, text)
+        if session_id not in self.idle.sessions:
+            return False
+        await self._deliver_local(session_id, text)
+        return True
+
+    async def _deliver_local(self, session_id: str, text: str):
+        state = self.idle.sessions.get(session_id)
+        if state is not None:
+            try:
+                await state.ws.send_text(text)
+            except Exception:
+                pass
+
+    async def _close_taken_over(self, session_id: str):
+        # the client reconnected to another node; drop our stale socket
+        state = self.idle.remove(session_id)
+        if state is not None:
+            try:
+                await state.ws.close()
+            except Exception:
+                pass
+
+    async def _cleanup_session(self, session_id: str, ws: Optional[WebSocket] = None):
+        state = self.idle.remove(session_id, ws)
+        # only the connection that still owns the session releases it (reconnects)
+        if state is not None and self.router:
+            try:
+                await self.router.release(session_id)
+            except Exception:
+                pass
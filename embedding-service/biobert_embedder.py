@@ -9,15 +9,35 @@ Used by:
 BioBERT is chosen over generic embeddings because the knowledge corpus
 (system guides, operational docs, support tickets) contains domain-specific
 terminology that benefits from biomedical/technical pretraining.
+
+Exact identifiers (error codes, config keys, command names) are better
+served lexically, so retrieve() defaults to hybrid mode: dense FAISS
+candidates fused with BM25 candidates (bm25_index.py) by reciprocal rank.
+
+DENSE_SEARCH=two_stage replaces the flat scan of every chunk vector with a
+coarse-to-fine search: nearest documents first (doc_index.py), then only
+their chunks.
+
+Vectors may be stored compressed (FAISS_INDEX_TYPE, quantization.py); the
+top candidates are then re-ranked exactly from the raw vectors on disk.
+
+Every index is partitioned by namespace (customer, partitions.py); a query
+searches only its namespace, loaded on first use and kept in an LRU under
+a memory budget.
+
+Chunk text is read from the memory-mapped chunk store next to the vectors
+(chunk_store.py); Redis is only consulted for chunks the store does not
+have (CHUNK_STORE_BACKEND=redis, or rows ingested before the store existed).
 """
 
 from __future__ import annotations
 
 import json
 import logging
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, replace
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import faiss
 import numpy as np
@@ -25,13 +45,20 @@ import redis
 import torch
 from transformers import AutoModel, AutoTokenizer
 
+from embedding_service.bm25_index import BM25Index
+from embedding_service.doc_index import DocumentIndex
+from embedding_service.partitions import FAISS_INDEX_PATH, PartitionCache, partition_paths  # noqa: F401
+
 logger = logging.getLogger(__name__)
 
 MODEL_NAME = "dmis-lab/biobert-base-cased-v1.2"
-FAISS_INDEX_PATH = "/data/faiss_index/index.faiss"
 REDIS_HOST = "redis"
 REDIS_PORT = 6379
 EMBEDDING_DIM = 768  # BioBERT hidden size
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")  # "dense" | "hybrid"
+RRF_K = 60  # reciprocal rank fusion constant
+DENSE_SEARCH = os.environ.get("DENSE_SEARCH", "flat")  # "flat" | "two_stage"
+TWO_STAGE_TOP_DOCS = int(os.environ.get("TWO_STAGE_TOP_DOCS", 20))
 
 
 # ── Model singleton (loaded once per process) ────────────────────────────────
@@ -97,13 +124,27 @@ class RetrievedChunk:
     source_type: str      # "guide" | "ticket" | "doc"
     document_id: str
     chunk_index: int
-    score: float          # L2 distance (lower = more similar)
+    score: float          # dense: L2 distance (lower = more similar); hybrid: RRF score (higher = better)
+
 
+_partitions = PartitionCache()
 
-def load_faiss_index() -> faiss.Index:
-    """Load FAISS index from disk. Called fresh per request to pick up new writes."""
+
+def partition_stats() -> dict:
+    """Per-namespace partition sizes and cache hit rates."""
+    return _partitions.stats()
+
+
+def has_vectors(namespace: Optional[str] = None) -> bool:
+    """True if the namespace has a partition with at least one vector."""
+    partition = _partitions.get(namespace)
+    return partition is not None and partition.rows > 0
+
+
+def load_faiss_index(namespace: Optional[str] = None) -> faiss.Index:
+    """Load a namespace's FAISS index from disk (retrieval goes through the partition cache)."""
     try:
-        index = faiss.read_index(FAISS_INDEX_PATH)
+        index = faiss.read_index(partition_paths(namespace).faiss)
         logger.debug(f"Loaded FAISS index with {index.ntotal} vectors")
         return index
     except Exception as e:
@@ -111,10 +152,30 @@ def load_faiss_index() -> faiss.Index:
         raise
 
 
+def _redis_chunk(r: redis.Redis, document_id: str, chunk_index: int) -> Optional[dict]:
+    raw = r.get(f"chunk:{document_id}:{chunk_index}")
+    if not raw:
+        return None
+    return {**json.loads(raw), "document_id": document_id, "chunk_index": chunk_index}
+
+
+def _redis_chunk_by_row(r: redis.Redis, idx: int) -> Optional[dict]:
+    # Key format: chunk:{document_id}:{chunk_index}
+    keys = r.keys(f"chunk:*:{idx}")
+    if not keys:
+        return None
+    parts = keys[0].split(":")
+    if len(parts) < 3:
+        return None
+    return _redis_chunk(r, parts[1], int(parts[2]))
+
+
 def retrieve_top_k(
     query: str,
     k: int = 5,
     source_filter: Optional[str] = None,
+    namespace: Optional[str] = None,
+    query_vec: Optional[np.ndarray] = None,
 ) -> List[RetrievedChunk]:
     """
     Embed query with BioBERT and retrieve top-k most similar chunks from FAISS.
@@ -123,17 +184,23 @@ def retrieve_top_k(
         query:         Natural language query from the user.
         k:             Number of chunks to retrieve.
         source_filter: Optionally restrict to "guide", "ticket", or "doc".
+        namespace:     Customer partition to search (None: global index).
+        query_vec:     Precomputed embed_text(query), to embed once per request.
 
     Returns:
         List of RetrievedChunk sorted by ascending L2 distance (most relevant first).
     """
-    query_vec = embed_text(query).reshape(1, -1)
-    index = load_faiss_index()
+    partition = _partitions.get(namespace)
+    if partition is None:
+        logger.info(f"No vectors indexed for namespace={namespace}")
+        return []
+    query_vec = (embed_text(query) if query_vec is None else query_vec).reshape(1, -1)
 
     # Retrieve more candidates if filtering, then trim to k after filter
     fetch_k = k * 3 if source_filter else k
-    distances, indices = index.search(query_vec, fetch_k)
+    distances, indices = partition.search(query_vec, fetch_k)
 
+    # connects lazily: no round trip unless a row is missing from the chunk store
     r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
     results: List[RetrievedChunk] = []
 
@@ -141,34 +208,21 @@ def retrieve_top_k(
         if idx == -1:
             continue
 
-        # Resolve chunk metadata from Redis
-        # Key format: chunk:{document_id}:{chunk_index}
-        pattern = f"chunk:*:{idx}"
-        keys = r.keys(pattern)
-        if not keys:
+        # Resolve chunk metadata: on-disk chunk store by vector id, else Redis
+        meta = partition.chunk(idx) or _redis_chunk_by_row(r, idx)
+        if meta is None:
             continue
 
-        key = keys[0]
-        raw = r.get(key)
-        if not raw:
-            continue
-
-        meta = json.loads(raw)
-
         # Apply source filter if requested
         if source_filter and meta.get("source_type") != source_filter:
             continue
 
-        parts = key.split(":")
-        doc_id = parts[1] if len(parts) >= 3 else "unknown"
-        chunk_idx = int(parts[2]) if len(parts) >= 3 else idx
-
         results.append(
             RetrievedChunk(
                 text=meta["text"],
                 source_type=meta.get("source_type", "unknown"),
-                document_id=doc_id,
-                chunk_index=chunk_idx,
+                document_id=meta["document_id"],
+                chunk_index=meta["chunk_index"],
                 score=float(dist),
             )
         )
@@ -180,6 +234,257 @@ def retrieve_top_k(
     return results
 
 
+# ── Two-stage (document → chunk) retrieval ───────────────────────────────────
+
+_doc_index_cache: Dict[str, Tuple[float, DocumentIndex]] = {}
+
+
+def load_document_index(namespace: Optional[str] = None) -> Optional[DocumentIndex]:
+    """Document-level index from disk, reloaded only when the file changes."""
+    path = partition_paths(namespace).documents
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _doc_index_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _doc_index_cache[path] = (mtime, DocumentIndex.load(path))
+    return cached[1]
+
+
+def retrieve_two_stage(
+    query: str,
+    k: int = 5,
+    source_filter: Optional[str] = None,
+    top_docs: int = TWO_STAGE_TOP_DOCS,
+    namespace: Optional[str] = None,
+    query_vec: Optional[np.ndarray] = None,
+) -> List[RetrievedChunk]:
+    """
+    Coarse-to-fine dense retrieval: pick the `top_docs` documents nearest the
+    query, then score only their chunk vectors (from the namespace's
+    partition).
+    Falls back to retrieve_top_k when there is no document index or it does
+    not cover every FAISS row.
+
+    Returns:
+        List of RetrievedChunk sorted by ascending L2 distance, as retrieve_top_k.
+    """
+    doc_index = load_document_index(namespace)
+    if doc_index is None or doc_index.uncovered_rows:
+        logger.warning("Document index missing or incomplete, using flat search")
+        return retrieve_top_k(query, k=k, source_filter=source_filter, namespace=namespace, query_vec=query_vec)
+
+    query_vec = embed_text(query) if query_vec is None else query_vec
+    positions = doc_index.top_documents(query_vec, top_docs, source_filter=source_filter)
+    rows, owners = doc_index.candidate_rows(positions)
+    if not len(rows):
+        return []
+
+    partition = _partitions.get(namespace)
+    if partition is None:
+        return []
+    vectors = partition.vectors(rows)
+    dists = ((vectors - query_vec) ** 2).sum(axis=1)  # squared L2, as IndexFlatL2
+    best = np.argsort(dists, kind="stable")[:k]
+
+    r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    results: List[RetrievedChunk] = []
+    for i in best:
+        doc_id, chunk_idx, source_type = doc_index.chunk_of(rows[i], owners[i])
+        meta = partition.chunk(rows[i]) or _redis_chunk(r, doc_id, chunk_idx)
+        if meta is None:
+            continue
+        results.append(
+            RetrievedChunk(
+                text=meta["text"],
+                source_type=meta.get("source_type", source_type),
+                document_id=doc_id,
+                chunk_index=chunk_idx,
+                score=float(dists[i]),
+            )
+        )
+
+    logger.info(f"Two-stage retrieval: {len(positions)} documents, {len(rows)} chunks scored -> {len(results)}")
+    return results
+
+
+def retrieve_dense(
+    query: str,
+    k: int = 5,
+    source_filter: Optional[str] = None,
+    namespace: Optional[str] = None,
+    query_vec: Optional[np.ndarray] = None,
+) -> List[RetrievedChunk]:
+    """Dense retrieval with the configured search (DENSE_SEARCH)."""
+    if DENSE_SEARCH == "two_stage":
+        return retrieve_two_stage(query, k=k, source_filter=source_filter, namespace=namespace, query_vec=query_vec)
+    return retrieve_top_k(query, k=k, source_filter=source_filter, namespace=namespace, query_vec=query_vec)
+
+
+# ── Hybrid (BM25 + dense) retrieval ──────────────────────────────────────────
+
+_lexical_cache: Dict[str, Tuple[float, BM25Index]] = {}
+
+
+def load_lexical_index(namespace: Optional[str] = None) -> Optional[BM25Index]:
+    """
+    BM25 index from disk, reloaded only when the file changes
+    (the ingestion worker replaces it atomically).
+    """
+    path = partition_paths(namespace).bm25
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _lexical_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _lexical_cache[path] = (mtime, BM25Index.load(path))
+    return cached[1]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[str, int]]],
+    k: int = RRF_K,
+) -> List[Tuple[Tuple[str, int], float]]:
+    """
+    Fuse ranked lists of (document_id, chunk_index) keys:
+    score(key) = sum over lists of 1 / (k + rank). Best first.
+    """
+    scores: Dict[Tuple[str, int], float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def retrieve_hybrid(
+    query: str,
+    k: int = 5,
+    source_filter: Optional[str] = None,
+    candidates: Optional[int] = None,
+    namespace: Optional[str] = None,
+    query_vec: Optional[np.ndarray] = None,
+) -> List[RetrievedChunk]:
+    """
+    Fuse dense (FAISS) and lexical (BM25) candidates with reciprocal rank
+    fusion. Falls back to dense-only results when no BM25 index exists.
+
+    Returns:
+        Up to k RetrievedChunk, best first, score = fused RRF score.
+    """
+    candidates = candidates or max(4 * k, 20)
+    dense = retrieve_dense(query, k=candidates, source_filter=source_filter, namespace=namespace, query_vec=query_vec)
+    lexical_index = load_lexical_index(namespace)
+    if lexical_index is None:
+        return dense[:k]
+    lexical = lexical_index.search(query, k=candidates, source_filter=source_filter)
+
+    by_key = {(c.document_id, c.chunk_index): c for c in dense}
+    fused = reciprocal_rank_fusion([
+        [(c.document_id, c.chunk_index) for c in dense],
+        [(doc_id, chunk_index) for doc_id, chunk_index, _ in lexical],
+    ])
+
+    r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    partition = _partitions.get(namespace)
+    doc_index = load_document_index(namespace)
+    results: List[RetrievedChunk] = []
+    for (doc_id, chunk_index), score in fused:
+        chunk = by_key.get((doc_id, chunk_index))
+        if chunk is None:
+            # lexical-only hit: text comes from the chunk store (row via the document index)
+            row = doc_index.row_of(doc_id, chunk_index) if doc_index is not None else None
+            meta = partition.chunk(row) if partition is not None and row is not None else None
+            meta = meta or _redis_chunk(r, doc_id, chunk_index)
+            if meta is None:
+                continue
+            chunk = RetrievedChunk(
+                text=meta["text"],
+                source_type=meta.get("source_type", "unknown"),
+                document_id=doc_id,
+                chunk_index=chunk_index,
+                score=0.0,
+            )
+        results.append(replace(chunk, score=score))
+        if len(results) >= k:
+            break
+
+    logger.info(f"Hybrid retrieval: {len(dense)} dense + {len(lexical)} lexical candidates -> {len(results)}")
+    return results
+
+
+def retrieve(
+    query: str,
+    k: int = 5,
+    source_filter: Optional[str] = None,
+    mode: str = RETRIEVAL_MODE,
+    namespace: Optional[str] = None,
+    query_vec: Optional[np.ndarray] = None,
+) -> List[RetrievedChunk]:
+    """Retrieve top-k chunks of `namespace` in the configured mode ("dense" or "hybrid")."""
+    if mode == "hybrid":
+        return retrieve_hybrid(query, k=k, source_filter=source_filter, namespace=namespace, query_vec=query_vec)
+    return retrieve_dense(query, k=k, source_filter=source_filter, namespace=namespace, query_vec=query_vec)
+
+
+def chunk_similarities(
+    query_vec: np.ndarray,
+    chunks: List[RetrievedChunk],
+    namespace: Optional[str] = None,
+) -> List[Optional[float]]:
+    """
+    Cosine similarity between the query and each retrieved chunk's vector
+    (None where the chunk's row is unknown). Unlike `score`, comparable
+    across retrieval modes.
+    """
+    partition = _partitions.get(namespace)
+    doc_index = load_document_index(namespace)
+    if partition is None or doc_index is None:
+        return [None] * len(chunks)
+    rows = [doc_index.row_of(c.document_id, c.chunk_index) for c in chunks]
+    known = [i for i, row in enumerate(rows) if row is not None and row < partition.rows]
+    sims: List[Optional[float]] = [None] * len(chunks)
+    if known:
+        vectors = partition.vectors(np.array([rows[i] for i in known], dtype=np.int64))
+        q = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(q) or 1.0)
+        cos = (vectors @ q) / np.where(norms == 0, 1.0, norms)
+        for i, value in zip(known, cos):
+            sims[i] = float(value)
+    return sims
+
+
+def background_similarity(query_vec: np.ndarray, namespace: Optional[str] = None) -> Optional[float]:
+    """
+    The query's average cosine similarity to the namespace's documents, or
+    None without a document index. Mean-pooled BERT vectors share a large
+    common direction, so even unrelated text scores high; relevance is how
+    far a chunk rises above this background.
+    """
+    doc_index = load_document_index(namespace)
+    direction = doc_index.mean_direction() if doc_index is not None else None
+    if direction is None:
+        return None
+    q = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+    return float(direction @ q / (np.linalg.norm(q) or 1.0))
+
+
+def preload(namespace: Optional[str] = None, if_loaded: bool = False) -> bool:
+    """
+    Load (or reload, if changed on disk) a namespace's partition and its
+    document and BM25 indexes ahead of queries. With `if_loaded`, only
+    refresh a partition this process already holds. False if nothing was loaded.
+    """
+    if if_loaded and not _partitions.loaded(namespace):
+        return False
+    if _partitions.get(namespace) is None:
+        return False
+    load_document_index(namespace)
+    load_lexical_index(namespace)
+    return True
+
+
 def format_context(chunks: List[RetrievedChunk]) -> str:
     """
     Format retrieved chunks into a structured context string
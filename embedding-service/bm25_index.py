@@ -0,0 +1,278 @@
+"""
+embedding-service/bm25_index.py
+
+Compact BM25 inverted index over document chunks, used next to the FAISS
+index for hybrid (lexical + dense) retrieval.
+Used by:
+  - temporal-worker:   add each document's chunks during embed_and_index_activity
+  - biobert_embedder:  lexical candidates for retrieve_hybrid
+
+Operational text is full of identifiers (error codes, config keys, command
+names) that dense embeddings blur; the tokenizer keeps them whole
+("err-1042", "max_connections", "redis.conf") and also indexes their parts.
+
+Layout:
+  - chunk table: parallel arrays (document id, chunk index, length,
+    source type, alive flag); a chunk's row number is its id in postings
+  - postings: CSR arrays, term t -> rows[offsets[t]:offsets[t+1]] with
+    uint32 row ids and uint16 term frequencies (6 bytes per posting)
+  - chunks added since the last save go to small per-term delta arrays;
+    save() merges them and drops deleted rows
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BM25_INDEX_PATH = "/data/bm25_index/index.npz"
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[.\-/:][a-z0-9_]+)*")
+_SPLIT_RE = re.compile(r"[.\-/:]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word and identifier tokens. Compound identifiers are kept
+    whole and also split into their parts.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(p for p in _SPLIT_RE.split(token) if p and p not in STOPWORDS)
+    return tokens
+
+
+@contextmanager
+def locked(path: str):
+    """
+    Exclusive lock for the load -> add -> save cycle, so concurrent
+    ingestion activities do not overwrite each other's additions.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+
+        # chunk table, one row per indexed chunk
+        self.doc_ids: List[str] = []
+        self.chunk_indexes = array("I")
+        self.lengths = array("I")
+        self.source_codes = array("B")
+        self.alive = bytearray()
+        self.source_names: List[str] = []
+        self._rows_by_doc: Dict[str, List[int]] = {}
+        self._total_length = 0
+        self._n_alive = 0
+
+        # base postings (CSR) and postings added since the last save
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.uint32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._delta: Dict[int, Tuple[array, array]] = {}
+
+    # ── building ────────────────────────────────────────────────────────────
+
+    def add_document(self, document_id: str, chunks: List[str], source_type: str = "unknown"):
+        """
+        Index a document's chunks (chunk_index = position in `chunks`).
+        Re-adding a document replaces its previous chunks, so retried
+        ingestion activities stay idempotent.
+        """
+        self.remove_document(document_id)
+        if source_type not in self.source_names:
+            self.source_names.append(source_type)
+        source_code = self.source_names.index(source_type)
+
+        rows = self._rows_by_doc.setdefault(document_id, [])
+        for chunk_index, text in enumerate(chunks):
+            row = len(self.doc_ids)
+            tokens = tokenize(text)
+            for term, tf in Counter(tokens).items():
+                term_id = self.vocab.setdefault(term, len(self.vocab))
+                postings = self._delta.get(term_id)
+                if postings is None:
+                    postings = self._delta[term_id] = (array("I"), array("H"))
+                postings[0].append(row)
+                postings[1].append(min(tf, 65535))
+
+            self.doc_ids.append(document_id)
+            self.chunk_indexes.append(chunk_index)
+            self.lengths.append(len(tokens))
+            self.source_codes.append(source_code)
+            self.alive.append(1)
+            rows.append(row)
+            self._total_length += len(tokens)
+            self._n_alive += 1
+
+    def remove_document(self, document_id: str):
+        for row in self._rows_by_doc.pop(document_id, []):
+            if self.alive[row]:
+                self.alive[row] = 0
+                self._total_length -= self.lengths[row]
+                self._n_alive -= 1
+
+    # ── search ──────────────────────────────────────────────────────────────
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows, tfs = np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+        if term_id + 1 < len(self._offsets):
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            rows, tfs = self._rows[start:end], self._tfs[start:end]
+        delta = self._delta.get(term_id)
+        if delta is not None:
+            rows = np.concatenate([rows, np.frombuffer(delta[0], dtype=np.uint32)])
+            tfs = np.concatenate([tfs, np.frombuffer(delta[1], dtype=np.uint16)])
+        return rows, tfs
+
+    def search(self, query: str, k: int = 20, source_filter: Optional[str] = None) -> List[Tuple[str, int, float]]:
+        """
+        Top-k chunks by BM25 as (document_id, chunk_index, score), best first.
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or not self._n_alive:
+            return []
+
+        n = self._n_alive
+        avg_length = self._total_length / n
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term_id in term_ids:
+            rows, tfs = self._postings(term_id)
+            if not len(rows):
+                continue
+            df = len(rows)  # may include deleted rows until the next save
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[rows] / avg_length)
+            scores[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        scores *= np.frombuffer(self.alive, dtype=np.uint8)
+        if source_filter is not None:
+            if source_filter not in self.source_names:
+                return []
+            code = self.source_names.index(source_filter)
+            scores *= np.frombuffer(self.source_codes, dtype=np.uint8) == code
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.doc_ids[r], self.chunk_indexes[r], float(scores[r])) for r in hits]
+
+    # ── persistence ─────────────────────────────────────────────────────────
+
+    def compact(self):
+        """
+        Merge delta postings into the CSR arrays and drop deleted rows.
+        """
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        vocab_size = len(self.vocab)
+
+        base_terms = np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64), np.diff(self._offsets))
+        term_parts, row_parts, tf_parts = [base_terms], [self._rows], [self._tfs]
+        for term_id, (rows, tfs) in self._delta.items():
+            term_parts.append(np.full(len(rows), term_id, dtype=np.int64))
+            row_parts.append(np.frombuffer(rows, dtype=np.uint32))
+            tf_parts.append(np.frombuffer(tfs, dtype=np.uint16))
+        terms, rows, tfs = (np.concatenate(p) for p in (term_parts, row_parts, tf_parts))
+
+        keep = alive[rows] if len(rows) else np.zeros(0, dtype=bool)
+        new_row = np.cumsum(alive) - 1
+        terms, rows, tfs = terms[keep], new_row[rows[keep]].astype(np.uint32), tfs[keep]
+        order = np.argsort(terms, kind="stable")  # rows stay ascending within a term
+        self._rows, self._tfs = rows[order], tfs[order]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=vocab_size))]).astype(np.int64)
+        self._delta = {}
+
+        kept_rows = np.flatnonzero(alive)
+        self.doc_ids = [self.doc_ids[r] for r in kept_rows]
+        self.chunk_indexes = array("I", (self.chunk_indexes[r] for r in kept_rows))
+        self.lengths = array("I", (self.lengths[r] for r in kept_rows))
+        self.source_codes = array("B", (self.source_codes[r] for r in kept_rows))
+        self.alive = bytearray(b"\x01" * len(kept_rows))
+        self._rows_by_doc = {}
+        for row, document_id in enumerate(self.doc_ids):
+            self._rows_by_doc.setdefault(document_id, []).append(row)
+
+    def save(self, path: str = BM25_INDEX_PATH):
+        self.compact()
+        meta = json.dumps({
+            "k1": self.k1,
+            "b": self.b,
+            "terms": sorted(self.vocab, key=self.vocab.get),
+            "doc_ids": self.doc_ids,
+            "source_names": self.source_names,
+        }).encode("utf-8")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            offsets=self._offsets,
+            rows=self._rows,
+            tfs=self._tfs,
+            chunk_indexes=np.frombuffer(self.chunk_indexes, dtype=np.uint32),
+            lengths=np.frombuffer(self.lengths, dtype=np.uint32),
+            source_codes=np.frombuffer(self.source_codes, dtype=np.uint8),
+            meta=np.frombuffer(meta, dtype=np.uint8),
+        )
+        os.replace(tmp, path)  # readers see the old or the new file, never a partial one
+
+    @classmethod
+    def load(cls, path: str = BM25_INDEX_PATH) -> "BM25Index":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            index = cls(k1=meta["k1"], b=meta["b"])
+            index.vocab = {term: i for i, term in enumerate(meta["terms"])}
+            index.doc_ids = meta["doc_ids"]
+            index.source_names = meta["source_names"]
+            index._offsets = data["offsets"]
+            index._rows = data["rows"]
+            index._tfs = data["tfs"]
+            index.chunk_indexes = array("I", data["chunk_indexes"].tobytes())
+            index.lengths = array("I", data["lengths"].tobytes())
+            index.source_codes = array("B", data["source_codes"].tobytes())
+        index.alive = bytearray(b"\x01" * len(index.doc_ids))
+        index._total_length = int(sum(index.lengths))
+        index._n_alive = len(index.doc_ids)
+        for row, document_id in enumerate(index.doc_ids):
+            index._rows_by_doc.setdefault(document_id, []).append(row)
+        return index
+
+    @classmethod
+    def load_or_create(cls, path: str = BM25_INDEX_PATH) -> "BM25Index":
+        return cls.load(path) if os.path.exists(path) else cls()
+
+    def stats(self) -> dict:
+        return {
+            "chunks": self._n_alive,
+            "terms": len(self.vocab),
+            "postings": int(len(self._rows) + sum(len(r) for r, _ in self._delta.values())),
+            "postings_bytes": int(self._rows.nbytes + self._tfs.nbytes),
+        }
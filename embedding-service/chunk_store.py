@@ -0,0 +1,202 @@
+"""
+embedding-service/chunk_store.py
+
+Append-only on-disk chunk text store next to the FAISS index, read through
+a memory map.
+Used by:
+  - temporal-worker:   append each document's chunks during embed_and_index_activity
+  - biobert_embedder:  resolve retrieved vector ids to chunk text without a network call
+
+Files (per namespace partition, see partitions.py):
+  chunks.dat  blocks of JSON records ({"text", "source_type", "document_id",
+              "chunk_index"}), raw or zlib-compressed
+  chunks.idx  offset table, one fixed-size entry per FAISS row:
+              block offset, block size, record start + size inside the
+              (decompressed) block, codec
+
+Entry i describes FAISS row i. Rows written before the store existed have
+an empty entry; callers fall back to Redis for those.
+
+Chunk text never changes once written, so keeping it in Redis only costs
+memory and a round trip per hit. CHUNK_STORE_BACKEND=redis keeps the old
+behaviour (text in Redis, `chunk:{doc}:{i}` keys).
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CHUNK_STORE_BACKEND = os.environ.get("CHUNK_STORE_BACKEND", "mmap")  # "mmap" | "redis"
+CHUNK_STORE_COMPRESS = os.environ.get("CHUNK_STORE_COMPRESS", "true").lower() == "true"
+BLOCK_BYTES = 16 * 1024  # raw bytes per compressed block; one block is decompressed per read
+
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+ENTRY = np.dtype([
+    ("offset", "<u8"),
+    ("block_size", "<u4"),
+    ("start", "<u4"),
+    ("size", "<u4"),
+    ("codec", "u1"),
+])
+
+
+class ChunkStore:
+    def __init__(self, path: str, compress: bool = CHUNK_STORE_COMPRESS, cached_blocks: int = 64):
+        self.data_path = path + ".dat"
+        self.index_path = path + ".idx"
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._table: Optional[np.ndarray] = None
+        self._data: Optional[mmap.mmap] = None
+        self._mapped: Optional[tuple] = None  # file signature the maps were made from
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cached_blocks = cached_blocks
+
+    @classmethod
+    def open(cls, path: str) -> Optional["ChunkStore"]:
+        """Reader for an existing store, or None if nothing was written yet."""
+        return cls(path) if os.path.exists(path + ".idx") else None
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.index_path) // ENTRY.itemsize
+        except OSError:
+            return 0
+
+    # ── writing (ingestion worker, under the partition lock) ────────────────
+
+    def append(self, records: List[Dict], at_row: int):
+        """
+        Write `records` as rows at_row, at_row + 1, ... Entries past at_row
+        (a failed earlier attempt) are dropped; missing rows before it are
+        left empty.
+        """
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        rows = len(self)
+        kept = min(rows, at_row)
+        data_end = 0
+        if kept:
+            table = np.memmap(self.index_path, dtype=ENTRY, mode="r", shape=(kept,))
+            data_end = int((table["offset"] + table["block_size"]).max())
+            del table
+
+        entries = np.zeros(at_row - kept + len(records), dtype=ENTRY)
+        new = entries[at_row - kept:]
+        with open(self.data_path, "ab") as f:
+            f.truncate(data_end)
+            offset = data_end
+            for first, block in self._blocks_of(records):
+                raw = b"".join(block)
+                payload = zlib.compress(raw, 6) if self.compress else raw
+                start = 0
+                for i, record in enumerate(block, first):
+                    new[i] = (offset, len(payload), start, len(record),
+                              CODEC_ZLIB if self.compress else CODEC_RAW)
+                    start += len(record)
+                f.write(payload)
+                offset += len(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # offset table last: readers only trust rows it describes
+        with open(self.index_path, "ab") as f:
+            f.truncate(kept * ENTRY.itemsize)
+            f.write(entries.tobytes())
+
+    def _blocks_of(self, records: List[Dict]):
+        encoded = [json.dumps(r, separators=(",", ":")).encode("utf-8") for r in records]
+        if not self.compress:
+            for i, record in enumerate(encoded):
+                yield i, [record]
+            return
+        first, block, size = 0, [], 0
+        for i, record in enumerate(encoded):
+            block.append(record)
+            size += len(record)
+            if size >= BLOCK_BYTES:
+                yield first, block
+                first, block, size = i + 1, [], 0
+        if block:
+            yield first, block
+
+    # ── reading ─────────────────────────────────────────────────────────────
+
+    def _signature(self) -> tuple:
+        # (size, mtime) of both files: append() both grows and rewrites them
+        signature = []
+        for path in (self.index_path, self.data_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                signature.append((0, 0))
+        return tuple(signature)
+
+    def _remap(self, signature: tuple):
+        (index_size, _), (data_size, _) = signature
+        rows = index_size // ENTRY.itemsize
+        self._table = np.memmap(self.index_path, dtype=ENTRY, mode="r", shape=(rows,)) if rows else None
+        if self._data is not None:
+            self._data.close()
+        self._data = None
+        # cached blocks are keyed by offset, which a rewrite reuses
+        self._blocks.clear()
+        self._mapped = signature
+        if data_size:
+            with open(self.data_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, row: int) -> Optional[Dict]:
+        """Record at FAISS row `row`, or None if the store does not have it."""
+        with self._lock:
+            signature = self._signature()
+            if signature != self._mapped:
+                self._remap(signature)  # the ingestion worker wrote since we mapped
+            if self._table is None or row < 0 or row >= len(self._table):
+                return None
+            entry = self._table[row]
+            if not entry["block_size"]:
+                return None
+            offset, block_size = int(entry["offset"]), int(entry["block_size"])
+            if entry["codec"] == CODEC_ZLIB:
+                block = self._blocks.get(offset)
+                if block is None:
+                    block = zlib.decompress(self._data[offset:offset + block_size])
+                    self._blocks[offset] = block
+                    if len(self._blocks) > self._cached_blocks:
+                        self._blocks.popitem(last=False)
+                else:
+                    self._blocks.move_to_end(offset)
+                start = int(entry["start"])
+                raw = block[start:start + int(entry["size"])]
+            else:
+                raw = self._data[offset:offset + block_size]
+        return json.loads(raw)
+
+    def stats(self) -> dict:
+        rows = len(self)
+        data_bytes = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        return {
+            "rows": rows,
+            "data_bytes": data_bytes,
+            "index_bytes": rows * ENTRY.itemsize,
+            "compress": self.compress,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._data is not None:
+                self._data.close()
+                self._data = None
+            self._table = None
+            self._mapped = None
+            self._blocks.clear()
@@ -9,3 +9,8 @@ SERVICE_API_KEY = os.environ.get("SERVICE_API_KEY", "default-embedding-key")
 
 # Optional fallback LLM configuration
 FALLBACK_LLM_MODEL = os.environ.get("FALLBACK_LLM_MODEL", "gpt-4.0-mini")
+
+# Generation defaults and per-request limits (callers may pass model / max_tokens)
+LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", 512))
+LLM_MAX_TOKENS_LIMIT = int(os.environ.get("LLM_MAX_TOKENS_LIMIT", 2048))
+ALLOWED_LLM_MODELS = {m.strip() for m in os.environ.get("ALLOWED_LLM_MODELS", "gpt-4o-mini,gpt-4o").split(",") if m.strip()}
@@ -0,0 +1,184 @@
+"""
+embedding-service/doc_index.py
+
+Document-level vectors for two-stage (coarse-to-fine) dense retrieval.
+Used by:
+  - temporal-worker:   record each document's vector and FAISS rows during embed_and_index_activity
+  - biobert_embedder:  retrieve_two_stage (top documents first, then only their chunks)
+
+A document's vector is the mean of its chunk vectors. Each document keeps
+the contiguous FAISS row range its chunks were appended at, so stage two
+knows exactly which rows to score and which chunk each row is.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DOC_INDEX_PATH = "/data/faiss_index/documents.npz"
+
+
+class DocumentIndex:
+    def __init__(self, dim: int, uncovered_rows: int = 0):
+        self.dim = dim
+        # FAISS rows written before this index existed; two-stage search
+        # cannot reach them, so callers fall back to flat search while > 0
+        self.uncovered_rows = uncovered_rows
+        self.doc_ids: List[str] = []
+        self.source_types: List[str] = []
+        # capacity grows by doubling; the properties below expose the used part
+        self._first_rows = np.zeros(0, dtype=np.int64)
+        self._row_counts = np.zeros(0, dtype=np.int64)
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._position: Dict[str, int] = {}
+        self._mean_direction: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._position
+
+    @property
+    def first_rows(self) -> np.ndarray:
+        return self._first_rows[: len(self.doc_ids)]
+
+    @property
+    def row_counts(self) -> np.ndarray:
+        return self._row_counts[: len(self.doc_ids)]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: len(self.doc_ids)]
+
+    def _grow(self):
+        capacity = max(64, 2 * len(self._first_rows))
+        self._first_rows = np.resize(self._first_rows, capacity)
+        self._row_counts = np.resize(self._row_counts, capacity)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[: len(self._vectors)] = self._vectors
+        self._vectors = vectors
+
+    def add_document(self, document_id: str, first_row: int, chunk_vectors: np.ndarray,
+                     source_type: str = "unknown"):
+        """
+        Record a document whose chunk vectors were appended to FAISS at
+        rows [first_row, first_row + len(chunk_vectors)). Re-adding a
+        document (activity retry) points it at the newest rows.
+        """
+        vec = np.asarray(chunk_vectors, dtype=np.float32).mean(axis=0)
+        self._mean_direction = None
+        pos = self._position.get(document_id)
+        if pos is None:
+            pos = self._position[document_id] = len(self.doc_ids)
+            if pos == len(self._first_rows):
+                self._grow()
+            self.doc_ids.append(document_id)
+            self.source_types.append(source_type)
+        self.source_types[pos] = source_type
+        self._first_rows[pos] = first_row
+        self._row_counts[pos] = len(chunk_vectors)
+        self._vectors[pos] = vec
+
+    def top_documents(self, query_vec: np.ndarray, top_docs: int,
+                      source_filter: Optional[str] = None) -> np.ndarray:
+        """
+        Positions of the `top_docs` documents nearest the query (L2), best first.
+        """
+        q = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        dists = ((self.vectors - q) ** 2).sum(axis=1)
+        if source_filter is not None:
+            dists[np.array([s != source_filter for s in self.source_types], dtype=bool)] = np.inf
+        candidates = np.flatnonzero(np.isfinite(dists))
+        if len(candidates) > top_docs:
+            candidates = candidates[np.argpartition(dists[candidates], top_docs - 1)[:top_docs]]
+        return candidates[np.argsort(dists[candidates], kind="stable")]
+
+    def candidate_rows(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FAISS rows of the given documents and, per row, the position of
+        its document (chunk_index = row - first_row of that document).
+        """
+        if not len(positions):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        counts = self.row_counts[positions]
+        owners = np.repeat(positions, counts)
+        starts = np.repeat(self.first_rows[positions] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        rows = starts + np.arange(int(counts.sum()), dtype=np.int64)
+        return rows, owners
+
+    def chunk_of(self, row: int, owner: int) -> Tuple[str, int, str]:
+        """(document_id, chunk_index, source_type) of a candidate row."""
+        return self.doc_ids[owner], int(row - self.first_rows[owner]), self.source_types[owner]
+
+    def row_of(self, document_id: str, chunk_index: int) -> Optional[int]:
+        """FAISS row of a document's chunk, or None if the document is unknown."""
+        pos = self._position.get(document_id)
+        if pos is None or not 0 <= chunk_index < self.row_counts[pos]:
+            return None
+        return int(self.first_rows[pos]) + chunk_index
+
+    def mean_direction(self) -> Optional[np.ndarray]:
+        """
+        Mean of the unit-length document vectors: its dot product with a
+        unit query is the query's average cosine similarity to the documents.
+        """
+        if self._mean_direction is None and len(self.doc_ids):
+            vectors = self.vectors
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._mean_direction = (vectors / np.maximum(norms, 1e-12)).mean(axis=0)
+        return self._mean_direction
+
+    # ── persistence ─────────────────────────────────────────────────────────
+
+    def save(self, path: str = DOC_INDEX_PATH):
+        meta = json.dumps({
+            "dim": self.dim,
+            "uncovered_rows": self.uncovered_rows,
+            "doc_ids": self.doc_ids,
+            "source_types": self.source_types,
+        }).encode("utf-8")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            first_rows=self.first_rows,
+            row_counts=self.row_counts,
+            vectors=self.vectors,
+            meta=np.frombuffer(meta, dtype=np.uint8),
+        )
+        os.replace(tmp, path)  # readers see the old or the new file, never a partial one
+
+    @classmethod
+    def load(cls, path: str = DOC_INDEX_PATH) -> "DocumentIndex":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            index = cls(meta["dim"], uncovered_rows=meta["uncovered_rows"])
+            index._first_rows = data["first_rows"]
+            index._row_counts = data["row_counts"]
+            index._vectors = data["vectors"]
+        index.doc_ids = meta["doc_ids"]
+        index.source_types = meta["source_types"]
+        index._position = {doc_id: i for i, doc_id in enumerate(index.doc_ids)}
+        return index
+
+    @classmethod
+    def load_or_create(cls, dim: int, existing_rows: int = 0,
+                       path: str = DOC_INDEX_PATH) -> "DocumentIndex":
+        """
+        `existing_rows`: FAISS ntotal before this write; a new document index
+        over a non-empty FAISS index starts with those rows uncovered.
+        """
+        return cls.load(path) if os.path.exists(path) else cls(dim, uncovered_rows=existing_rows)
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.doc_ids),
+            "chunks": int(self.row_counts.sum()),
+            "uncovered_rows": self.uncovered_rows,
+            "bytes": int(self.vectors.nbytes),
+        }
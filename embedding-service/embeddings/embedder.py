@@ -1,7 +1,7 @@
 # embedding-service/embedder.py
 import os
 import openai
-from config import OPENAI_API_KEY, EMBEDDING_MODEL, LLM_MODEL
+from config import OPENAI_API_KEY, EMBEDDING_MODEL, LLM_MODEL, LLM_MAX_TOKENS
 openai.api_key = OPENAI_API_KEY
 
 class Embedder:
@@ -20,18 +20,37 @@ class Embedder:
         # NOTE: this calls OpenAI in a loop; consider using batch embeddings if available
         return [self.embed_text(t) for t in texts]
 
-    def fallback_llm(self, prompt: str):
+    def fallback_llm(self, prompt: str, model: str = None, max_tokens: int = None):
         """
         A simple fallback LLM call (synchronous).
         Adjust to your async flow if needed.
+        model / max_tokens are chosen per request by the LangGraph model router.
         """
         resp = openai.chat.completions.create(
-            model=LLM_MODEL,
+            model=model or LLM_MODEL,
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=512
+            max_tokens=max_tokens or LLM_MAX_TOKENS
         )
         # generic extraction
         choices = resp.get("choices", [])
         if choices:
             return choices[0].get("message", {}).get("content", "").strip()
         return ""
+
+    def stream_fallback_llm(self, prompt: str, model: str = None, max_tokens: int = None):
+        """
+        Same call as fallback_llm but yields content deltas as they arrive.
+        Synchronous generator; StreamingResponse iterates it in a threadpool.
+        """
+        stream = openai.chat.completions.create(
+            model=model or LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens or LLM_MAX_TOKENS,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
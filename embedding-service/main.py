@@ -1,8 +1,10 @@
 # embedding-service/main.py
-from fastapi import FastAPI, HTTPException, Header, Depends
+import json
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-from config import API_KEY
+from config import API_KEY, ALLOWED_LLM_MODELS, LLM_MAX_TOKENS_LIMIT
 from embedder import Embedder  # your existing logic
 
 app = FastAPI(title="Embedding Service")
@@ -20,22 +22,50 @@ class EmbedRequest(BaseModel):
 
 class LLMRequest(BaseModel):
     prompt: str
+    model: Optional[str] = None       # default: LLM_MODEL
+    max_tokens: Optional[int] = None  # default: LLM_MAX_TOKENS
+
+def check_llm_request(req: LLMRequest):
+    # callers pick the model (LangGraph model routing), but only from the allowed set
+    if req.model and ALLOWED_LLM_MODELS and req.model not in ALLOWED_LLM_MODELS:
+        raise HTTPException(status_code=400, detail=f"Model not allowed: {req.model}")
+    if req.max_tokens is not None and not 0 < req.max_tokens <= LLM_MAX_TOKENS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"max_tokens must be 1..{LLM_MAX_TOKENS_LIMIT}")
 
 # --------------------- Endpoints ---------------------
 @app.post("/llm_rag")
 async def llm_rag(req: LLMRequest, request: Request):
     auth_check(request)
+    check_llm_request(req)
     # This endpoint can be used for RAG-specific completions
     # Here we simply call fallback_llm for demonstration (could be specialized)
-    out = embedder.fallback_llm(req.prompt)
+    out = embedder.fallback_llm(req.prompt, req.model, req.max_tokens)
     return {"llm_output": out}
 
 @app.post("/fallback_llm")
 async def fallback_llm(req: LLMRequest, request: Request):
     auth_check(request)
-    out = embedder.fallback_llm(req.prompt)
+    check_llm_request(req)
+    out = embedder.fallback_llm(req.prompt, req.model, req.max_tokens)
     return {"output": out}
 
+# --------------------- Streaming (NDJSON: {"delta": "..."} per line) ---------------------
+def _ndjson_deltas(req: LLMRequest):
+    for delta in embedder.stream_fallback_llm(req.prompt, req.model, req.max_tokens):
+        yield json.dumps({"delta": delta}) + "\n"
+
+@app.post("/llm_rag/stream")
+async def llm_rag_stream(req: LLMRequest, request: Request):
+    auth_check(request)
+    check_llm_request(req)
+    return StreamingResponse(_ndjson_deltas(req), media_type="application/x-ndjson")
+
+@app.post("/fallback_llm/stream")
+async def fallback_llm_stream(req: LLMRequest, request: Request):
+    auth_check(request)
+    check_llm_request(req)
+    return StreamingResponse(_ndjson_deltas(req), media_type="application/x-ndjson")
+
 @app.post("/embed")
 async def embed(req: EmbedRequest, request: Request):
     auth_check(request)
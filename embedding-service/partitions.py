@@ -0,0 +1,305 @@
+"""
+embedding-service/partitions.py
+
+Per-namespace (customer) vector partitions, loaded lazily and evicted LRU
+under a memory budget.
+Used by:
+  - temporal-worker:   partition_paths(namespace) for every per-namespace file written at ingestion
+  - biobert_embedder:  PartitionCache.get(namespace) for retrieval
+
+Layout: each namespace has its own directory under PARTITION_ROOT with the
+FAISS index, raw vectors, chunk text store, document index and BM25 index.
+Documents uploaded without a namespace stay in the original global files.
+Vectors ingested into the global files before partitioning are copied into
+their namespaces by scripts/migrate_to_partitions.py; queries never fall
+back to the global index, which holds every customer's chunks.
+
+A query only touches its own namespace's vectors, and a process only holds
+the namespaces it has recently served. Partitions with at most
+BRUTE_FORCE_MAX_VECTORS vectors are held as a plain float32 matrix and
+searched with one NumPy matrix-vector product; larger ones keep their FAISS
+index (any FAISS_INDEX_TYPE, with exact re-ranking from the raw vectors).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from embedding_service.bm25_index import BM25_INDEX_PATH, BM25Index, locked
+from embedding_service.chunk_store import CHUNK_STORE_BACKEND, ChunkStore
+from embedding_service.doc_index import DOC_INDEX_PATH, DocumentIndex
+from embedding_service.quantization import (
+    FAISS_INDEX_TYPE, RAW_VECTORS_PATH, RawVectorStore, create_index, index_kind, migrate_index, search_index,
+)
+
+logger = logging.getLogger(__name__)
+
+FAISS_INDEX_PATH = "/data/faiss_index/index.faiss"
+CHUNK_STORE_PATH = "/data/faiss_index/chunks"  # + .dat / .idx
+PARTITION_ROOT = "/data/faiss_index/namespaces"
+PARTITION_MEMORY_BUDGET_MB = int(os.environ.get("PARTITION_MEMORY_BUDGET_MB", 2048))
+BRUTE_FORCE_MAX_VECTORS = int(os.environ.get("BRUTE_FORCE_MAX_VECTORS", 2000))
+# Redis pub/sub channel announcing {"namespace", "document_id"} after each index write,
+# so in-process readers (chat-orchestrator RAGEngine) reload before the next query
+INDEX_UPDATES_CHANNEL = "index_updates"
+
+_NAMESPACE_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+@dataclass(frozen=True)
+class PartitionPaths:
+    faiss: str
+    raw_vectors: str
+    chunks: str
+    documents: str
+    bm25: str
+
+
+def partition_paths(namespace: Optional[str]) -> PartitionPaths:
+    if not namespace:
+        return PartitionPaths(FAISS_INDEX_PATH, RAW_VECTORS_PATH, CHUNK_STORE_PATH, DOC_INDEX_PATH, BM25_INDEX_PATH)
+    if not _NAMESPACE_RE.fullmatch(namespace):
+        raise ValueError(f"Invalid namespace: {namespace!r}")
+    root = os.path.join(PARTITION_ROOT, namespace)
+    return PartitionPaths(
+        faiss=os.path.join(root, "index.faiss"),
+        raw_vectors=os.path.join(root, "vectors.f32"),
+        chunks=os.path.join(root, "chunks"),
+        documents=os.path.join(root, "documents.npz"),
+        bm25=os.path.join(root, "bm25.npz"),
+    )
+
+
+# (document_id, chunk vectors, chunk texts, source_type)
+DocumentVectors = Tuple[str, np.ndarray, List[str], str]
+
+
+def write_documents(namespace: Optional[str], documents: List[DocumentVectors]):
+    """
+    Append documents to a namespace's partition: FAISS index, raw vectors
+    (exact re-ranking of compressed indexes), chunk text by vector id,
+    document index (two-stage retrieval) and BM25 index (hybrid retrieval).
+
+    FAISS and the row-aligned files are written under one lock so concurrent
+    writers cannot interleave and shift each other's rows; the FAISS file is
+    replaced atomically and readers reload it when it changes. Re-adding a
+    document points it at its newest rows, so retries stay idempotent.
+    """
+    if not documents:
+        return
+    paths = partition_paths(namespace)
+    os.makedirs(os.path.dirname(paths.faiss), exist_ok=True)
+    dim = documents[0][1].shape[1]
+    with locked(paths.documents):
+        try:
+            index = faiss.read_index(paths.faiss)
+        except Exception:
+            # sq8 / pq start flat until there is enough data to train on
+            kind = FAISS_INDEX_TYPE if FAISS_INDEX_TYPE in ("flat", "fp16") else "flat"
+            index = create_index(kind, dim)
+
+        first_row = index.ntotal
+        first_rows = []
+        row = first_row
+        for _, vectors, _, _ in documents:
+            first_rows.append(row)
+            row += len(vectors)
+        all_vectors = np.vstack([vectors for _, vectors, _, _ in documents]).astype(np.float32)
+
+        store = RawVectorStore(paths.raw_vectors, dim=dim)
+        if store.sync(index):
+            store.append(all_vectors, at_row=first_row)
+        if CHUNK_STORE_BACKEND == "mmap":
+            ChunkStore(paths.chunks).append(
+                [
+                    {"text": text, "source_type": source_type, "document_id": document_id, "chunk_index": i}
+                    for document_id, _, texts, source_type in documents
+                    for i, text in enumerate(texts)
+                ],
+                at_row=first_row,
+            )
+        index.add(all_vectors)
+        index = migrate_index(index, FAISS_INDEX_TYPE, store)
+        faiss.write_index(index, paths.faiss + ".tmp")
+        os.replace(paths.faiss + ".tmp", paths.faiss)
+
+        doc_index = DocumentIndex.load_or_create(dim, existing_rows=first_row, path=paths.documents)
+        for (document_id, vectors, _, source_type), start in zip(documents, first_rows):
+            doc_index.add_document(document_id, start, vectors, source_type)
+        doc_index.save(paths.documents)
+
+    with locked(paths.bm25):
+        lexical = BM25Index.load_or_create(paths.bm25)
+        for document_id, _, texts, source_type in documents:
+            lexical.add_document(document_id, texts, source_type)
+        lexical.save(paths.bm25)
+
+
+class Partition:
+    """
+    One namespace's vectors in memory: a float32 matrix (brute force) or a
+    FAISS index plus the raw vector file for re-ranking. `chunks` maps
+    vector ids to chunk text (None with the Redis backend).
+    """
+
+    def __init__(self, namespace: Optional[str], mtime: float, index: Optional[faiss.Index] = None,
+                 matrix: Optional[np.ndarray] = None, store: Optional[RawVectorStore] = None,
+                 chunks: Optional[ChunkStore] = None):
+        self.namespace = namespace
+        self.mtime = mtime
+        self.index = index
+        self.matrix = matrix
+        self.store = store
+        self.chunks = chunks
+        if matrix is not None:
+            self._norms = (matrix ** 2).sum(axis=1)
+            self.rows = len(matrix)
+            self.kind = "numpy"
+            self.nbytes = matrix.nbytes + self._norms.nbytes
+        else:
+            self.rows = index.ntotal
+            self.kind = f"faiss:{index_kind(index)}"
+            self.nbytes = index.sa_code_size() * index.ntotal
+
+    @classmethod
+    def load(cls, namespace: Optional[str], brute_force_max: int = BRUTE_FORCE_MAX_VECTORS) -> "Partition":
+        paths = partition_paths(namespace)
+        mtime = os.path.getmtime(paths.faiss)
+        index = faiss.read_index(paths.faiss)
+        store = RawVectorStore(paths.raw_vectors, dim=index.d)
+        aligned = len(store) == index.ntotal
+        chunks = ChunkStore.open(paths.chunks) if CHUNK_STORE_BACKEND == "mmap" else None
+        if index.ntotal <= brute_force_max:
+            matrix = store.read(np.arange(index.ntotal)) if aligned else index.reconstruct_n(0, index.ntotal)
+            return cls(namespace, mtime, matrix=np.ascontiguousarray(matrix, dtype=np.float32), chunks=chunks)
+        return cls(namespace, mtime, index=index, store=store if aligned else None, chunks=chunks)
+
+    def search(self, query_vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as faiss Index.search: squared L2, -1 for missing results."""
+        if self.matrix is None:
+            return search_index(self.index, query_vecs, k, store=self.store)
+        distances = np.full((len(query_vecs), k), np.inf, dtype=np.float32)
+        indices = np.full((len(query_vecs), k), -1, dtype=np.int64)
+        n = min(k, self.rows)
+        if not n:
+            return distances, indices
+        for i, q in enumerate(query_vecs):
+            dists = self._norms - 2.0 * (self.matrix @ q) + float(q @ q)
+            best = np.argpartition(dists, n - 1)[:n] if n < self.rows else np.arange(self.rows)
+            best = best[np.argsort(dists[best], kind="stable")]
+            distances[i, :n] = dists[best]
+            indices[i, :n] = best
+        return distances, indices
+
+    def chunk(self, row: int) -> Optional[dict]:
+        """Chunk record of vector `row` from the on-disk store, or None."""
+        return self.chunks.get(int(row)) if self.chunks is not None else None
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Vectors at `rows`: exact when held as a matrix or the raw file is aligned."""
+        if self.matrix is not None:
+            return self.matrix[rows]
+        if self.store is not None:
+            return self.store.read(rows)
+        return self.index.reconstruct_batch(rows)
+
+
+class _NamespaceStats:
+    __slots__ = ("hits", "loads", "evictions")
+
+    def __init__(self):
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+
+class PartitionCache:
+    """
+    LRU of loaded partitions bounded by `memory_budget_bytes`. A partition
+    is reloaded when its FAISS file changes on disk (ingestion replaces it).
+    The most recently used partition is never evicted, so a single
+    namespace larger than the budget still serves.
+    """
+
+    def __init__(self, memory_budget_bytes: int = PARTITION_MEMORY_BUDGET_MB * 1024 * 1024,
+                 brute_force_max: int = BRUTE_FORCE_MAX_VECTORS):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.brute_force_max = brute_force_max
+        self._partitions: "OrderedDict[Optional[str], Partition]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[Optional[str], _NamespaceStats] = {}
+
+    def get(self, namespace: Optional[str]) -> Optional[Partition]:
+        """Loaded partition for `namespace`, or None if it has no vectors yet."""
+        try:
+            mtime = os.path.getmtime(partition_paths(namespace).faiss)
+        except OSError:
+            return None
+        with self._lock:
+            stats = self._stats.setdefault(namespace, _NamespaceStats())
+            partition = self._partitions.get(namespace)
+            if partition is not None and partition.mtime == mtime:
+                self._partitions.move_to_end(namespace)
+                stats.hits += 1
+                return partition
+
+        # load outside the lock; concurrent loads of one namespace are harmless
+        partition = Partition.load(namespace, self.brute_force_max)
+        with self._lock:
+            old = self._partitions.pop(namespace, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._partitions[namespace] = partition
+            self._bytes += partition.nbytes
+            stats.loads += 1
+            self._evict()
+        logger.info(f"Loaded partition namespace={namespace} kind={partition.kind} rows={partition.rows} "
+                    f"bytes={partition.nbytes} cache_bytes={self._bytes}")
+        return partition
+
+    def loaded(self, namespace: Optional[str]) -> bool:
+        with self._lock:
+            return namespace in self._partitions
+
+    def _evict(self):
+        while self._bytes > self.memory_budget_bytes and len(self._partitions) > 1:
+            namespace, partition = self._partitions.popitem(last=False)
+            self._bytes -= partition.nbytes
+            if partition.chunks is not None:
+                partition.chunks.close()
+            self._stats[namespace].evictions += 1
+            logger.info(f"Evicted partition namespace={namespace} bytes={partition.nbytes}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {}
+            for namespace, s in self._stats.items():
+                partition = self._partitions.get(namespace)
+                requests = s.hits + s.loads
+                namespaces[namespace or "_global"] = {
+                    "loaded": partition is not None,
+                    "kind": partition.kind if partition else None,
+                    "rows": partition.rows if partition else None,
+                    "bytes": partition.nbytes if partition else 0,
+                    "hits": s.hits,
+                    "loads": s.loads,
+                    "evictions": s.evictions,
+                    "hit_rate": round(s.hits / requests, 3) if requests else 0.0,
+                }
+            return {
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "bytes": self._bytes,
+                "loaded": len(self._partitions),
+                "brute_force_max": self.brute_force_max,
+                "namespaces": namespaces,
+            }
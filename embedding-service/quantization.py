@@ -0,0 +1,184 @@
+"""
+embedding-service/quantization.py
+
+Compressed FAISS storage for chunk vectors, with exact re-ranking.
+Used by:
+  - temporal-worker:   create / migrate the FAISS index and append raw vectors during embed_and_index_activity
+  - biobert_embedder:  search_index (approximate search + exact re-rank)
+
+A flat index keeps 768 float32 values (3 KB) per chunk. FAISS_INDEX_TYPE
+selects the in-memory encoding:
+
+  flat   3072 B/vector  exact
+  fp16   1536 B/vector  float16, near-exact
+  sq8     768 B/vector  8-bit scalar quantizer (per-dimension min/max)
+  pq       96 B/vector  product quantizer, PQ_M sub-vectors x 8 bits
+
+The original float32 vectors are also appended to a raw file on disk
+(RAW_VECTORS_PATH, row i = FAISS row i). Searches over a compressed index
+fetch RERANK_FACTOR x k candidates and re-rank them with exact distances
+read from that file through a memory map, so only the touched rows are
+paged in.
+
+sq8 and pq need training data. Until the raw file holds MIN_TRAIN
+vectors the index stays flat; the first write after that rebuilds it in
+the configured encoding from the raw file.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat")  # "flat" | "fp16" | "sq8" | "pq"
+PQ_M = int(os.environ.get("PQ_M", 96))  # sub-vectors per vector; must divide the dimension
+RERANK_FACTOR = int(os.environ.get("RERANK_FACTOR", 4))  # 0 disables exact re-ranking
+RAW_VECTORS_PATH = "/data/faiss_index/vectors.f32"
+
+MIN_TRAIN = {"flat": 0, "fp16": 0, "sq8": 1000, "pq": 40 * 256}
+TRAIN_SAMPLE = 50000
+
+
+def factory_string(kind: str, pq_m: int = PQ_M) -> str:
+    if kind == "flat":
+        return "Flat"
+    if kind == "fp16":
+        return "SQfp16"
+    if kind == "sq8":
+        return "SQ8"
+    if kind == "pq":
+        return f"PQ{pq_m}x8"
+    raise ValueError(f"Unknown FAISS index type: {kind}")
+
+
+def index_kind(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return type(index).__name__
+
+
+def create_index(kind: str, dim: int, training: Optional[np.ndarray] = None) -> faiss.Index:
+    """
+    Empty index of the given kind, trained on `training` when it needs it.
+    """
+    index = faiss.index_factory(dim, factory_string(kind))
+    if not index.is_trained:
+        if training is None or len(training) < MIN_TRAIN[kind]:
+            raise ValueError(f"{kind} index needs at least {MIN_TRAIN[kind]} training vectors")
+        index.train(np.ascontiguousarray(training, dtype=np.float32))
+    return index
+
+
+class RawVectorStore:
+    """
+    Append-only float32 file; row i holds the vector at FAISS row i.
+    """
+
+    def __init__(self, path: str = RAW_VECTORS_PATH, dim: int = 768):
+        self.path = path
+        self.dim = dim
+        self._row_bytes = dim * 4
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.path) // self._row_bytes
+        except OSError:
+            return 0
+
+    def append(self, vectors: np.ndarray, at_row: int):
+        """
+        Write `vectors` starting at `at_row`, dropping any rows past it
+        (left behind by a failed earlier attempt).
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.truncate(at_row * self._row_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+    def matrix(self) -> np.ndarray:
+        return np.memmap(self.path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+
+    def read(self, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(self.matrix()[np.asarray(rows, dtype=np.int64)])
+
+    def sample(self, n: int, seed: int = 0) -> np.ndarray:
+        matrix = self.matrix()
+        if len(matrix) <= n:
+            return np.asarray(matrix)
+        rows = np.sort(np.random.default_rng(seed).choice(len(matrix), n, replace=False))
+        return np.asarray(matrix[rows])
+
+    def sync(self, index: faiss.Index) -> bool:
+        """
+        Bring the file in line with `index` before appending: trim extra
+        rows, or backfill missing ones from a flat index (exact). Returns
+        False when the rows cannot be recovered (compressed index built
+        before the raw file existed); re-ranking is then unavailable.
+        """
+        rows, ntotal = len(self), index.ntotal
+        if rows > ntotal:
+            self.append(np.zeros((0, self.dim), dtype=np.float32), at_row=ntotal)
+        elif rows < ntotal:
+            if index_kind(index) != "flat":
+                return False
+            self.append(index.reconstruct_n(rows, ntotal - rows), at_row=rows)
+            logger.info(f"Backfilled {ntotal - rows} raw vectors from the flat index")
+        return True
+
+
+def migrate_index(index: faiss.Index, kind: str, store: RawVectorStore) -> faiss.Index:
+    """
+    Rebuild `index` in the configured encoding from the raw vectors once
+    there are enough of them to train on; otherwise return it unchanged.
+    """
+    if index_kind(index) == kind or len(store) != index.ntotal or len(store) < MIN_TRAIN[kind]:
+        return index
+    vectors = store.matrix()
+    rebuilt = create_index(kind, index.d, training=store.sample(TRAIN_SAMPLE))
+    for start in range(0, len(vectors), 50000):
+        rebuilt.add(np.asarray(vectors[start:start + 50000]))
+    logger.info(f"Rebuilt FAISS index as {kind}: {rebuilt.ntotal} vectors, "
+                f"{rebuilt.sa_code_size()} B/vector")
+    return rebuilt
+
+
+def search_index(
+    index: faiss.Index,
+    query_vecs: np.ndarray,
+    k: int,
+    store: Optional[RawVectorStore] = None,
+    rerank_factor: int = RERANK_FACTOR,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    index.search with exact re-ranking for compressed indexes: fetch
+    rerank_factor x k candidates, recompute squared L2 distances from the
+    raw vectors, keep the best k. Same (distances, indices) shapes as
+    faiss; missing results are -1.
+    """
+    exact = index_kind(index) == "flat" or not rerank_factor
+    if exact or store is None or len(store) != index.ntotal:
+        return index.search(query_vecs, k)
+
+    _, candidates = index.search(query_vecs, k * rerank_factor)
+    distances = np.full((len(query_vecs), k), np.inf, dtype=np.float32)
+    indices = np.full((len(query_vecs), k), -1, dtype=np.int64)
+    for i, (q, rows) in enumerate(zip(query_vecs, candidates)):
+        rows = rows[rows >= 0]
+        if not len(rows):
+            continue
+        dists = ((store.read(rows) - q) ** 2).sum(axis=1)
+        best = np.argsort(dists, kind="stable")[:k]
+        distances[i, : len(best)] = dists[best]
+        indices[i, : len(best)] = rows[best]
+    return distances, indices
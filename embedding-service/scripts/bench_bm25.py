@@ -0,0 +1,91 @@
+# embedding-service/scripts/bench_bm25.py
+"""
+Build / size / query-latency benchmark for the BM25 index on a synthetic corpus.
+
+The corpus mimics operational docs: Zipf-distributed vocabulary plus planted
+identifiers (error codes, config keys). Each identifier query must rank its
+planted chunk first.
+
+Run from embedding-service/:
+    python -m scripts.bench_bm25 --chunks 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bm25_index import BM25Index  # noqa: E402
+
+
+def _corpus(n_chunks: int, words_per_chunk: int, vocab_size: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    identifiers = {}
+    docs = {}
+    chunks_per_doc = 20
+    for d in range(n_chunks // chunks_per_doc):
+        chunks = []
+        for c in range(chunks_per_doc):
+            words = rng.choices(vocab, weights=weights, k=words_per_chunk)
+            if rng.random() < 0.05:
+                ident = f"ERR-{rng.randint(1000, 99999)}" if rng.random() < 0.5 else f"svc.max_conn_{d}_{c}"
+                words.insert(rng.randrange(len(words)), ident)
+                identifiers[ident.lower()] = (f"doc{d}", c)
+            chunks.append(" ".join(words))
+        docs[f"doc{d}"] = chunks
+    return docs, identifiers, vocab
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--vocab", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    docs, identifiers, vocab = _corpus(args.chunks, args.words, args.vocab)
+    index = BM25Index()
+    start = time.perf_counter()
+    for doc_id, chunks in docs.items():
+        index.add_document(doc_id, chunks, "guide")
+    build_s = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(), "index.npz")
+    start = time.perf_counter()
+    index.save(path)
+    save_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index = BM25Index.load(path)
+    load_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    queries = [" ".join(rng.choices(vocab[:5000], k=rng.randint(3, 6))) for _ in range(args.queries)]
+    idents = list(identifiers.items())[: args.queries]
+    timings = []
+    for q in queries + [f"how to fix {ident}" for ident, _ in idents]:
+        t = time.perf_counter()
+        index.search(q, k=20)
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    top1 = sum(
+        1 for ident, (doc_id, chunk_index) in idents
+        if (index.search(ident, k=1) or [(None, None, 0)])[0][:2] == (doc_id, chunk_index)
+    )
+
+    stats = index.stats()
+    print(f"chunks={stats['chunks']} terms={stats['terms']} postings={stats['postings']}")
+    print(f"build={build_s:.1f}s save={save_s:.2f}s load={load_s:.2f}s file={os.path.getsize(path) / 1e6:.1f}MB "
+          f"postings={stats['postings_bytes'] / 1e6:.1f}MB")
+    print(f"search k=20: mean={statistics.mean(timings):.2f}ms p50={timings[len(timings) // 2]:.2f}ms "
+          f"p99={timings[int(len(timings) * 0.99)]:.2f}ms")
+    print(f"identifier queries top-1: {top1}/{len(idents)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# embedding-service/scripts/bench_chunk_store.py
+"""
+On-disk chunk store: bytes per chunk (raw vs zlib blocks) and random-read
+latency by vector id, optionally against Redis GET of the same records.
+
+Chunks are synthetic ~512-word windows over a Zipf vocabulary, the size the
+ingestion worker produces.
+
+Run from embedding-service/:
+    python -m scripts.bench_chunk_store --chunks 50000
+    python -m scripts.bench_chunk_store --redis-url redis://localhost:6379/0
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chunk_store import ChunkStore  # noqa: E402
+
+
+def _chunks(n: int, words: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(20000)] + ["redis", "timeout", "ERR-1042", "max_connections", "restart"]
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]
+    per_doc = 20
+    return [
+        {"text": " ".join(rng.choices(vocab, weights=weights, k=words)), "source_type": "guide",
+         "document_id": f"doc{i // per_doc}", "chunk_index": i % per_doc}
+        for i in range(n)
+    ]
+
+
+def _timings(fn, rows):
+    out = []
+    for row in rows:
+        t = time.perf_counter()
+        fn(row)
+        out.append((time.perf_counter() - t) * 1000)
+    out.sort()
+    return out[len(out) // 2], out[int(len(out) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=512)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    records = _chunks(args.chunks, args.words)
+    json_bytes = sum(len(json.dumps(r)) for r in records)
+    rng = random.Random(1)
+    rows = [rng.randrange(args.chunks) for _ in range(args.reads)]
+    print(f"{args.chunks} chunks, {json_bytes / args.chunks:.0f} B/chunk as JSON")
+    print(f"{'store':>10} {'write s':>8} {'data MB':>8} {'B/chunk':>8} {'p50 ms':>7} {'p99 ms':>7}")
+
+    for compress in (False, True):
+        store = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks"), compress=compress)
+        start = time.perf_counter()
+        for first in range(0, args.chunks, 20):  # one append per document, as ingestion does
+            store.append(records[first:first + 20], at_row=first)
+        write_s = time.perf_counter() - start
+        stats = store.stats()
+        per_chunk = (stats["data_bytes"] + stats["index_bytes"]) / args.chunks
+        reader = ChunkStore.open(store.data_path[:-4])
+        assert reader.get(rows[0]) == records[rows[0]]
+        p50, p99 = _timings(reader.get, rows)
+        name = "mmap+zlib" if compress else "mmap"
+        print(f"{name:>10} {write_s:>8.1f} {stats['data_bytes'] / 1e6:>8.1f} {per_chunk:>8.0f} {p50:>7.3f} {p99:>7.3f}")
+
+    if args.redis_url:
+        import redis
+        r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+        pipe = r.pipeline()
+        for i, rec in enumerate(records):
+            pipe.set(f"bench:chunk:{i}", json.dumps(rec))
+            if i % 1000 == 999:
+                pipe.execute()
+        pipe.execute()
+        p50, p99 = _timings(lambda row: json.loads(r.get(f"bench:chunk:{row}")), rows)
+        print(f"{'redis GET':>10} {'':>8} {'':>8} {json_bytes / args.chunks:>8.0f} {p50:>7.3f} {p99:>7.3f}")
+        for start in range(0, len(records), 1000):
+            r.delete(*[f"bench:chunk:{i}" for i in range(start, min(start + 1000, len(records)))])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# embedding-service/scripts/bench_partitions.py
+"""
+Multi-tenant partition cache simulation: per-namespace sizes, kinds and hit
+rates under a memory budget, plus query latency of one global index vs the
+namespace's own partition.
+
+Namespace sizes and traffic are both Zipf-skewed (a few large, busy
+customers and a long tail of tiny ones). Partitions are written to a temp
+directory in the same layout the ingestion worker uses.
+
+Run from embedding-service/:
+    python -m scripts.bench_partitions --namespaces 40 --budget-mb 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+
+import faiss
+import numpy as np
+
+# services import this directory as the embedding_service package
+_pkg = types.ModuleType("embedding_service")
+_pkg.__path__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+sys.modules.setdefault("embedding_service", _pkg)
+
+from embedding_service import partitions  # noqa: E402
+from embedding_service.quantization import RawVectorStore, create_index  # noqa: E402
+
+
+def _p50(values):
+    return sorted(values)[len(values) // 2] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--namespaces", type=int, default=40)
+    parser.add_argument("--largest", type=int, default=40000, help="vectors in the largest namespace")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--budget-mb", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(0)
+    partitions.PARTITION_ROOT = tempfile.mkdtemp()
+
+    names = [f"customer-{i:02d}" for i in range(args.namespaces)]
+    sizes = [max(20, int(args.largest / (i + 1) ** 1.2)) for i in range(args.namespaces)]
+    all_vectors = []
+    for name, size in zip(names, sizes):
+        vectors = rng.normal(size=(size, args.dim)).astype(np.float32)
+        paths = partitions.partition_paths(name)
+        os.makedirs(os.path.dirname(paths.faiss), exist_ok=True)
+        index = create_index("flat", args.dim)
+        index.add(vectors)
+        faiss.write_index(index, paths.faiss)
+        RawVectorStore(paths.raw_vectors, dim=args.dim).append(vectors, at_row=0)
+        all_vectors.append(vectors)
+    global_index = create_index("flat", args.dim)
+    global_index.add(np.vstack(all_vectors))
+
+    cache = partitions.PartitionCache(memory_budget_bytes=args.budget_mb * 1024 * 1024)
+    traffic = 1.0 / (np.arange(args.namespaces) + 1) ** 1.1
+    picks = rng.choice(args.namespaces, size=args.queries, p=traffic / traffic.sum())
+
+    partitioned_ms, global_ms, by_kind = [], [], {}
+    for pick in picks:
+        q = rng.normal(size=(1, args.dim)).astype(np.float32)
+        t = time.perf_counter()
+        partition = cache.get(names[pick])
+        partition.search(q, args.k)
+        elapsed = (time.perf_counter() - t) * 1000
+        partitioned_ms.append(elapsed)
+        by_kind.setdefault(partition.kind, []).append(elapsed)
+        if len(global_ms) < 200:
+            t = time.perf_counter()
+            global_index.search(q, args.k)
+            global_ms.append((time.perf_counter() - t) * 1000)
+
+    # tiny namespace: NumPy brute force vs FAISS flat on the same vectors
+    tiny = all_vectors[-1]
+    tiny_index = create_index("flat", args.dim)
+    tiny_index.add(tiny)
+    tiny_partition = partitions.Partition(None, 0.0, matrix=tiny)
+    q = rng.normal(size=(1, args.dim)).astype(np.float32)
+    numpy_ms, faiss_ms = [], []
+    for _ in range(500):
+        t = time.perf_counter()
+        tiny_partition.search(q, args.k)
+        numpy_ms.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        tiny_index.search(q, args.k)
+        faiss_ms.append((time.perf_counter() - t) * 1000)
+
+    stats = cache.stats()
+    print(f"{'namespace':<12} {'vectors':>8} {'kind':>11} {'MB':>6} {'hits':>6} {'loads':>6} {'evict':>6} {'hit rate':>8}")
+    for name, size in zip(names, sizes):
+        s = stats["namespaces"].get(name)
+        if s is None:
+            continue
+        print(f"{name:<12} {size:>8} {s['kind'] or '-':>11} {s['bytes'] / 1e6:>6.1f} {s['hits']:>6} "
+              f"{s['loads']:>6} {s['evictions']:>6} {s['hit_rate']:>8.3f}")
+    hits = sum(s["hits"] for s in stats["namespaces"].values())
+    print(f"\nbudget={args.budget_mb}MB resident={stats['bytes'] / 1e6:.1f}MB loaded={stats['loaded']}/"
+          f"{args.namespaces} overall hit rate={hits / args.queries:.3f}")
+    print(f"global index ({global_index.ntotal} vectors) p50={_p50(global_ms):.2f}ms; "
+          f"partitioned p50={_p50(partitioned_ms):.2f}ms (including loads)")
+    for kind, timings in sorted(by_kind.items()):
+        print(f"  {kind:<11} queries={len(timings):>5} p50={_p50(timings):.3f}ms")
+    print(f"tiny namespace ({len(tiny)} vectors): numpy p50={_p50(numpy_ms):.3f}ms faiss flat p50={_p50(faiss_ms):.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
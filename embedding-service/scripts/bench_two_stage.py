@@ -0,0 +1,90 @@
+# embedding-service/scripts/bench_two_stage.py
+"""
+Two-stage (document -> chunk) vs flat dense search: latency and recall@k.
+
+Synthetic corpus with topical structure: topic centers, documents scattered
+around a topic, chunks scattered around their document. Queries are noisy
+copies of random chunks. Flat search scores every chunk vector (what
+IndexFlatL2 does); two-stage scores the document vectors, then only the
+chunks of the top-M documents. Recall is measured against the flat top-k.
+
+Run from embedding-service/:
+    python -m scripts.bench_two_stage --sizes 10000 50000 100000 --top-docs 10 20 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from doc_index import DocumentIndex  # noqa: E402
+
+
+def _corpus(n_chunks: int, dim: int, rng: np.random.Generator):
+    n_topics = 64
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    vectors, documents, row = [], DocumentIndex(dim), 0
+    d = 0
+    while row < n_chunks:
+        count = int(min(rng.integers(5, 40), n_chunks - row))
+        center = topics[rng.integers(n_topics)] + 0.6 * rng.normal(size=dim).astype(np.float32)
+        chunks = center + 0.5 * rng.normal(size=(count, dim)).astype(np.float32)
+        vectors.append(chunks)
+        documents.add_document(f"doc{d}", row, chunks, "guide")
+        row += count
+        d += 1
+    return np.vstack(vectors), documents
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--top-docs", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'chunks':>8} {'docs':>6} {'mode':>10} {'p50 ms':>8} {'p99 ms':>8} {'scored':>8} {'recall@' + str(args.k):>10}")
+    for size in args.sizes:
+        vectors, documents = _corpus(size, args.dim, rng)
+        norms = (vectors ** 2).sum(axis=1)
+        picks = rng.integers(len(vectors), size=args.queries)
+        queries = vectors[picks] + 0.5 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+        truth, flat_ms = [], []
+        for q in queries:
+            t = time.perf_counter()
+            dists = norms - 2.0 * (vectors @ q)
+            top = np.argpartition(dists, args.k)[: args.k]
+            flat_ms.append((time.perf_counter() - t) * 1000)
+            truth.append(set(top.tolist()))
+        print(f"{size:>8} {len(documents):>6} {'flat':>10} {_percentile(flat_ms, 0.5):>8.2f} "
+              f"{_percentile(flat_ms, 0.99):>8.2f} {size:>8} {1.0:>10.3f}")
+
+        for top_docs in args.top_docs:
+            timings, hits, scored = [], 0, 0
+            for q, expected in zip(queries, truth):
+                t = time.perf_counter()
+                positions = documents.top_documents(q, top_docs)
+                rows, _ = documents.candidate_rows(positions)
+                dists = ((vectors[rows] - q) ** 2).sum(axis=1)  # as retrieve_two_stage
+                best = rows[np.argsort(dists, kind="stable")[: args.k]]
+                timings.append((time.perf_counter() - t) * 1000)
+                hits += len(expected & set(best.tolist()))
+                scored += len(rows)
+            print(f"{size:>8} {len(documents):>6} {'M=' + str(top_docs):>10} {_percentile(timings, 0.5):>8.2f} "
+                  f"{_percentile(timings, 0.99):>8.2f} {scored // len(queries):>8} "
+                  f"{hits / (args.k * len(queries)):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# embedding-service/scripts/migrate_to_partitions.py
+"""
+Copy documents indexed into the global files before namespace partitions
+existed into their namespace's partition, so namespaced queries find them.
+
+Vectors are read back from the global index (raw vector file when aligned,
+else reconstructed) and chunk text from the global chunk store or Redis;
+nothing is re-embedded. The global files are left as they are, so
+queries without a namespace are unaffected. Documents already present in
+their target partition are skipped, so the script can be rerun.
+
+The document -> namespace mapping comes from the upload service's
+documents table, e.g.:
+    psql "$POSTGRES_DSN" -c "\\copy (select id, namespace from documents) to 'namespaces.csv' csv"
+
+Run from embedding-service/:
+    python -m scripts.migrate_to_partitions namespaces.csv --dry-run
+    python -m scripts.migrate_to_partitions namespaces.csv --redis-url redis://redis:6379/0
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+# services import this directory as the embedding_service package
+_pkg = types.ModuleType("embedding_service")
+_pkg.__path__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+sys.modules.setdefault("embedding_service", _pkg)
+
+from embedding_service.doc_index import DocumentIndex  # noqa: E402
+from embedding_service.partitions import (  # noqa: E402
+    INDEX_UPDATES_CHANNEL, Partition, partition_paths, write_documents,
+)
+
+
+def _mapping(path: str) -> dict:
+    with open(path, newline="") as f:
+        return {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2 and row[1]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mapping", help="CSV of document_id,namespace")
+    parser.add_argument("--redis-url", help="chunk text for rows missing from the chunk store, and reload notices")
+    parser.add_argument("--batch-docs", type=int, default=500, help="documents written per partition update")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    mapping = _mapping(args.mapping)
+    source = Partition.load(None, brute_force_max=0)
+    documents = DocumentIndex.load(partition_paths(None).documents)
+    r = None
+    if args.redis_url:
+        import redis
+        r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+
+    by_namespace = {}
+    unmapped = 0
+    for pos, document_id in enumerate(documents.doc_ids):
+        namespace = mapping.get(document_id)
+        if namespace is None:
+            unmapped += 1
+        else:
+            by_namespace.setdefault(namespace, []).append(pos)
+    print(f"global index: {source.rows} vectors, {len(documents)} documents "
+          f"({documents.uncovered_rows} rows predate the document index and cannot be attributed); "
+          f"{unmapped} documents without a namespace stay global-only")
+
+    start = time.perf_counter()
+    copied = skipped = missing = 0
+    for namespace, positions in sorted(by_namespace.items()):
+        target_path = partition_paths(namespace).documents
+        existing = DocumentIndex.load(target_path) if os.path.exists(target_path) else None
+        todo = [p for p in positions if existing is None or documents.doc_ids[p] not in existing]
+        skipped += len(positions) - len(todo)
+        if args.dry_run:
+            print(f"{namespace}: {len(todo)} documents to copy, {len(positions) - len(todo)} already present")
+            continue
+
+        written = 0
+        for i in range(0, len(todo), args.batch_docs):
+            batch = []
+            for pos in todo[i:i + args.batch_docs]:
+                document_id = documents.doc_ids[pos]
+                first, count = int(documents.first_rows[pos]), int(documents.row_counts[pos])
+                rows = np.arange(first, first + count, dtype=np.int64)
+                texts = []
+                for chunk_index, row in enumerate(rows):
+                    meta = source.chunk(row)
+                    if meta is None and r is not None:
+                        raw = r.get(f"chunk:{document_id}:{chunk_index}")
+                        meta = json.loads(raw) if raw else None
+                    if meta is None:
+                        break
+                    texts.append(meta["text"])
+                if len(texts) != count:
+                    missing += 1
+                    print(f"  {document_id}: chunk text not found, skipped")
+                    continue
+                batch.append((document_id, source.vectors(rows), texts, documents.source_types[pos]))
+            write_documents(namespace, batch)
+            written += len(batch)
+        copied += written
+        print(f"{namespace}: copied {written} documents")
+        if r is not None and written:
+            r.publish(INDEX_UPDATES_CHANNEL, json.dumps({"namespace": namespace, "document_id": None}))
+
+    print(f"\n{len(by_namespace)} namespaces: {copied} documents copied, {skipped} already present, "
+          f"{missing} without chunk text, in {time.perf_counter() - start:.1f}s"
+          + (" (dry run)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# embedding-service/scripts/report_quantization.py
+"""
+Bytes per vector, recall@k and search latency for each FAISS_INDEX_TYPE,
+with and without exact re-ranking from the raw vectors.
+
+Uses the production raw vector file when given (--vectors, float32 rows as
+written by the ingestion worker), otherwise a synthetic topical corpus.
+Recall is measured against exact flat search; latency is per single query,
+as in retrieve_top_k.
+
+Run from embedding-service/:
+    python -m scripts.report_quantization --chunks 50000
+    python -m scripts.report_quantization --vectors /data/faiss_index/vectors.f32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quantization import TRAIN_SAMPLE, RawVectorStore, create_index, search_index  # noqa: E402
+
+
+def _synthetic(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    topics = rng.normal(size=(64, dim)).astype(np.float32)
+    docs = topics[rng.integers(64, size=n // 20 + 1)] + 0.6 * rng.normal(size=(n // 20 + 1, dim)).astype(np.float32)
+    return docs[np.arange(n) // 20] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", help="raw float32 vector file (default: synthetic corpus)")
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--kinds", nargs="+", default=["flat", "fp16", "sq8", "pq"])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4])
+    args = parser.parse_args()
+    faiss.omp_set_num_threads(1)  # one request = one search thread
+    rng = np.random.default_rng(0)
+
+    if args.vectors:
+        store = RawVectorStore(args.vectors, dim=args.dim)
+    else:
+        store = RawVectorStore(os.path.join(tempfile.mkdtemp(), "vectors.f32"), dim=args.dim)
+        store.append(_synthetic(args.chunks, args.dim, rng), at_row=0)
+    vectors = np.asarray(store.matrix())
+    picks = rng.integers(len(vectors), size=args.queries)
+    queries = vectors[picks] + 0.5 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    exact = create_index("flat", args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors, dim {args.dim}, k={args.k}, {args.queries} queries")
+    print(f"{'type':>6} {'rerank':>6} {'B/vec':>6} {'index MB':>9} {'build s':>8} {'p50 ms':>7} {'p99 ms':>7} {'recall':>7}")
+    for kind in args.kinds:
+        start = time.perf_counter()
+        index = create_index(kind, args.dim, training=store.sample(TRAIN_SAMPLE)) if kind != "flat" else exact
+        if index is not exact:
+            index.add(vectors)
+        build_s = time.perf_counter() - start
+        for rerank in args.rerank:
+            if kind == "flat" and rerank:
+                continue
+            timings, hits = [], 0
+            for q, expected in zip(queries, truth):
+                t = time.perf_counter()
+                _, found = search_index(index, q[None, :], args.k, store=store, rerank_factor=rerank)
+                timings.append((time.perf_counter() - t) * 1000)
+                hits += len(set(expected.tolist()) & set(found[0].tolist()))
+            timings.sort()
+            code_size = index.sa_code_size()
+            print(f"{kind:>6} {rerank or '-':>6} {code_size:>6} {code_size * index.ntotal / 1e6:>9.1f} "
+                  f"{build_s:>8.1f} {timings[len(timings) // 2]:>7.2f} {timings[int(len(timings) * 0.99)]:>7.2f} "
+                  f"{hits / (args.k * len(queries)):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     pinecone_index: str
 
     database_url: str
+    redis_url: str = "redis://redis:6379/0"
     embedding_model: str = "text-embedding-3-large"
 
     class Config:
@@ -1,4 +1,5 @@
 import json
+import redis
 from kafka import KafkaConsumer
 from app.config import settings
 from app.extractor import extract_text
@@ -14,6 +15,7 @@ consumer = KafkaConsumer(
     enable_auto_commit=False,
     value_deserializer=lambda v: json.loads(v.decode("utf-8")),
 )
+doc_versions = redis.Redis.from_url(settings.redis_url)
 
 def run():
     for message in consumer:
@@ -35,10 +37,17 @@ def run():
                 vectors=vectors,
             )
 
+            # invalidate cached answers that cite this document
+            doc_versions.incr(f"docver:{document_id}")
             update_document_status(document_id, "INDEXED")
             consumer.commit()
 
         except Exception as e:
+            # a partial upsert may have changed this document's vectors already
+            try:
+                doc_versions.incr(f"docver:{document_id}")
+            except Exception:
+                pass
             update_document_status(document_id, "FAILED")
             # no commit -> retry
             raise e
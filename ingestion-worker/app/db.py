@@ -4,10 +4,11 @@ from app.config import settings
 engine = create_engine(settings.database_url)
 
 def update_document_status(document_id: str, status: str):
+    # deduplicated uploads reference the canonical row and share its status
     with engine.begin() as conn:
         conn.execute(
             text(
-                "UPDATE documents SET status=:status WHERE id=:id"
+                "UPDATE documents SET status=:status WHERE id=:id OR canonical_id=:id"
             ),
             {"status": status, "id": document_id},
         )
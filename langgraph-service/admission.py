@@ -0,0 +1,165 @@
+# langgraph-service/admission.py
+# Admission control: bounded concurrency per downstream with a fair priority queue
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+# lower value = served first
+PRIORITY_INTERACTIVE = 0   # user chat messages
+PRIORITY_BULK = 1          # file uploads and other non-interactive runs
+PRIORITY_SPECULATIVE = 2   # work that may be thrown away
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+    def __init__(self, downstream: str, reason: str, retry_after: int):
+        super().__init__(f"{downstream} busy ({reason}), retry in {retry_after}s")
+        self.downstream = downstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("future", "tenant", "enqueued", "abandoned")
+
+    def __init__(self, future: asyncio.Future, tenant: str, enqueued: float):
+        self.future = future
+        self.tenant = tenant
+        self.enqueued = enqueued
+        self.abandoned = False
+
+
+class AdmissionController:
+    """
+    At most `max_concurrent` holders at a time; others wait up to `max_wait`
+    seconds in a bounded queue and are then shed with Overloaded.
+
+    Queue order is (priority, fair tag). Fair tags follow start-time fair
+    queueing per tenant (resolved by the orchestrator, not the namespace): a
+    tenant's next tag is one past max(virtual time, its previous tag), so a
+    tenant with 100 queued requests is interleaved with a tenant that just
+    arrived rather than served first.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._heap: List[Tuple[int, float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._tenant_tags = {}
+        self._queued = Counter()  # tenant -> waiting requests
+        self._hold_ewma = 1.0     # seconds a slot is typically held
+
+        self.admitted = 0
+        self.waited = 0
+        self.wait_seconds_total = 0.0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    @asynccontextmanager
+    async def admit(self, tenant: str = "default", priority: int = PRIORITY_INTERACTIVE,
+                    max_wait: Optional[float] = None):
+        await self._acquire(tenant, priority, self.max_wait if max_wait is None else max_wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_ewma += 0.1 * ((time.monotonic() - started) - self._hold_ewma)
+            self._release()
+
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def retry_after(self) -> int:
+        # rough time for the current queue to drain
+        backlog = (self.queue_depth() + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self._hold_ewma))
+
+    def _shed(self, reason: str):
+        return Overloaded(self.name, reason, self.retry_after())
+
+    async def _acquire(self, tenant: str, priority: int, max_wait: float):
+        if self.in_flight < self.max_concurrent and not self._queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if max_wait <= 0:
+            self.shed_timeout += 1
+            raise self._shed("no free slot")
+        if self.queue_depth() >= self.max_queue:
+            self.shed_queue_full += 1
+            raise self._shed("queue full")
+
+        tag = max(self._vtime, self._tenant_tags.get(tenant, 0.0)) + 1.0
+        self._tenant_tags[tenant] = tag
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tenant, time.monotonic())
+        heapq.heappush(self._heap, (priority, tag, next(self._seq), waiter))
+        self._queued[tenant] += 1
+
+        try:
+            await asyncio.wait_for(waiter.future, max_wait)
+        except asyncio.TimeoutError:
+            if not self._granted(waiter):
+                self._abandon(waiter)
+                self.shed_timeout += 1
+                raise self._shed("max wait exceeded")
+        except asyncio.CancelledError:
+            if self._granted(waiter):
+                self._release()  # slot was handed over just as the caller went away
+            else:
+                self._abandon(waiter)
+            raise
+        self.waited += 1
+        self.wait_seconds_total += time.monotonic() - waiter.enqueued
+        self.admitted += 1
+
+    @staticmethod
+    def _granted(waiter: _Waiter) -> bool:
+        return waiter.future.done() and not waiter.future.cancelled()
+
+    def _abandon(self, waiter: _Waiter):
+        # heap entry is left in place and skipped when popped
+        waiter.abandoned = True
+        self._dequeued(waiter.tenant)
+
+    def _dequeued(self, tenant: str):
+        self._queued[tenant] -= 1
+        if self._queued[tenant] <= 0:
+            del self._queued[tenant]
+            # idle tenants earn no credit: the next arrival starts at virtual time
+            self._tenant_tags.pop(tenant, None)
+
+    def _release(self):
+        while self._heap:
+            _, tag, _, waiter = heapq.heappop(self._heap)
+            if waiter.abandoned or waiter.future.done():
+                continue
+            # hand the slot straight to the next waiter; in_flight is unchanged
+            self._vtime = tag
+            self._dequeued(waiter.tenant)
+            waiter.future.set_result(None)
+            return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(),
+            "queued_by_tenant": dict(self._queued),
+            "admitted": self.admitted,
+            "avg_wait_ms": round(1000 * self.wait_seconds_total / self.waited, 2) if self.waited else 0.0,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "retry_after_seconds": self.retry_after(),
+        }
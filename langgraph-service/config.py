@@ -5,7 +5,69 @@ LANGGRAPH_SERVICE_HOST = "0.0.0.0"
 LANGGRAPH_SERVICE_PORT = int(os.environ.get("LANGGRAPH_SERVICE_PORT", 8003))
 
 SERVICE_API_KEY = os.environ.get("SERVICE_API_KEY", "default-langgraph-key")
+LANGGRAPH_API_KEY = os.environ.get("LANGGRAPH_API_KEY", SERVICE_API_KEY)  # inbound, from orchestrator
+OUTBOUND_API_KEY = os.environ.get("OUTBOUND_API_KEY", SERVICE_API_KEY)    # to RAG + embedding services
 
 # Endpoints for RAG + Embedding microservices
 RAG_SERVICE_URL = os.environ.get("RAG_SERVICE_URL", "http://rag-service:8001")
 EMBEDDING_SERVICE_URL = os.environ.get("EMBEDDING_SERVICE_URL", "http://embedding-service:8002")
+
+# Shared outbound httpx client (one per process)
+HTTPX_TIMEOUT = float(os.environ.get("HTTPX_TIMEOUT", 60.0))
+HTTPX_MAX_CONNECTIONS = int(os.environ.get("HTTPX_MAX_CONNECTIONS", 200))
+HTTPX_MAX_KEEPALIVE = int(os.environ.get("HTTPX_MAX_KEEPALIVE", 50))
+HTTPX_KEEPALIVE_EXPIRY = float(os.environ.get("HTTPX_KEEPALIVE_EXPIRY", 30.0))
+HTTPX_HTTP2 = os.environ.get("HTTPX_HTTP2", "true").lower() == "true"
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+
+# Semantic answer cache (see semantic_cache.py)
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.92))
+# Per-dimension overrides, "dim:threshold,...": the orchestrator's 768-d BioBERT query
+# vectors score every pair of questions high, so they need a stricter threshold
+SEMANTIC_CACHE_THRESHOLDS_BY_DIM = {
+    int(dim): float(threshold)
+    for dim, threshold in (p.split(":") for p in os.environ.get("SEMANTIC_CACHE_THRESHOLDS_BY_DIM", "768:0.97").split(",") if p.strip())
+}
+SEMANTIC_CACHE_TTL_SECONDS = int(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", 86400))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
+
+# Speculative fallback generation (see speculation.py); requests must also opt in
+SPECULATION_ENABLED = os.environ.get("SPECULATION_ENABLED", "false").lower() == "true"
+SPECULATION_DEFAULT_BUDGET_TOKENS = int(os.environ.get("SPECULATION_DEFAULT_BUDGET_TOKENS", 0))
+FALLBACK_MAX_TOKENS = int(os.environ.get("FALLBACK_MAX_TOKENS", 512))  # matches embedding-service max_tokens
+
+# Admission control (see admission.py): concurrent slots per downstream, then a
+# bounded fair queue; requests waiting longer than ADMISSION_MAX_WAIT_SECONDS are
+# shed with "busy, retry" well before the HTTPX_TIMEOUT would fire.
+ADMISSION_GRAPH_MAX_CONCURRENT = int(os.environ.get("ADMISSION_GRAPH_MAX_CONCURRENT", 64))
+ADMISSION_LLM_MAX_CONCURRENT = int(os.environ.get("ADMISSION_LLM_MAX_CONCURRENT", 16))
+ADMISSION_EMBED_MAX_CONCURRENT = int(os.environ.get("ADMISSION_EMBED_MAX_CONCURRENT", 32))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 256))
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", 10.0))
+
+# Rolling conversation summary (see conversation_memory.py)
+CONVERSATION_MEMORY_ENABLED = os.environ.get("CONVERSATION_MEMORY_ENABLED", "true").lower() == "true"
+CONVERSATION_SUMMARY_THRESHOLD_TOKENS = int(os.environ.get("CONVERSATION_SUMMARY_THRESHOLD_TOKENS", 1500))
+CONVERSATION_KEEP_RECENT_MESSAGES = int(os.environ.get("CONVERSATION_KEEP_RECENT_MESSAGES", 6))
+CONVERSATION_SUMMARY_TTL_SECONDS = int(os.environ.get("CONVERSATION_SUMMARY_TTL_SECONDS", 7 * 86400))
+
+# Token budget for retrieved context in RAG prompts (see prompt_engine.pack_context)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 3000))
+
+# Nearest-centroid intent classifier over the query embedding (see intent_classifier.py);
+# build the file with scripts/build_intent_centroids.py. Missing file -> keyword heuristic.
+# Uses the orchestrator's BioBERT query vector (or the semantic cache's); no extra /embed call.
+INTENT_CENTROIDS_PATH = os.environ.get("INTENT_CENTROIDS_PATH", "data/intent_centroids.json")
+INTENT_MIN_SIMILARITY = float(os.environ.get("INTENT_MIN_SIMILARITY", 0.2))
+
+# Generation model routing (see model_router.py): small/fast model for simple
+# queries, large model for CoT intents, long prompts and weak retrieval
+MODEL_ROUTING_ENABLED = os.environ.get("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+ROUTER_SMALL_MODEL = os.environ.get("ROUTER_SMALL_MODEL", "gpt-4o-mini")
+ROUTER_SMALL_MAX_TOKENS = int(os.environ.get("ROUTER_SMALL_MAX_TOKENS", 256))
+ROUTER_LARGE_MODEL = os.environ.get("ROUTER_LARGE_MODEL", "gpt-4o")
+ROUTER_LARGE_MAX_TOKENS = int(os.environ.get("ROUTER_LARGE_MAX_TOKENS", 1024))
+ROUTER_LARGE_PROMPT_TOKENS = int(os.environ.get("ROUTER_LARGE_PROMPT_TOKENS", 2500))
+ROUTER_LOW_CONFIDENCE = float(os.environ.get("ROUTER_LOW_CONFIDENCE", 0.5))
@@ -0,0 +1,100 @@
+# langgraph-service/conversation_memory.py
+# Rolling per-session conversation summary (caps prompt size on long sessions)
+
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from speculation import estimate_tokens
+
+
+def _fingerprint(messages: List[Dict]) -> str:
+    # "<count>:<sha1 of contents>"; content only, role labels are not guaranteed to round-trip
+    h = hashlib.sha1()
+    for m in messages:
+        h.update((m.get("content") or "").encode("utf-8"))
+        h.update(b"\x00")
+    return f"{len(messages)}:{h.hexdigest()}"
+
+
+@dataclass
+class SessionMemory:
+    summary: str = ""
+    through: Optional[str] = None  # fingerprint of the last (up to two) summarized messages
+
+
+class ConversationMemory:
+    """
+    Keeps a running summary per session so prompts carry
+    summary + a short tail of recent turns instead of the whole history.
+
+    Key: convmem:{session_id}  (HASH: summary, through)
+
+    The orchestrator sends its recent-history window with every request.
+    `through` marks where the summary ends inside that window; only the
+    messages after it are sent verbatim. Once they exceed `threshold_tokens`,
+    all but the last `keep_recent` are folded into the summary.
+    """
+
+    KEY = "convmem:{session_id}"
+
+    def __init__(self, redis_url: str, threshold_tokens: int = 1500,
+                 keep_recent: int = 6, ttl_seconds: int = 7 * 86400):
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent = keep_recent
+        self.ttl_seconds = ttl_seconds
+
+        self.compactions = 0
+        self.failed_compactions = 0
+        self.messages_summarized = 0
+
+    async def load(self, session_id: str) -> SessionMemory:
+        data = await self._redis.hgetall(self.KEY.format(session_id=session_id))
+        return SessionMemory(summary=data.get("summary", ""), through=data.get("through"))
+
+    async def save(self, session_id: str, summary: str, summarized: List[Dict]):
+        key = self.KEY.format(session_id=session_id)
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping={"summary": summary, "through": _fingerprint(summarized[-2:])})
+        pipe.expire(key, self.ttl_seconds)
+        await pipe.execute()
+        self.compactions += 1
+        self.messages_summarized += len(summarized)
+
+    @staticmethod
+    def unsummarized(history: List[Dict], through: Optional[str]) -> List[Dict]:
+        """
+        Messages of `history` after the summary marker. If the marker is not
+        in the window (no summary yet, or it scrolled out) everything is.
+        """
+        if through:
+            width = int(through.split(":", 1)[0])
+            for end in range(len(history), width - 1, -1):
+                if _fingerprint(history[end - width:end]) == through:
+                    return history[end:]
+        return history
+
+    def split_for_compaction(self, turns: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        (to_summarize, to_keep); to_summarize is empty while under the threshold.
+        """
+        if len(turns) <= self.keep_recent:
+            return [], turns
+        if sum(estimate_tokens(m.get("content") or "") for m in turns) <= self.threshold_tokens:
+            return [], turns
+        return turns[:-self.keep_recent], turns[-self.keep_recent:]
+
+    def stats(self) -> dict:
+        return {
+            "threshold_tokens": self.threshold_tokens,
+            "keep_recent": self.keep_recent,
+            "compactions": self.compactions,
+            "failed_compactions": self.failed_compactions,
+            "messages_summarized": self.messages_summarized,
+        }
+
+    async def close(self):
+        await self._redis.close()
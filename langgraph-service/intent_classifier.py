@@ -0,0 +1,98 @@
+# langgraph-service/intent_classifier.py
+# Nearest-centroid intent classification over the query embedding
+
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from prompt_engine import QueryIntent, classify_intent
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1.0, norms)
+
+
+def build_centroids(vectors: Sequence[Sequence[float]], labels: Sequence[str]) -> Dict[str, List[float]]:
+    """
+    Mean of the L2-normalized example embeddings per intent, re-normalized.
+    Used offline by scripts/build_intent_centroids.py.
+    """
+    X = _normalize(np.asarray(vectors, dtype=np.float32))
+    centroids = {}
+    for intent in sorted(set(labels)):
+        QueryIntent(intent)  # reject unknown labels early
+        mask = np.array([label == intent for label in labels])
+        centroids[intent] = _normalize(X[mask].mean(axis=0)).tolist()
+    return centroids
+
+
+def save_centroids(path: str, centroids: Dict[str, List[float]], examples: int, space: str = "biobert"):
+    with open(path, "w") as f:
+        json.dump({
+            "space": space,
+            "dim": len(next(iter(centroids.values()))),
+            "examples": examples,
+            "centroids": centroids,
+        }, f)
+
+
+class CentroidIntentClassifier:
+    """
+    Picks the intent whose centroid has the highest cosine similarity with
+    the query embedding. The embedding is the one the orchestrator computed
+    for retrieval (or the semantic cache for its lookup), so classification
+    costs one small matrix-vector product; centroids must be built in the
+    same space (scripts/build_intent_centroids.py --space).
+
+    Falls back to the keyword heuristic (prompt_engine.classify_intent) when
+    no vector is available, the dimension does not match the centroids, or
+    the best similarity is below `min_similarity`.
+    """
+
+    def __init__(self, centroids: Dict[str, List[float]], min_similarity: float = 0.2):
+        self.intents = [QueryIntent(k) for k in centroids]
+        self._matrix = _normalize(np.asarray(list(centroids.values()), dtype=np.float32))
+        self.dim = self._matrix.shape[1]
+        self.min_similarity = min_similarity
+        self.by_source = Counter()
+        self.by_intent = Counter()
+
+    @classmethod
+    def from_file(cls, path: str, min_similarity: float = 0.2) -> Optional["CentroidIntentClassifier"]:
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(json.load(f)["centroids"], min_similarity=min_similarity)
+
+    def nearest(self, vec: Iterable[float]) -> Tuple[Optional[QueryIntent], float]:
+        q = np.asarray(vec, dtype=np.float32)
+        if q.shape != (self.dim,):
+            return None, 0.0
+        sims = self._matrix @ _normalize(q)
+        best = int(np.argmax(sims))
+        return self.intents[best], float(sims[best])
+
+    def classify(self, query: str, vec: Optional[Iterable[float]] = None) -> Tuple[QueryIntent, str]:
+        """
+        Returns (intent, source) with source "centroid" or "keyword".
+        """
+        intent, similarity = self.nearest(vec) if vec is not None else (None, 0.0)
+        source = "centroid"
+        if intent is None or similarity < self.min_similarity:
+            intent, source = classify_intent(query), "keyword"
+        self.by_source[source] += 1
+        self.by_intent[intent.value] += 1
+        return intent, source
+
+    def stats(self) -> dict:
+        return {
+            "intents": [i.value for i in self.intents],
+            "dim": self.dim,
+            "min_similarity": self.min_similarity,
+            "by_source": dict(self.by_source),
+            "by_intent": dict(self.by_intent),
+        }
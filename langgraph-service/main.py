@@ -1,19 +1,77 @@
 # langgraph-service/main.py
 import asyncio
+import json
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-from nodes.langgraph_nodes import LangGraphNodes
-from config import LANGGRAPH_API_KEY
+from nodes.langgraph_nodes import LangGraphNodes, stream_sink
+from semantic_cache import SemanticCache
+from conversation_memory import ConversationMemory
+from intent_classifier import CentroidIntentClassifier
+from model_router import ModelRouter, Route
+from admission import AdmissionController, Overloaded, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from config import (
+    LANGGRAPH_API_KEY, REDIS_URL, SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_THRESHOLDS_BY_DIM, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ENTRIES,
+    ADMISSION_GRAPH_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS,
+    CONVERSATION_MEMORY_ENABLED, CONVERSATION_SUMMARY_THRESHOLD_TOKENS,
+    CONVERSATION_KEEP_RECENT_MESSAGES, CONVERSATION_SUMMARY_TTL_SECONDS,
+    INTENT_CENTROIDS_PATH, INTENT_MIN_SIMILARITY,
+    MODEL_ROUTING_ENABLED, ROUTER_SMALL_MODEL, ROUTER_SMALL_MAX_TOKENS, ROUTER_LARGE_MODEL,
+    ROUTER_LARGE_MAX_TOKENS, ROUTER_LARGE_PROMPT_TOKENS, ROUTER_LOW_CONFIDENCE,
+)
 
-app = FastAPI(title="LangGraph Service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile the graph and open the pooled outbound client once per process
+    app.state.cache = SemanticCache(
+        REDIS_URL,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        thresholds_by_dim=SEMANTIC_CACHE_THRESHOLDS_BY_DIM,
+        ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries_per_bucket=SEMANTIC_CACHE_MAX_ENTRIES,
+    ) if SEMANTIC_CACHE_ENABLED else None
+    app.state.memory = ConversationMemory(
+        REDIS_URL,
+        threshold_tokens=CONVERSATION_SUMMARY_THRESHOLD_TOKENS,
+        keep_recent=CONVERSATION_KEEP_RECENT_MESSAGES,
+        ttl_seconds=CONVERSATION_SUMMARY_TTL_SECONDS,
+    ) if CONVERSATION_MEMORY_ENABLED else None
+    # None (keyword heuristic) until centroids are built
+    intents = CentroidIntentClassifier.from_file(INTENT_CENTROIDS_PATH, min_similarity=INTENT_MIN_SIMILARITY)
+    router = ModelRouter(
+        small=Route("small", ROUTER_SMALL_MODEL, ROUTER_SMALL_MAX_TOKENS),
+        large=Route("large", ROUTER_LARGE_MODEL, ROUTER_LARGE_MAX_TOKENS),
+        large_prompt_tokens=ROUTER_LARGE_PROMPT_TOKENS,
+        low_confidence=ROUTER_LOW_CONFIDENCE,
+    ) if MODEL_ROUTING_ENABLED else None
+    app.state.nodes = LangGraphNodes(cache=app.state.cache, memory=app.state.memory, intents=intents, router=router)
+    # bounds concurrent graph runs in this process, whichever orchestrator node sent them
+    app.state.graph_gate = AdmissionController(
+        "langgraph", ADMISSION_GRAPH_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+    yield
+    await app.state.nodes.close()
+    if app.state.cache is not None:
+        await app.state.cache.close()
+    if app.state.memory is not None:
+        await app.state.memory.close()
+
+app = FastAPI(title="LangGraph Service", lifespan=lifespan)
 
 class RunGraphRequest(BaseModel):
     session_id: str
     type: str  # "user_message" or "file_uploaded"
+    namespace: Optional[str] = None
+    tenant: Optional[str] = None  # admission fairness key, resolved by the orchestrator; defaults to session_id
+    speculation: Optional[Dict[str, Any]] = None  # see speculation.SpeculationPolicy
     message: Optional[str] = None
     file_meta: Optional[Dict[str, Any]] = None
-    history: Optional[List[str]] = None
+    history: Optional[List[Dict[str, Any]]] = None  # recent turns: {"role", "content", "meta"}
+    retrieved: Optional[List[Dict[str, Any]]] = None  # RAG matches retrieved by the orchestrator in-process
+    query_embedding: Optional[List[float]] = None  # the orchestrator's query vector (cache, intent)
+    cache_checked: Optional[Dict[str, str]] = None  # /cache/lookup missed: {"intent", "intent_source"}
     extra: Optional[Dict[str, Any]] = None
 
 class RunGraphResponse(BaseModel):
@@ -26,21 +84,24 @@ def auth_check(request: Request):
     if not api_key or api_key != LANGGRAPH_API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-@app.post("/run_graph", response_model=RunGraphResponse)
-async def run_graph(req: RunGraphRequest, request: Request):
-    """
-    LangGraph orchestration endpoint.
-    Expects header: x-api-key
-    """
-    auth_check(request)
-
+def build_initial_state(req: RunGraphRequest) -> Dict[str, Any]:
     # Build initial state (you can extend as needed)
-    state = {
+    return {
         "session_id": req.session_id,
         "type": req.type,
+        "namespace": req.namespace or "default",
+        # not the namespace: clients choose that, and could spend another tenant's share
+        "tenant": req.tenant or req.session_id,
+        "priority": PRIORITY_BULK if req.type == "file_uploaded" else PRIORITY_INTERACTIVE,
+        "speculation": req.speculation,
         "user_message": req.message or "",
         "file_meta": req.file_meta,
         "history": req.history or [],
+        "prefetched_docs": req.retrieved,
+        "query_embedding": req.query_embedding,
+        "cache_checked": bool(req.cache_checked),
+        "intent": (req.cache_checked or {}).get("intent"),
+        "intent_source": (req.cache_checked or {}).get("intent_source"),
         "events": [],
         "llm_output": None,
         "use_rag": False,
@@ -49,14 +110,133 @@ async def run_graph(req: RunGraphRequest, request: Request):
         "summary": ""
     }
 
-    nodes = LangGraphNodes()  # creates httpx clients internally
+async def run_admitted(request: Request, state: Dict[str, Any]) -> Dict[str, Any]:
+    # queue for a graph slot; raises Overloaded when shed
+    async with request.app.state.graph_gate.admit(state["tenant"], state["priority"]):
+        return await request.app.state.nodes.run_graph(state)
+
+def public_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    # internal working values are not part of the response
+    return {k: v for k, v in state.items() if k not in ("query_embedding", "pipeline_started", "conversation", "prefetched_docs", "routes")}
+
+@app.post("/run_graph", response_model=RunGraphResponse)
+async def run_graph(req: RunGraphRequest, request: Request):
+    """
+    LangGraph orchestration endpoint.
+    Expects header: x-api-key
+    """
+    auth_check(request)
+
+    state = build_initial_state(req)
+
     try:
-        result_state = await nodes.run_graph(state)
+        result_state = await run_admitted(request, state)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LangGraph run failed: {e}")
 
     return RunGraphResponse(
         events=result_state.get("events", []),
         llm_output=result_state.get("llm_output"),
-        state=result_state
+        state=public_state(result_state)
     )
+
+@app.post("/run_graph/stream")
+async def run_graph_stream(req: RunGraphRequest, request: Request):
+    """
+    Streaming variant of /run_graph. Responds with NDJSON, one object per line:
+      {"type": "event", "data": "WS:retrieval:done"}   node events as they happen
+      {"type": "token", "data": "..."}                 LLM token deltas
+      {"type": "final", "llm_output": "...", "state": {...}}
+      {"type": "busy", "detail": "...", "retry_after": 3}  shed by admission control
+      {"type": "error", "detail": "..."}
+    Expects header: x-api-key
+    """
+    auth_check(request)
+
+    state = build_initial_state(req)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        stream_sink.set(queue)  # scoped to this task's context
+        try:
+            result_state = await run_admitted(request, state)
+            await queue.put({
+                "type": "final",
+                "llm_output": result_state.get("llm_output"),
+                "state": public_state(result_state),
+            })
+        except Overloaded as e:
+            await queue.put({"type": "busy", "detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            await queue.put({"type": "error", "detail": f"LangGraph run failed: {e}"})
+        finally:
+            await queue.put(None)
+
+    async def body():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield json.dumps(item, default=str) + "\n"
+        finally:
+            # client went away: stop the graph instead of finishing it for nobody
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+class CacheLookupRequest(BaseModel):
+    namespace: Optional[str] = None
+    message: str
+    query_embedding: List[float]
+
+@app.post("/cache/lookup")
+async def cache_lookup(req: CacheLookupRequest, request: Request):
+    """
+    Semantic cache lookup before retrieval, for callers that retrieve
+    themselves (the orchestrator): {"answer": str | None, "intent", "intent_source"}.
+    Pass {"intent", "intent_source"} back as cache_checked when running the
+    graph after a miss. Expects header: x-api-key
+    """
+    auth_check(request)
+    return await request.app.state.nodes.lookup_cache(req.namespace or "default", req.message, req.query_embedding)
+
+@app.get("/stats/semantic_cache")
+async def semantic_cache_stats(request: Request):
+    auth_check(request)
+    cache = request.app.state.cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+@app.get("/stats/single_flight")
+async def single_flight_stats(request: Request):
+    auth_check(request)
+    return request.app.state.nodes.single_flight_stats()
+
+@app.get("/stats/speculation")
+async def speculation_stats(request: Request):
+    auth_check(request)
+    return request.app.state.nodes.speculation_stats()
+
+@app.get("/stats/model_routing")
+async def model_routing_stats(request: Request):
+    auth_check(request)
+    return request.app.state.nodes.routing_stats()
+
+@app.get("/stats/intent")
+async def intent_stats(request: Request):
+    auth_check(request)
+    return request.app.state.nodes.intent_stats()
+
+@app.get("/stats/conversation_memory")
+async def conversation_memory_stats(request: Request):
+    auth_check(request)
+    return request.app.state.nodes.memory_stats()
+
+@app.get("/stats/admission")
+async def admission_stats(request: Request):
+    auth_check(request)
+    return {"langgraph": request.app.state.graph_gate.stats(), **request.app.state.nodes.admission_stats()}
@@ -0,0 +1,101 @@
+# langgraph-service/model_router.py
+# Intent- and budget-aware choice of generation model and max_tokens
+
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from prompt_engine import QueryIntent, should_use_cot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model: Optional[str]       # None: embedding-service default model
+    max_tokens: Optional[int]  # None: embedding-service default max_tokens
+
+
+class _RouteStats:
+    __slots__ = ("calls", "errors", "seconds_total", "recent")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds_total = 0.0
+        self.recent = deque(maxlen=500)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.recent)
+        p95 = recent[int(len(recent) * 0.95)] if recent else 0.0
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(1000 * self.seconds_total / self.calls, 1) if self.calls else 0.0,
+            "p95_ms": round(1000 * p95, 1),
+        }
+
+
+class ModelRouter:
+    """
+    Picks the small or large route for a generation call:
+
+      large  - CoT intents (operational, troubleshoot; see should_use_cot)
+      large  - long prompts (more than `large_prompt_tokens`)
+      large  - RAG answers with weak retrieval (confidence < `low_confidence`)
+      small  - everything else: factual lookups, small talk, summaries
+
+    The fallback path ignores confidence, so a speculative fallback started
+    before retrieval gets the same route the fallback node would pick.
+    """
+
+    def __init__(self, small: Route, large: Route, large_prompt_tokens: int = 2500,
+                 low_confidence: float = 0.5):
+        self.small = small
+        self.large = large
+        self.large_prompt_tokens = large_prompt_tokens
+        self.low_confidence = low_confidence
+        self._stats: Dict[str, _RouteStats] = {small.name: _RouteStats(), large.name: _RouteStats()}
+        self.reasons: Dict[str, int] = {}
+
+    def select(self, intent: QueryIntent, prompt_tokens: int, path: str,
+               confidence: Optional[float] = None) -> Tuple[Route, str]:
+        """The route for a call and why, without counting it (see choose)."""
+        if should_use_cot(intent):
+            route, reason = self.large, "cot_intent"
+        elif prompt_tokens > self.large_prompt_tokens:
+            route, reason = self.large, "long_prompt"
+        elif path == "rag" and confidence is not None and confidence < self.low_confidence:
+            route, reason = self.large, "low_confidence"
+        else:
+            route, reason = self.small, "simple"
+        return route, reason
+
+    def choose(self, intent: QueryIntent, prompt_tokens: int, path: str,
+               confidence: Optional[float] = None) -> Tuple[Route, str]:
+        route, reason = self.select(intent, prompt_tokens, path, confidence)
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        logger.info(
+            f"route={route.name} model={route.model} max_tokens={route.max_tokens} reason={reason} "
+            f"intent={intent.value} path={path} prompt_tokens={prompt_tokens} confidence={confidence}"
+        )
+        return route, reason
+
+    def record(self, route: Route, seconds: float, ok: bool = True):
+        stats = self._stats.setdefault(route.name, _RouteStats())
+        stats.calls += 1
+        stats.errors += 0 if ok else 1
+        stats.seconds_total += seconds
+        stats.recent.append(seconds)
+        logger.info(f"route={route.name} model={route.model} seconds={seconds:.3f} ok={ok}")
+
+    def stats(self) -> dict:
+        return {
+            "routes": {
+                name: {"model": r.model, "max_tokens": r.max_tokens, **self._stats[name].snapshot()}
+                for name, r in ((self.small.name, self.small), (self.large.name, self.large))
+            },
+            "reasons": dict(self.reasons),
+        }
@@ -1,31 +1,358 @@
 # langgraph-service/nodes/langgraph_nodes.py
 import asyncio
+import contextvars
+import json
+import time
+import uuid
+from contextvars import ContextVar
 from typing import Dict, Any, Optional
 from langgraph.graph import StateGraph, END
-from config import RAG_SERVICE_URL, EMBEDDING_SERVICE_URL, OUTBOUND_API_KEY, HTTPX_TIMEOUT
+from config import (
+    RAG_SERVICE_URL, EMBEDDING_SERVICE_URL, OUTBOUND_API_KEY, HTTPX_TIMEOUT,
+    HTTPX_MAX_CONNECTIONS, HTTPX_MAX_KEEPALIVE, HTTPX_KEEPALIVE_EXPIRY, HTTPX_HTTP2,
+    SPECULATION_ENABLED, SPECULATION_DEFAULT_BUDGET_TOKENS, FALLBACK_MAX_TOKENS,
+    ADMISSION_LLM_MAX_CONCURRENT, ADMISSION_EMBED_MAX_CONCURRENT, ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_SECONDS, CONVERSATION_KEEP_RECENT_MESSAGES, CONTEXT_TOKEN_BUDGET,
+)
 import httpx
+from admission import AdmissionController, Overloaded, PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_SPECULATIVE
+from prompt_engine import (
+    QueryIntent, build_prompt, build_summary_prompt, chunks_from_matches, classify_intent,
+    count_tokens, format_conversation, to_text_prompt,
+)
+from model_router import Route
+from single_flight import SingleFlight, flight_key
+from speculation import SpeculationPolicy, SpeculationTracker, estimate_tokens
+
+# Set by the streaming endpoint for the duration of one graph run.
+# Nodes push {"type": "event" | "token", "data": ...} items as they are produced.
+stream_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar("stream_sink", default=None)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Shared outbound client: pooled keep-alive connections (HTTP/2 when the
+    server supports it) to the RAG and embedding services.
+    """
+    return httpx.AsyncClient(
+        timeout=HTTPX_TIMEOUT,
+        headers={"x-api-key": OUTBOUND_API_KEY},
+        limits=httpx.Limits(
+            max_connections=HTTPX_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTPX_MAX_KEEPALIVE,
+            keepalive_expiry=HTTPX_KEEPALIVE_EXPIRY,
+        ),
+        http2=HTTPX_HTTP2,
+    )
+
 
 class LangGraphNodes:
     """
     Nodes for LangGraph orchestration.
     Each node calls RAG or Embedding microservices as needed via httpx.
     Events are appended to state['events'] for orchestrator to forward to WebSocket.
+
+    Create one instance per process: the graph is compiled once here and
+    every request reuses it together with the pooled httpx client.
     """
 
-    def __init__(self):
-        self._client = httpx.AsyncClient(timeout=HTTPX_TIMEOUT, headers={"x-api-key": OUTBOUND_API_KEY})
+    # used when no ModelRouter is configured: embedding-service defaults
+    DEFAULT_ROUTE = Route("default", None, None)
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, cache=None, memory=None, intents=None,
+                 router=None):
+        self._client = client or create_http_client()
+        self._cache = cache  # optional SemanticCache
+        self._memory = memory  # optional ConversationMemory
+        self._intents = intents  # optional CentroidIntentClassifier
+        self._router = router  # optional ModelRouter
+        self._compacting: Dict[str, asyncio.Task] = {}  # session_id -> summary update
+        self._flights = SingleFlight()
+        self._speculation = SpeculationTracker()
+        self._speculative: Dict[str, asyncio.Task] = {}  # run_id -> fallback task
+        # bounded concurrency towards the LLM and embedding endpoints
+        self._llm_gate = AdmissionController(
+            "llm", ADMISSION_LLM_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+        self._embed_gate = AdmissionController(
+            "embedding", ADMISSION_EMBED_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+        self._graph = self._build_graph()
+
+    def _emit(self, state: Dict[str, Any], event: str):
+        """
+        Record a node event and forward it immediately when streaming.
+        """
+        state.setdefault("events", []).append(event)
+        sink = stream_sink.get()
+        if sink is not None:
+            sink.put_nowait({"type": "event", "data": event})
+
+    @staticmethod
+    def _ticket(state: Dict[str, Any]) -> Dict[str, Any]:
+        # admission tenant and priority for this run's downstream calls
+        return {
+            "tenant": state.get("tenant") or "default",
+            "priority": state.get("priority", PRIORITY_INTERACTIVE),
+        }
+
+    async def _complete(self, endpoint: str, prompt: str, model: Optional[str] = None,
+                        max_tokens: Optional[int] = None,
+                        tenant: str = "default", priority: int = PRIORITY_INTERACTIVE,
+                        max_wait: Optional[float] = None) -> Optional[str]:
+        """
+        Call an embedding-service LLM endpoint and return the full text.
+        Identical concurrent calls share one upstream request (single-flight)
+        and one LLM admission slot; when a stream sink is active, token deltas
+        are forwarded as they arrive. Raises Overloaded when shed.
+        """
+        async def call(publish):
+            async with self._llm_gate.admit(tenant, priority, max_wait):
+                return await self._stream_llm(endpoint, prompt, model, max_tokens, publish)
+
+        key = flight_key(endpoint, prompt, model, max_tokens, priority, max_wait)
+        return await self._flights.do(key, call, sink=stream_sink.get())
+
+    def _route(self, state: Dict[str, Any], prompt: str, path: str, preview: bool = False) -> Route:
+        """
+        Model and max_tokens for a generation on `path` ("rag" or "fallback").
+        Chosen and counted once per run and path: retries on another
+        endpoint and a fallback that replaces its speculative call reuse it.
+        preview=True returns the choice without counting or keeping it.
+        """
+        if self._router is None:
+            return self.DEFAULT_ROUTE
+        chosen = state.setdefault("routes", {})
+        if path in chosen:
+            return chosen[path]
+        args = (QueryIntent(self._classify(state)), count_tokens(prompt), path,
+                state.get("confidence") if path == "rag" else None)
+        if preview:
+            return self._router.select(*args)[0]
+        route, reason = self._router.choose(*args)
+        chosen[path] = route
+        state["model_route"] = {"route": route.name, "model": route.model, "reason": reason}
+        return route
+
+    async def _generate(self, state: Dict[str, Any], endpoint: str, prompt: str, path: str) -> Optional[str]:
+        """
+        Routed, timed generation for this run.
+        """
+        route = self._route(state, prompt, path)
+        start = time.perf_counter()
+        try:
+            out = await self._complete(endpoint, prompt, model=route.model, max_tokens=route.max_tokens,
+                                       **self._ticket(state))
+        except Overloaded:
+            raise  # never reached the model
+        except Exception:
+            if self._router is not None:
+                self._router.record(route, time.perf_counter() - start, ok=False)
+            raise
+        if self._router is not None:
+            self._router.record(route, time.perf_counter() - start)
+        return out
+
+    async def _stream_llm(self, endpoint: str, prompt: str, model: Optional[str],
+                          max_tokens: Optional[int], publish) -> str:
+        """
+        Read the endpoint's NDJSON /stream variant, publishing each delta.
+        """
+        body = {"prompt": prompt}
+        if model:
+            body["model"] = model
+        if max_tokens:
+            body["max_tokens"] = max_tokens
+        parts = []
+        async with self._client.stream("POST", f"{EMBEDDING_SERVICE_URL}/{endpoint}/stream", json=body) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                delta = json.loads(line).get("delta")
+                if delta:
+                    parts.append(delta)
+                    publish(delta)
+        return "".join(parts)
+
+    async def _embed_query(self, state: Dict[str, Any]):
+        """
+        Embed the user message once per request and keep it in state for reuse.
+        """
+        if state.get("query_embedding") is None:
+            ticket = self._ticket(state)
+            async with self._embed_gate.admit(ticket["tenant"], ticket["priority"]):
+                resp = await self._client.post(f"{EMBEDDING_SERVICE_URL}/embed", json={"content": state.get("user_message", "")})
+            resp.raise_for_status()
+            state["query_embedding"] = resp.json()["embedding"]
+        return state["query_embedding"]
+
+    def _classify(self, state: Dict[str, Any]) -> str:
+        """
+        Intent for this run, computed once: nearest centroid over the query
+        embedding when one is at hand (sent by the orchestrator or computed
+        for the semantic cache), keyword heuristic otherwise. Classification
+        never makes an /embed call of its own.
+        """
+        if not state.get("intent"):
+            message = state.get("user_message", "")
+            if self._intents is not None:
+                intent, source = self._intents.classify(message, state.get("query_embedding"))
+            else:
+                intent, source = classify_intent(message), "keyword"
+            state["intent"], state["intent_source"] = intent.value, source
+        return state["intent"]
+
+    async def recall_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Load the session's running summary and keep only the history turns it
+        does not cover yet, so prompts stay roughly the same size every turn.
+        """
+        history = state.get("history") or []
+        if self._memory is None:
+            state["conversation"] = history[-CONVERSATION_KEEP_RECENT_MESSAGES:]
+            return state
+        try:
+            mem = await self._memory.load(state["session_id"])
+        except Exception as e:
+            self._emit(state, f"WS:memory:error:{e}")
+            state["conversation"] = history[-self._memory.keep_recent:]
+            return state
+        state["summary"] = mem.summary
+        state["conversation"] = self._memory.unsummarized(history, mem.through)
+        return state
+
+    async def cache_lookup_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Consult the semantic cache before retrieval; on a hit the cached answer
+        becomes llm_output and the graph skips straight to memory. Sessions
+        with conversation context (summary or earlier turns) skip the cache.
+        The query embedding is only computed here when the cache will use it.
+        """
+        state["pipeline_started"] = time.perf_counter()
+        # answers given mid-conversation depend on (and may quote) that session's
+        # turns: they are neither served from nor stored in the shared cache;
+        # cache_checked: the orchestrator already missed via /cache/lookup
+        if (self._cache is None or not state.get("user_message") or self._conversation(state)
+                or state.get("cache_checked")):
+            return state
+        try:
+            vec = await self._embed_query(state)
+        except Exception as e:
+            self._emit(state, f"WS:cache:error:{e}")
+            return state
+        try:
+            hit = await self._cache.lookup(state.get("namespace") or "default", self._classify(state), vec)
+        except Exception as e:
+            self._emit(state, f"WS:cache:error:{e}")
+            return state
+
+        if hit:
+            state["cache_hit"] = True
+            state["llm_output"] = hit.answer
+            sink = stream_sink.get()
+            if sink is not None:
+                sink.put_nowait({"type": "token", "data": hit.answer})
+            self._emit(state, "WS:cache:hit")
+        return state
+
+    async def lookup_cache(self, namespace: str, message: str, query_vec) -> Dict[str, Any]:
+        """
+        Semantic cache lookup ahead of a graph run (POST /cache/lookup), so the
+        orchestrator can skip retrieval and the graph on a hit. Returns the
+        answer (None on a miss) and the intent, which the orchestrator passes
+        back with the run so it is classified once.
+        """
+        state = {"user_message": message, "query_embedding": query_vec}
+        intent = self._classify(state)
+        hit = await self._cache.lookup(namespace, intent, query_vec) if self._cache is not None else None
+        return {"answer": hit.answer if hit else None, "intent": intent, "intent_source": state["intent_source"]}
+
+    async def cache_store_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cache a successful RAG answer along with the documents it cited.
+        Answers whose prompt included the session's conversation are not
+        cached: the cache is shared by every session of the namespace.
+        """
+        if (self._cache is None or not state.get("rag_generated") or state.get("query_embedding") is None
+                or self._conversation(state)):
+            return state
+        doc_ids = [
+            m.get("document_id") or m.get("metadata", {}).get("source_id") or m.get("metadata", {}).get("document_id")
+            for m in state.get("retrieved_docs", [])
+        ]
+        try:
+            await self._cache.store(
+                namespace=state.get("namespace") or "default",
+                intent=self._classify(state),
+                query_vec=state["query_embedding"],
+                answer=state["llm_output"],
+                document_ids=doc_ids,
+                generation_seconds=time.perf_counter() - state["pipeline_started"],
+            )
+        except Exception as e:
+            self._emit(state, f"WS:cache:error:{e}")
+        return state
+
+    @staticmethod
+    def _conversation(state: Dict[str, Any]) -> str:
+        return format_conversation(state.get("summary", ""), state.get("conversation") or [])
+
+    def _fallback_prompt(self, state: Dict[str, Any]) -> str:
+        user_msg = state.get("user_message", "")
+        short_context = (self._conversation(state) or (state.get("rag_answer")[:300] if state.get("rag_answer") else ""))
+        return f"{short_context}\nUser: {user_msg}\nRespond conversationally."
+
+    async def speculate_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Optionally start the fallback generation in the background so it runs
+        in parallel with retrieval. decide_node cancels it when RAG wins.
+        The speculative prompt cannot include retrieved text (it does not exist
+        yet), so it uses the conversation summary and recent turns only.
+        """
+        if not SPECULATION_ENABLED or not state.get("user_message"):
+            return state
+        policy = SpeculationPolicy.from_request(state.get("speculation"), SPECULATION_DEFAULT_BUDGET_TOKENS)
+        prompt = self._fallback_prompt(state)
+        # counted only once speculation is allowed; fallback_node reuses it
+        route = self._route(state, prompt, "fallback", preview=True)
+        if not self._speculation.allow(policy, estimate_tokens(prompt) + (route.max_tokens or FALLBACK_MAX_TOKENS)):
+            return state
+        route = self._route(state, prompt, "fallback")
+
+        # run without the stream sink: tokens must not reach the client unless chosen;
+        # lowest priority and no queueing, so speculation never delays real requests
+        ctx = contextvars.copy_context()
+        ctx.run(stream_sink.set, None)
+        coro = self._complete("fallback_llm", prompt, model=route.model, max_tokens=route.max_tokens,
+                              tenant=self._ticket(state)["tenant"], priority=PRIORITY_SPECULATIVE, max_wait=0)
+        task = asyncio.create_task(coro, context=ctx)
+        # the result may never be awaited (RAG wins); retrieve it to avoid "never retrieved" warnings
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._speculative[state["run_id"]] = task
+        self._speculation.started += 1
+        self._emit(state, "WS:fallback:speculating")
+        return state
+
+    def _cancel_speculation(self, run_id: Optional[str]) -> bool:
+        task = self._speculative.pop(run_id, None)
+        if task is None:
+            return False
+        task.cancel()
+        return True
 
     async def retrieve_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
         Call RAG /search for relevant docs and store rag_answer/confidence.
+        Matches the orchestrator already retrieved in-process (same shape) are used as-is.
         """
         query = state.get("user_message", "")
         try:
-            resp = await self._client.post(f"{RAG_SERVICE_URL}/search", json={"query": query, "top_k": 5})
-            resp.raise_for_status()
-            data = resp.json()
-            # data['matches'] expected shape from RAG service
-            matches = data.get("matches") or data.get("results") or []
+            matches = state.get("prefetched_docs")
+            if matches is None:
+                resp = await self._client.post(f"{RAG_SERVICE_URL}/search", json={"query": query, "top_k": 5})
+                resp.raise_for_status()
+                data = resp.json()
+                # data['matches'] expected shape from RAG service
+                matches = data.get("matches") or data.get("results") or []
             # combine page content if present into rag_answer
             context = "\n\n".join([m.get("text", m.get("metadata", {}).get("text", "")) for m in matches])
             state["retrieved_docs"] = matches
@@ -33,9 +360,9 @@ class LangGraphNodes:
             # crude confidence – average of scores if provided
             scores = [m.get("score", 0.0) for m in matches]
             state["confidence"] = round(sum(scores) / len(scores), 3) if scores else 0.0
-            state.setdefault("events", []).append("WS:retrieval:done")
+            self._emit(state, "WS:retrieval:done")
         except Exception as e:
-            state.setdefault("events", []).append(f"WS:retrieval:error:{e}")
+            self._emit(state, f"WS:retrieval:error:{e}")
             state["rag_answer"] = ""
             state["confidence"] = 0.0
         return state
@@ -46,35 +373,51 @@ class LangGraphNodes:
         """
         use_rag = bool(state.get("rag_answer")) and float(state.get("confidence", 0)) >= 0.35
         state["use_rag"] = use_rag
-        state.setdefault("events", []).append("WS:rag:using" if use_rag else "WS:fallback:using")
+        self._speculation.record_decision(used_fallback=not use_rag)
+        if use_rag and self._cancel_speculation(state.get("run_id")):
+            self._speculation.cancelled += 1
+        self._emit(state, "WS:rag:using" if use_rag else "WS:fallback:using")
         return state
 
     async def rag_generate_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate answer using RAG context by calling embedding service's llm_rag or fallback endpoint.
+        Retrieved chunks are merged, deduplicated and packed into CONTEXT_TOKEN_BUDGET;
+        the prompt starts with the precomputed system prompt for the query intent.
         """
-        context = state.get("rag_answer", "")
         user_msg = state.get("user_message", "")
-        prompt = f"Context:\n{context}\n\nQuestion: {user_msg}\nAnswer (use only the context):"
+        package = build_prompt(
+            user_msg,
+            chunks_from_matches(state.get("retrieved_docs", [])),
+            QueryIntent(self._classify(state)),
+            context_budget_tokens=CONTEXT_TOKEN_BUDGET,
+        )
+        state["context_tokens"] = package.context_tokens
+        prompt = to_text_prompt(package, self._conversation(state))
 
         try:
             # Try a dedicated RAG LLM endpoint first
-            resp = await self._client.post(f"{EMBEDDING_SERVICE_URL}/llm_rag", json={"prompt": prompt})
-            resp.raise_for_status()
-            out = resp.json().get("llm_output") or resp.json().get("output") or resp.json().get("text")
+            out = await self._generate(state, "llm_rag", prompt, "rag")
             state["llm_output"] = out or "⚠️ RAG generation returned empty."
-            state.setdefault("events", []).append("WS:generated:rag")
+            state["rag_generated"] = bool(out)
+            self._emit(state, "WS:generated:rag")
+        except Overloaded:
+            raise  # shed: retrying on another endpoint would only add load
         except Exception as e:
+            # tokens already streamed from the failed attempt must be discarded by the client
+            if stream_sink.get() is not None:
+                self._emit(state, "WS:stream:reset")
             # fallback to fallback_llm if error
             try:
-                resp2 = await self._client.post(f"{EMBEDDING_SERVICE_URL}/fallback_llm", json={"prompt": prompt})
-                resp2.raise_for_status()
-                out2 = resp2.json().get("output") or resp2.json().get("text")
+                out2 = await self._generate(state, "fallback_llm", prompt, "rag")
                 state["llm_output"] = out2 or "⚠️ RAG fallback returned empty."
-                state.setdefault("events", []).append("WS:generated:rag-fallback")
+                state["rag_generated"] = bool(out2)
+                self._emit(state, "WS:generated:rag-fallback")
+            except Overloaded:
+                raise
             except Exception as ex2:
                 state["llm_output"] = f"⚠️ RAG generation failed: {e} / {ex2}"
-                state.setdefault("events", []).append(f"WS:generated:error:{e}")
+                self._emit(state, f"WS:generated:error:{e}")
 
         return state
 
@@ -82,19 +425,31 @@ class LangGraphNodes:
         """
         Generate a reply using the fallback LLM (embedding service).
         """
-        user_msg = state.get("user_message", "")
-        short_context = (state.get("summary") or (state.get("rag_answer")[:300] if state.get("rag_answer") else ""))
-        prompt = f"{short_context}\nUser: {user_msg}\nRespond conversationally."
-
+        speculative = self._speculative.pop(state.get("run_id"), None)
         try:
-            resp = await self._client.post(f"{EMBEDDING_SERVICE_URL}/fallback_llm", json={"prompt": prompt})
-            resp.raise_for_status()
-            out = resp.json().get("output") or resp.json().get("text")
+            if speculative is not None:
+                try:
+                    out = await speculative
+                except Overloaded:
+                    speculative = None  # no free LLM slot for speculation; queue normally
+                else:
+                    self._speculation.used += 1
+                    # the speculative call was not streamed; send its text in one piece
+                    sink = stream_sink.get()
+                    if out and sink is not None:
+                        sink.put_nowait({"type": "token", "data": out})
+            if speculative is None:
+                out = await self._generate(state, "fallback_llm", self._fallback_prompt(state), "fallback")
             state["llm_output"] = out or "⚠️ Fallback LLM returned empty."
-            state.setdefault("events", []).append("WS:generated:fallback")
+            self._emit(state, "WS:generated:fallback")
+        except Overloaded:
+            raise
         except Exception as e:
+            # tokens already streamed from the failed call must be discarded by the client
+            if stream_sink.get() is not None:
+                self._emit(state, "WS:stream:reset")
             state["llm_output"] = f"⚠️ Fallback LLM error: {e}"
-            state.setdefault("events", []).append(f"WS:generated:error:{e}")
+            self._emit(state, f"WS:generated:error:{e}")
         return state
 
     async def memory_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
@@ -103,33 +458,108 @@ class LangGraphNodes:
         """
         reply = state.get("llm_output", "")
         if reply:
-            state.setdefault("events", []).append("WS:memory:ready")
+            self._emit(state, "WS:memory:ready")
             state.setdefault("memory", {})["bot_reply"] = reply
+            self._schedule_compaction(state)
         return state
 
-    async def run_graph(self, initial_state: Dict[str, Any]) -> Dict[str, Any]:
+    def _schedule_compaction(self, state: Dict[str, Any]):
+        """
+        Once the unsummarized turns (including this one) pass the token
+        threshold, fold the older ones into the session summary. Runs in the
+        background: the reply is not delayed, and the next turn picks it up.
+        """
+        session_id = state.get("session_id")
+        if self._memory is None or not state.get("user_message") or session_id in self._compacting:
+            return
+        turns = list(state.get("conversation") or []) + [
+            # same shape the orchestrator persists, so the marker matches next turn's history
+            {"role": "User", "content": state["user_message"]},
+            {"role": "Bot", "content": state["llm_output"]},
+        ]
+        older, _ = self._memory.split_for_compaction(turns)
+        if not older:
+            return
+        # summary tokens must not reach the client
+        ctx = contextvars.copy_context()
+        ctx.run(stream_sink.set, None)
+        task = asyncio.create_task(
+            self._compact(session_id, state.get("summary", ""), older, self._ticket(state)["tenant"]), context=ctx)
+        self._compacting[session_id] = task
+        task.add_done_callback(lambda t: self._compacting.pop(session_id, None))
+
+    async def _compact(self, session_id: str, summary: str, older: list, tenant: str):
+        try:
+            route = self._router.small if self._router is not None else self.DEFAULT_ROUTE
+            updated = await self._complete("fallback_llm", build_summary_prompt(summary, older),
+                                           model=route.model, max_tokens=route.max_tokens,
+                                           tenant=tenant, priority=PRIORITY_BULK)
+            if updated and updated.strip():
+                await self._memory.save(session_id, updated.strip(), older)
+        except Exception:
+            # keep the old summary; the next turn tries again
+            self._memory.failed_compactions += 1
+
+    def _build_graph(self):
         """
-        Compile and run a simple LangGraph StateGraph using the nodes above.
+        Build and compile the StateGraph using the nodes above.
         """
         graph = StateGraph(dict)
+        graph.add_node("recall", self.recall_node)
+        graph.add_node("cache_lookup", self.cache_lookup_node)
+        graph.add_node("speculate", self.speculate_node)
         graph.add_node("retrieve", self.retrieve_node)
         graph.add_node("decide", self.decide_node)
         graph.add_node("rag_generate", self.rag_generate_node)
+        graph.add_node("cache_store", self.cache_store_node)
         graph.add_node("fallback", self.fallback_node)
         graph.add_node("memory", self.memory_node)
 
+        graph.add_edge("recall", "cache_lookup")
+        graph.add_conditional_edges("cache_lookup", lambda s: "memory" if s.get("cache_hit") else "speculate")
+        graph.add_edge("speculate", "retrieve")
         graph.add_edge("retrieve", "decide")
         graph.add_conditional_edges("decide", lambda s: "rag_generate" if s.get("use_rag") else "fallback")
-        graph.add_edge("rag_generate", "memory")
+        graph.add_edge("rag_generate", "cache_store")
+        graph.add_edge("cache_store", "memory")
         graph.add_edge("fallback", "memory")
         graph.add_edge("memory", END)
 
-        graph.set_entry_point("retrieve")
-        compiled = graph.compile()
+        graph.set_entry_point("recall")
+        return graph.compile()
 
-        final_state = await compiled.ainvoke(initial_state)
+    async def run_graph(self, initial_state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the precompiled graph for one request.
+        """
+        run_id = initial_state.setdefault("run_id", uuid.uuid4().hex)
+        try:
+            final_state = await self._graph.ainvoke(initial_state)
+        finally:
+            # never leak a speculative call past the end of its run
+            self._cancel_speculation(run_id)
         final_state.setdefault("events", final_state.get("events", []))
         return final_state
 
+    def single_flight_stats(self) -> dict:
+        return self._flights.stats()
+
+    def speculation_stats(self) -> dict:
+        return self._speculation.stats()
+
+    def routing_stats(self) -> dict:
+        return self._router.stats() if self._router is not None else {"enabled": False}
+
+    def intent_stats(self) -> dict:
+        return self._intents.stats() if self._intents is not None else {"enabled": False}
+
+    def memory_stats(self) -> dict:
+        return self._memory.stats() if self._memory is not None else {"enabled": False}
+
+    def admission_stats(self) -> dict:
+        return {"llm": self._llm_gate.stats(), "embedding": self._embed_gate.stats()}
+
     async def close(self):
+        for task in list(self._compacting.values()):
+            task.cancel()
         await self._client.aclose()
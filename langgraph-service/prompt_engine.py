@@ -17,15 +17,55 @@ Structured prompt engineering layer with three components:
 
 Primary goal: minimize hallucinations by grounding every response in
 retrieved context and constraining generation behavior via prompt structure.
+
+Prompts are ordered static-first (system prompt, including the CoT
+instruction, precomputed per intent) so provider-side prompt caching can
+reuse the prefix; retrieved context is packed into a token budget.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import re
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+# Exact token counts when tiktoken is installed, ~4 chars/token otherwise
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    _ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
 
-from embedding_service.biobert_embedder import RetrievedChunk, format_context
+# ── Retrieved chunks ─────────────────────────────────────────────────────────
+# Same shape and context format as embedding_service.biobert_embedder, defined
+# here so the LangGraph service does not import the embedding stack.
+
+@dataclass
+class RetrievedChunk:
+    text: str
+    source_type: str              # "guide" | "ticket" | "doc"
+    document_id: str
+    chunk_index: Optional[int]    # None when the source does not report one
+    score: float                  # retrieval score; direction depends on the backend
+
+
+def format_context(chunks: List[RetrievedChunk]) -> str:
+    """
+    Format retrieved chunks into a structured context string
+    for injection into the LLM prompt.
+    """
+    parts = []
+    for i, chunk in enumerate(chunks, 1):
+        parts.append(
+            f"[Source {i} | type={chunk.source_type} | doc={chunk.document_id}]\n"
+            f"{chunk.text.strip()}"
+        )
+    return "\n\n---\n\n".join(parts)
 
 
 # ── Query intent classification ──────────────────────────────────────────────
@@ -82,10 +122,11 @@ behavior is, then identify where the deviation occurs, then list resolution step
 
 def build_system_prompt(intent: QueryIntent = QueryIntent.GENERAL) -> str:
     """
-    Compose the final system prompt by combining the base prompt
-    with intent-specific addendum instructions.
+    System prompt for an intent: base prompt + intent addendum
+    (+ CoT instruction for operational/troubleshoot queries).
+    Precomputed once, so the same intent always yields the same prefix.
     """
-    return BASE_SYSTEM_PROMPT + INTENT_ADDENDUM.get(intent, "")
+    return SYSTEM_PROMPTS[intent]
 
 
 # ── 2. DYNAMIC CONTEXT INJECTION ─────────────────────────────────────────────
@@ -119,6 +160,156 @@ def inject_context(chunks: List[RetrievedChunk]) -> str:
     return CONTEXT_BLOCK_TEMPLATE.format(context=formatted)
 
 
+DEFAULT_CONTEXT_BUDGET_TOKENS = 3000
+NEAR_DUPLICATE_CONTAINMENT = 0.85
+_MAX_OVERLAP_WORDS = 128  # ingestion overlaps are 64 words; leave headroom
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:max_tokens])
+    return text[: max_tokens * 4]
+
+
+def _join_overlapping(a: str, b: str) -> str:
+    """
+    Concatenate two consecutive chunks, dropping the words b repeats from
+    the end of a (the ingestion overlap).
+    """
+    aw, bw = a.split(), b.split()
+    for k in range(min(len(aw), len(bw), _MAX_OVERLAP_WORDS), 0, -1):
+        if aw[-k:] == bw[:k]:
+            return " ".join(aw + bw[k:])
+    return a.rstrip() + "\n" + b.lstrip()
+
+
+def merge_adjacent_chunks(chunks: List[RetrievedChunk]) -> List[Tuple[int, RetrievedChunk]]:
+    """
+    Merge runs of consecutive chunk_index from the same document into one
+    chunk. Returns (rank, chunk) pairs sorted by rank, where rank is the best
+    (lowest) retrieval position among the merged members; exact repeats of
+    the same chunk are dropped.
+    """
+    by_doc: Dict[str, List[Tuple[int, RetrievedChunk]]] = {}
+    loose: List[Tuple[int, RetrievedChunk]] = []
+    for rank, chunk in enumerate(chunks):
+        if chunk.chunk_index is None:
+            loose.append((rank, chunk))
+        else:
+            by_doc.setdefault(chunk.document_id, []).append((rank, chunk))
+
+    merged = loose
+    for members in by_doc.values():
+        members.sort(key=lambda rc: rc[1].chunk_index)
+        run_rank, run = members[0]
+        last_index = run.chunk_index
+        for rank, chunk in members[1:]:
+            if chunk.chunk_index == last_index:
+                run_rank = min(run_rank, rank)  # same chunk retrieved twice
+                continue
+            if chunk.chunk_index == last_index + 1:
+                best = run if run_rank <= rank else chunk
+                run = replace(run, text=_join_overlapping(run.text, chunk.text), score=best.score)
+                run_rank = min(run_rank, rank)
+            else:
+                merged.append((run_rank, run))
+                run_rank, run = rank, chunk
+            last_index = chunk.chunk_index
+        merged.append((run_rank, run))
+    return sorted(merged, key=lambda rc: rc[0])
+
+
+def _shingles(text: str, n: int = 5) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _containment(candidate: Set, kept: Set) -> float:
+    # share of the candidate's shingles already present in a kept chunk
+    if not candidate:
+        return 1.0
+    return len(candidate & kept) / len(candidate)
+
+
+@dataclass
+class PackedContext:
+    chunks: List[RetrievedChunk]   # merged, deduplicated, in relevance order
+    tokens: int                    # tokens of the formatted context block
+    merged: int = 0                # input chunks absorbed into a neighbour
+    duplicates: int = 0            # near-identical chunks removed
+    dropped: int = 0               # chunks that did not fit the budget
+
+
+def pack_context(
+    chunks: List[RetrievedChunk],
+    budget_tokens: int = DEFAULT_CONTEXT_BUDGET_TOKENS,
+    dedup_threshold: float = NEAR_DUPLICATE_CONTAINMENT,
+) -> PackedContext:
+    """
+    Fit retrieved chunks into a token budget.
+
+    Chunks are taken in retrieval order (most relevant first); scores are not
+    compared because their direction differs between FAISS (distance) and
+    Pinecone (similarity). Adjacent chunks of the same document are merged
+    first, near-duplicates (chunks whose word 5-grams are mostly already in
+    a more relevant chunk) are removed, then chunks are added while they fit.
+    If even the most relevant chunk does not fit, it is truncated so the
+    prompt always carries some context.
+    """
+    ranked = merge_adjacent_chunks(chunks)
+    merged = len(chunks) - len(ranked)
+
+    kept: List[RetrievedChunk] = []
+    signatures: List[Set] = []
+    duplicates = dropped = 0
+    used = count_tokens(CONTEXT_BLOCK_TEMPLATE.format(context=""))
+    for _, chunk in ranked:
+        sig = _shingles(chunk.text)
+        if any(_containment(sig, other) >= dedup_threshold for other in signatures):
+            duplicates += 1
+            continue
+        # cost as formatted, including the source header and separator
+        cost = count_tokens(format_context([chunk])) + 3
+        if used + cost > budget_tokens:
+            remaining = budget_tokens - used - (cost - count_tokens(chunk.text.strip()))
+            if kept or remaining <= 0:
+                dropped += 1
+                continue
+            chunk = replace(chunk, text=_truncate_to_tokens(chunk.text.strip(), remaining))
+            cost = count_tokens(format_context([chunk])) + 3
+        kept.append(chunk)
+        signatures.append(sig)
+        used += cost
+
+    return PackedContext(chunks=kept, tokens=used, merged=merged, duplicates=duplicates, dropped=dropped)
+
+
+def chunks_from_matches(matches: List[Dict[str, Any]]) -> List[RetrievedChunk]:
+    """
+    Convert RAG service /search matches (Pinecone-style dicts) into chunks.
+    """
+    chunks = []
+    for m in matches:
+        md = m.get("metadata") or {}
+        index = m.get("chunk_index", md.get("chunk_index", md.get("chunk_id")))
+        chunks.append(RetrievedChunk(
+            text=m.get("text") or md.get("text", ""),
+            source_type=md.get("source_type", "unknown"),
+            document_id=m.get("document_id") or md.get("source_id") or md.get("document_id") or "unknown",
+            chunk_index=int(index) if index is not None else None,
+            score=float(m.get("score", 0.0)),
+        ))
+    return chunks
+
+
 # ── 3. CHAIN-OF-THOUGHT REASONING ────────────────────────────────────────────
 
 COT_INSTRUCTION = """\
@@ -155,6 +346,15 @@ def should_use_cot(intent: QueryIntent) -> bool:
     return intent in COT_INTENT_TRIGGERS
 
 
+# Static per-intent prefixes, built once at import. Everything that does not
+# depend on the request lives here, ahead of the retrieved context, so
+# requests with the same intent share a byte-identical prompt prefix.
+SYSTEM_PROMPTS: Dict[QueryIntent, str] = {
+    intent: BASE_SYSTEM_PROMPT + INTENT_ADDENDUM.get(intent, "") + ("\n" + COT_INSTRUCTION if should_use_cot(intent) else "")
+    for intent in QueryIntent
+}
+
+
 # ── Assembled prompt builder ─────────────────────────────────────────────────
 
 @dataclass
@@ -164,6 +364,7 @@ class PromptPackage:
     intent: QueryIntent
     chunk_count: int
     cot_enabled: bool
+    context_tokens: int = 0
 
 
 def build_prompt(
@@ -171,61 +372,65 @@ def build_prompt(
     chunks: List[RetrievedChunk],
     intent: QueryIntent = QueryIntent.GENERAL,
     conversation_history: Optional[List[dict]] = None,
+    context_budget_tokens: Optional[int] = DEFAULT_CONTEXT_BUDGET_TOKENS,
 ) -> PromptPackage:
     """
     Assemble the complete prompt package for the LLM call.
 
     Combines:
-      - System prompt with intent-specific behavior rules
-      - Dynamic context block from retrieved RAG chunks
-      - Chain-of-thought instruction (for operational/troubleshoot queries)
+      - Precomputed system prompt: behavior rules, intent addendum and the
+        chain-of-thought instruction (for operational/troubleshoot queries)
+      - Dynamic context block from retrieved RAG chunks, packed into
+        context_budget_tokens (None sends every chunk verbatim)
       - The user's query
 
     Args:
         query:                 Raw user query string.
-        chunks:                Top-k retrieved chunks from FAISS.
+        chunks:                Top-k retrieved chunks, most relevant first.
         intent:                Classified query intent.
         conversation_history:  Prior turns for multi-turn context (optional).
+        context_budget_tokens: Token budget for the context block.
 
     Returns:
         PromptPackage with all assembled components.
     """
-    use_cot = should_use_cot(intent)
+    if context_budget_tokens is not None:
+        chunks = pack_context(chunks, context_budget_tokens).chunks
 
-    system_prompt = build_system_prompt(intent)
     context_block = inject_context(chunks)
-
-    # Build user message: context + optional CoT instruction + query
-    user_parts = [context_block]
-    if use_cot:
-        user_parts.append(COT_INSTRUCTION)
-    user_parts.append(f"User question: {query}")
-
-    user_message = "\n\n".join(user_parts)
+    user_message = f"{context_block}\n\nUser question: {query}"
 
     return PromptPackage(
-        system_prompt=system_prompt,
+        system_prompt=build_system_prompt(intent),
         user_message=user_message,
         intent=intent,
         chunk_count=len(chunks),
-        cot_enabled=use_cot,
+        cot_enabled=should_use_cot(intent),
+        context_tokens=count_tokens(context_block),
     )
 
 
 def to_openai_messages(
     package: PromptPackage,
     conversation_history: Optional[List[dict]] = None,
+    conversation_summary: Optional[str] = None,
 ) -> List[dict]:
     """
     Convert a PromptPackage into the OpenAI messages array format.
     Prepends system prompt and appends prior conversation turns
     for multi-turn context continuity.
 
+    With a rolling summary (see conversation_memory.py), pass only the
+    turns the summary does not cover as conversation_history.
+
     Returns:
         List of {"role": ..., "content": ...} dicts ready for the API call.
     """
     messages = [{"role": "system", "content": package.system_prompt}]
 
+    if conversation_summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation_summary}"})
+
     # Inject conversation history for multi-turn continuity
     if conversation_history:
         messages.extend(conversation_history)
@@ -234,6 +439,56 @@ def to_openai_messages(
     return messages
 
 
+def to_text_prompt(package: PromptPackage, conversation: str = "") -> str:
+    """
+    Single-string form for endpoints that take a plain prompt, in the same
+    static-first order as to_openai_messages: system prompt, conversation
+    (summary + recent turns, see format_conversation), then context + question.
+    """
+    parts = [package.system_prompt]
+    if conversation:
+        parts.append(conversation)
+    parts.append(package.user_message)
+    return "\n\n".join(parts)
+
+
+# ── Conversation memory (rolling summary) ────────────────────────────────────
+
+SUMMARY_PROMPT_TEMPLATE = """\
+Update the running summary of a support conversation.
+Keep facts, decisions, open questions and anything the user said about \
+their setup. Drop greetings and filler. Stay under 200 words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def format_turns(turns: List[dict]) -> str:
+    return "\n".join(f"{t.get('role', 'User')}: {t.get('content', '')}" for t in turns)
+
+
+def format_conversation(summary: str, turns: List[dict]) -> str:
+    """
+    Conversation block for string prompts: running summary, then the
+    recent turns it does not cover yet. Empty for a new session.
+    """
+    parts = []
+    if summary:
+        parts.append(f"Conversation summary:\n{summary}")
+    if turns:
+        parts.append(f"Recent messages:\n{format_turns(turns)}")
+    return "\n\n".join(parts)
+
+
+def build_summary_prompt(summary: str, turns: List[dict]) -> str:
+    return SUMMARY_PROMPT_TEMPLATE.format(summary=summary or "(none)", messages=format_turns(turns))
+
+
 # ── Intent classifier (lightweight keyword heuristic) ────────────────────────
 
 OPERATIONAL_SIGNALS = {"how to", "how do i", "steps to", "procedure", "configure", "deploy", "run", "install", "set up"}
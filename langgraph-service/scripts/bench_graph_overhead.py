@@ -0,0 +1,81 @@
+# langgraph-service/scripts/bench_graph_overhead.py
+"""
+Per-request overhead of the old vs. new /run_graph handler.
+
+  per-request: new httpx client + StateGraph build/compile + ainvoke (old handler)
+  shared:      one LangGraphNodes (compiled graph + pooled client) reused (new handler)
+
+Downstream services are replaced by an in-process httpx.MockTransport so the
+numbers isolate graph construction and client setup, not network latency.
+
+Run from langgraph-service/:
+    python -m scripts.bench_graph_overhead --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from nodes.langgraph_nodes import LangGraphNodes
+
+
+def _mock_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/search"):
+        return httpx.Response(200, json={"matches": [{"text": "ctx", "score": 0.9}]})
+    if request.url.path.endswith("/stream"):
+        return httpx.Response(200, text='{"delta": "answer"}\n')
+    return httpx.Response(200, json={"llm_output": "answer", "output": "answer"})
+
+
+def _mock_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(_mock_handler))
+
+
+def _state(i: int) -> dict:
+    return {"session_id": f"bench-{i}", "type": "user_message", "user_message": "how do I deploy?",
+            "history": [], "events": [], "llm_output": None, "use_rag": False,
+            "rag_answer": "", "confidence": 0.0, "summary": ""}
+
+
+async def per_request(n: int) -> list:
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        nodes = LangGraphNodes(client=_mock_client())
+        await nodes.run_graph(_state(i))
+        await nodes.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def shared(n: int) -> list:
+    nodes = LangGraphNodes(client=_mock_client())
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        await nodes.run_graph(_state(i))
+        timings.append(time.perf_counter() - start)
+    await nodes.close()
+    return timings
+
+
+def _report(name: str, timings: list):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:<12} mean={statistics.mean(ms):7.3f} ms  p50={statistics.median(ms):7.3f} ms  p95={p95:7.3f} ms")
+
+
+async def main(n: int):
+    # warm imports / first compile out of the measurement
+    await shared(5)
+    _report("per-request", await per_request(n))
+    _report("shared", await shared(n))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
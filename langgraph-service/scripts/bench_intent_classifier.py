@@ -0,0 +1,102 @@
+# langgraph-service/scripts/bench_intent_classifier.py
+"""
+Accuracy and per-call latency: keyword heuristic vs. nearest-centroid.
+
+Accuracy for the centroid classifier is measured with stratified k-fold
+cross-validation over the labelled examples (centroids never see the query
+they are scored on). Latency is per classify call only: the query embedding
+is already computed upstream (orchestrator or semantic cache), so it is
+not counted. --space picks the embedding space as in build_intent_centroids.
+
+Run from langgraph-service/:
+    python -m scripts.bench_intent_classifier --examples data/intent_examples.jsonl
+Pass --vectors cache.npy to reuse embeddings between runs.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from intent_classifier import CentroidIntentClassifier, build_centroids
+from prompt_engine import classify_intent
+from scripts.build_intent_centroids import load_examples, vectors_for
+
+
+def _folds(labels, k: int, seed: int = 0):
+    by_label = defaultdict(list)
+    for i, label in enumerate(labels):
+        by_label[label].append(i)
+    rng = random.Random(seed)
+    folds = [[] for _ in range(k)]
+    for idxs in by_label.values():
+        rng.shuffle(idxs)
+        for j, i in enumerate(idxs):
+            folds[j % k].append(i)
+    return folds
+
+
+def _latency_us(fn, items, repeat: int = 20):
+    timings = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.mean(timings), timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", default="data/intent_examples.jsonl")
+    parser.add_argument("--vectors", default=None, help="cache file for example embeddings (.npy)")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--space", choices=("biobert", "embed"), default="biobert")
+    args = parser.parse_args()
+
+    texts, labels = load_examples(args.examples)
+    if args.vectors and os.path.exists(args.vectors):
+        vectors = np.load(args.vectors)
+    else:
+        vectors = vectors_for(texts, args.space)
+        if args.vectors:
+            np.save(args.vectors, vectors)
+
+    keyword_correct = sum(classify_intent(t).value == label for t, label in zip(texts, labels))
+
+    centroid_correct = 0
+    per_intent = defaultdict(lambda: [0, 0])
+    for test in _folds(labels, args.folds):
+        test_set = set(test)
+        train = [i for i in range(len(texts)) if i not in test_set]
+        clf = CentroidIntentClassifier(
+            build_centroids(vectors[train], [labels[i] for i in train]), min_similarity=-1.0)
+        for i in test:
+            intent, _ = clf.classify(texts[i], vectors[i])
+            ok = intent.value == labels[i]
+            centroid_correct += ok
+            per_intent[labels[i]][0] += ok
+            per_intent[labels[i]][1] += 1
+
+    clf = CentroidIntentClassifier(build_centroids(vectors, labels), min_similarity=-1.0)
+    kw_lat = _latency_us(classify_intent, texts)
+    ct_lat = _latency_us(lambda i: clf.classify(texts[i], vectors[i]), range(len(texts)))
+    # as called from the graph: the vector arrives as a JSON list, not an ndarray
+    as_lists = [v.tolist() for v in vectors]
+    ct_list_lat = _latency_us(lambda i: clf.classify(texts[i], as_lists[i]), range(len(texts)))
+
+    n = len(texts)
+    print(f"examples={n} dim={vectors.shape[1]} folds={args.folds}")
+    print(f"keyword   accuracy={keyword_correct / n:.3f}  latency mean={kw_lat[0]:.1f}us p50={kw_lat[1]:.1f}us p99={kw_lat[2]:.1f}us")
+    print(f"centroid  accuracy={centroid_correct / n:.3f}  latency mean={ct_lat[0]:.1f}us p50={ct_lat[1]:.1f}us p99={ct_lat[2]:.1f}us")
+    print(f"centroid (list input)              latency mean={ct_list_lat[0]:.1f}us p50={ct_list_lat[1]:.1f}us p99={ct_list_lat[2]:.1f}us")
+    for intent, (ok, total) in sorted(per_intent.items()):
+        print(f"  {intent:<13} {ok}/{total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# langgraph-service/scripts/build_intent_centroids.py
+"""
+Build intent centroids offline from labelled example queries.
+
+Examples are JSONL lines {"text": ..., "intent": "operational" | "troubleshoot"
+| "factual" | "general"}. Each is embedded in the space the classifier sees
+at query time, and the normalized mean per intent is written to
+INTENT_CENTROIDS_PATH:
+  --space biobert  BioBERT (embedding_service.biobert_embedder), the vector the
+                   orchestrator computes for retrieval and sends with each run
+  --space embed    the embedding service's /embed endpoint, for deployments
+                   without in-process retrieval (the semantic cache embeds there)
+
+Run from langgraph-service/:
+    python -m scripts.build_intent_centroids --examples data/intent_examples.jsonl
+    python -m scripts.build_intent_centroids --space embed
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import types
+
+import httpx
+import numpy as np
+
+from config import EMBEDDING_SERVICE_URL, OUTBOUND_API_KEY, INTENT_CENTROIDS_PATH
+from intent_classifier import build_centroids, save_centroids
+
+
+def load_examples(path: str):
+    texts, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(row["intent"])
+    return texts, labels
+
+
+async def embed_texts(texts, concurrency: int = 8) -> np.ndarray:
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=60.0, headers={"x-api-key": OUTBOUND_API_KEY}) as client:
+        async def one(text):
+            async with sem:
+                resp = await client.post(f"{EMBEDDING_SERVICE_URL}/embed", json={"content": text})
+                resp.raise_for_status()
+                return resp.json()["embedding"]
+        return np.asarray(await asyncio.gather(*(one(t) for t in texts)), dtype=np.float32)
+
+
+def biobert_texts(texts) -> np.ndarray:
+    # the orchestrator imports embedding-service/ as the embedding_service package
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    pkg = types.ModuleType("embedding_service")
+    pkg.__path__ = [os.path.join(root, "embedding-service")]
+    sys.modules.setdefault("embedding_service", pkg)
+    from embedding_service import biobert_embedder
+    return np.asarray(biobert_embedder.embed_batch(list(texts)), dtype=np.float32)
+
+
+def vectors_for(texts, space: str) -> np.ndarray:
+    if space == "biobert":
+        return biobert_texts(texts)
+    return asyncio.run(embed_texts(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", default="data/intent_examples.jsonl")
+    parser.add_argument("--out", default=INTENT_CENTROIDS_PATH)
+    parser.add_argument("--space", choices=("biobert", "embed"), default="biobert")
+    args = parser.parse_args()
+
+    texts, labels = load_examples(args.examples)
+    vectors = vectors_for(texts, args.space)
+    centroids = build_centroids(vectors, labels)
+    save_centroids(args.out, centroids, examples=len(texts), space=args.space)
+    print(f"wrote {len(centroids)} {args.space} centroids (dim={vectors.shape[1]}) "
+          f"from {len(texts)} examples to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+langgraph-service/semantic_cache.py
+
+Semantic answer cache keyed on query embeddings.
+
+Support traffic repeats itself with slightly different wording. Before
+retrieval, the query embedding is compared against cached RAG answers in the
+same (namespace, intent) bucket; above the similarity threshold the cached
+answer is returned directly, skipping retrieval and generation.
+
+Redis layout (shared by all replicas):
+  semcache:bucket:{namespace}:{intent}:{dim}  ZSET  entry_id -> created_at
+  semcache:entry:{entry_id}              HASH  vec, answer, docs, saved_s  (TTL)
+  docver:{document_id}                   INT   bumped by the indexer on re-index/delete
+
+An entry stores the docver of every document it cited. A hit whose cited
+documents have since been re-indexed or deleted is discarded, so invalidation
+needs no fan-out from the indexer.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+# dim keeps vectors from different embedders (orchestrator BioBERT vs /embed) apart
+BUCKET_KEY = "semcache:bucket:{namespace}:{intent}:{dim}"
+ENTRY_KEY = "semcache:entry:{entry_id}"
+DOC_VERSION_KEY = "docver:{document_id}"
+
+
+@dataclass
+class CacheHit:
+    answer: str
+    similarity: float
+    saved_seconds: float
+
+
+def _normalize(vec) -> np.ndarray:
+    arr = np.asarray(vec, dtype="float32")
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        redis_url: str,
+        threshold: float = 0.92,
+        ttl_seconds: int = 86400,
+        max_entries_per_bucket: int = 2000,
+        thresholds_by_dim: Optional[Dict[int, float]] = None,
+    ):
+        self._redis = redis.from_url(redis_url)
+        self.threshold = threshold
+        self.thresholds_by_dim = thresholds_by_dim or {}
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_bucket = max_entries_per_bucket
+
+        # process-local counters, exposed via /stats/semantic_cache
+        self.lookups = 0
+        self.hits = 0
+        self.invalidated = 0
+        self.latency_saved_seconds = 0.0
+
+    async def lookup(self, namespace: str, intent: str, query_vec) -> Optional[CacheHit]:
+        """
+        Return the best cached answer above the threshold, or None.
+        """
+        self.lookups += 1
+        start = time.perf_counter()
+        bucket = BUCKET_KEY.format(namespace=namespace, intent=intent, dim=len(query_vec))
+
+        # drop ids whose entries have certainly expired, then scan the rest
+        await self._redis.zremrangebyscore(bucket, 0, time.time() - self.ttl_seconds)
+        entry_ids = await self._redis.zrange(bucket, 0, -1)
+        if not entry_ids:
+            return None
+
+        pipe = self._redis.pipeline()
+        for entry_id in entry_ids:
+            pipe.hget(ENTRY_KEY.format(entry_id=entry_id.decode()), "vec")
+        raw_vecs = await pipe.execute()
+
+        live_ids, vecs = [], []
+        for entry_id, raw in zip(entry_ids, raw_vecs):
+            if raw is not None:
+                live_ids.append(entry_id.decode())
+                vecs.append(np.frombuffer(raw, dtype="float32"))
+        if not vecs:
+            return None
+
+        sims = np.vstack(vecs) @ _normalize(query_vec)
+        best = int(np.argmax(sims))
+        if float(sims[best]) < self.thresholds_by_dim.get(len(query_vec), self.threshold):
+            return None
+
+        entry_key = ENTRY_KEY.format(entry_id=live_ids[best])
+        answer, docs_raw, saved_raw = await self._redis.hmget(entry_key, "answer", "docs", "saved_s")
+        if answer is None:
+            return None
+
+        if not await self._docs_current(json.loads(docs_raw or "{}")):
+            self.invalidated += 1
+            await self._redis.delete(entry_key)
+            await self._redis.zrem(bucket, live_ids[best])
+            return None
+
+        saved = max(float(saved_raw or 0.0) - (time.perf_counter() - start), 0.0)
+        self.hits += 1
+        self.latency_saved_seconds += saved
+        return CacheHit(answer=answer.decode(), similarity=float(sims[best]), saved_seconds=saved)
+
+    async def store(
+        self,
+        namespace: str,
+        intent: str,
+        query_vec,
+        answer: str,
+        document_ids: List[str],
+        generation_seconds: float,
+    ):
+        """
+        Cache a RAG answer together with the current version of each cited document.
+        """
+        doc_ids = sorted(set(d for d in document_ids if d))
+        versions = await self._doc_versions(doc_ids)
+        entry_id = uuid.uuid4().hex
+        entry_key = ENTRY_KEY.format(entry_id=entry_id)
+        bucket = BUCKET_KEY.format(namespace=namespace, intent=intent, dim=len(query_vec))
+
+        pipe = self._redis.pipeline()
+        pipe.hset(entry_key, mapping={
+            "vec": _normalize(query_vec).tobytes(),
+            "answer": answer,
+            "docs": json.dumps(versions),
+            "saved_s": generation_seconds,
+        })
+        pipe.expire(entry_key, self.ttl_seconds)
+        pipe.zadd(bucket, {entry_id: time.time()})
+        # keep the newest N entries so the linear scan stays bounded
+        pipe.zremrangebyrank(bucket, 0, -(self.max_entries_per_bucket + 1))
+        pipe.expire(bucket, self.ttl_seconds)
+        await pipe.execute()
+
+    async def _doc_versions(self, doc_ids: List[str]) -> Dict[str, int]:
+        if not doc_ids:
+            return {}
+        raw = await self._redis.mget([DOC_VERSION_KEY.format(document_id=d) for d in doc_ids])
+        return {d: int(v or 0) for d, v in zip(doc_ids, raw)}
+
+    async def _docs_current(self, cached_versions: Dict[str, int]) -> bool:
+        current = await self._doc_versions(list(cached_versions))
+        return current == cached_versions
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "invalidated": self.invalidated,
+            "latency_saved_seconds_total": round(self.latency_saved_seconds, 3),
+            "latency_saved_seconds_avg": round(self.latency_saved_seconds / self.hits, 3) if self.hits else 0.0,
+        }
+
+    async def close(self):
+        await self._redis.close()
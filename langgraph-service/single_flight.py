@@ -0,0 +1,96 @@
+# langgraph-service/single_flight.py
+# Single-flight coalescing of identical in-flight LLM calls
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+# fn(publish) performs the upstream call; publish(delta) fans a token out to every waiter
+FlightFn = Callable[[Callable[[str], None]], Awaitable[Any]]
+
+
+def flight_key(endpoint: str, prompt: str, model: Optional[str] = None, max_tokens: Optional[int] = None,
+               priority: Optional[int] = None, max_wait: Optional[float] = None) -> str:
+    """
+    Key on endpoint, model, max_tokens, the admission class (priority and
+    max_wait) and the whitespace-normalized prompt. Calls admitted on
+    different terms never share a flight: a caller that may queue must not
+    inherit the shedding of a no-wait speculative call it joined.
+    """
+    normalized = " ".join(prompt.split())
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    admission = f"{'default' if priority is None else priority}/{'default' if max_wait is None else max_wait}"
+    return f"{endpoint}:{model or 'default'}:{max_tokens or 'default'}:{admission}:{digest}"
+
+
+class _Flight:
+    __slots__ = ("task", "sinks", "tokens", "waiters")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.sinks: List[asyncio.Queue] = []
+        self.tokens: List[str] = []
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one upstream call.
+    - The first caller starts the call in its own task; later callers await it.
+    - Token deltas are fanned out to every streaming waiter; late joiners
+      get the tokens produced so far replayed first.
+    - An upstream failure is raised in every waiter.
+    - A cancelled waiter only cancels itself; the upstream call is cancelled
+      once no waiters remain.
+    Results are not cached: the key is released as soon as the call finishes.
+    """
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.upstream_calls = 0
+        self.calls_saved = 0
+
+    async def do(self, key: Hashable, fn: FlightFn, sink: Optional[asyncio.Queue] = None) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, fn))
+            self.upstream_calls += 1
+        else:
+            self.calls_saved += 1
+
+        if sink is not None:
+            for delta in flight.tokens:
+                sink.put_nowait({"type": "token", "data": delta})
+            flight.sinks.append(sink)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if sink is not None:
+                flight.sinks.remove(sink)
+            if flight.waiters == 0 and not flight.task.done():
+                # release the key now: a caller arriving before the cancelled
+                # task unwinds must start a fresh call, not join a dying one
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key: Hashable, flight: _Flight, fn: FlightFn) -> Any:
+        def publish(delta: str):
+            flight.tokens.append(delta)
+            for sink in flight.sinks:
+                sink.put_nowait({"type": "token", "data": delta})
+
+        try:
+            return await fn(publish)
+        finally:
+            # only our own entry: after a cancel the key may already hold a new flight
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self.upstream_calls,
+            "calls_saved": self.calls_saved,
+        }
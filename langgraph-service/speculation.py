@@ -0,0 +1,74 @@
+# langgraph-service/speculation.py
+# Policy for speculative fallback generation (started in parallel with retrieval)
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class SpeculationPolicy:
+    """
+    Per-request policy, sent as RunGraphRequest.speculation.
+
+    enabled:           caller opts in to speculation for this request
+    budget_tokens:     tokens the caller is willing to waste if RAG wins and the
+                       speculative fallback is thrown away
+    min_fallback_rate: only speculate while the observed share of requests that
+                       end on the fallback path is at least this high
+    """
+    enabled: bool = False
+    budget_tokens: int = 0
+    min_fallback_rate: float = 0.0
+
+    @classmethod
+    def from_request(cls, raw: Optional[Dict[str, Any]], default_budget_tokens: int) -> "SpeculationPolicy":
+        raw = raw or {}
+        return cls(
+            enabled=bool(raw.get("enabled", False)),
+            budget_tokens=int(raw.get("budget_tokens", default_budget_tokens)),
+            min_fallback_rate=float(raw.get("min_fallback_rate", 0.0)),
+        )
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+class SpeculationTracker:
+    """
+    Tracks how often decide_node picks the fallback path (EWMA) and
+    the outcome of each speculative call.
+    """
+    def __init__(self, alpha: float = 0.05):
+        self._alpha = alpha
+        self.fallback_rate = 0.5  # neutral prior until decisions are observed
+        self.started = 0
+        self.used = 0
+        self.cancelled = 0
+        self.skipped_budget = 0
+        self.skipped_rate = 0
+
+    def record_decision(self, used_fallback: bool):
+        self.fallback_rate += self._alpha * ((1.0 if used_fallback else 0.0) - self.fallback_rate)
+
+    def allow(self, policy: SpeculationPolicy, estimated_cost_tokens: int) -> bool:
+        if not policy.enabled:
+            return False
+        if estimated_cost_tokens > policy.budget_tokens:
+            self.skipped_budget += 1
+            return False
+        if self.fallback_rate < policy.min_fallback_rate:
+            self.skipped_rate += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "fallback_rate": round(self.fallback_rate, 4),
+            "started": self.started,
+            "used": self.used,
+            "cancelled": self.cancelled,
+            "skipped_budget": self.skipped_budget,
+            "skipped_fallback_rate": self.skipped_rate,
+        }
@@ -8,5 +8,26 @@ RAG_SERVICE_PORT = int(os.environ.get("RAG_SERVICE_PORT", 8001))
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.environ.get("PINECONE_ENVIRONMENT", "us-west1-gcp")
 PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "default-index")
+# the Dockerfile / compose set PINECONE_ENV
+PINECONE_ENV = os.environ.get("PINECONE_ENV", PINECONE_ENVIRONMENT)
+PINECONE_NAMESPACE = os.environ.get("PINECONE_NAMESPACE")
+
+# Vector storage: "pinecone" (hosted) or "local" (FAISS on disk, searched in-process)
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "pinecone")
+LOCAL_VECTOR_STORE_PATH = os.environ.get("LOCAL_VECTOR_STORE_PATH", "/data/vector_store")
 
 SERVICE_API_KEY = os.environ.get("SERVICE_API_KEY", "default-rag-key")
+API_KEY = os.environ.get("API_KEY", SERVICE_API_KEY)
+
+# Redis: per-document version counters (docver:{id}) used to invalidate
+# the LangGraph semantic answer cache when a document is re-indexed
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+
+# Ingestion (/upsert jobs): chunks per embed/upsert batch, batches in flight per stage,
+# background jobs run at once, and jobs that may wait in the queue before /upsert answers 503
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", 100))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", 2))
+UPSERT_CONCURRENCY = int(os.environ.get("UPSERT_CONCURRENCY", 4))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 2))
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 100))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 500))  # finished jobs kept for /jobs/{id}
@@ -1,18 +1,28 @@
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Header
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Header, Depends
 from pydantic import BaseModel
 from typing import List, Dict, Any
-from pipeline.index_build import PineconeIndexer
-from pipeline.loader import load_documents_from_file
-from pipeline.search import pinecone_search, pinecone_retrieve
-from config import API_KEY
+from contextlib import asynccontextmanager
+from pipeline.jobs import IngestJobs
+from pipeline.search import indexer, pinecone_search, pinecone_retrieve
+from config import API_KEY, REDIS_URL
+import redis.asyncio as redis
 import uvicorn
 import tempfile
 import os
 import shutil
 import asyncio
 
-app = FastAPI(title="RAG Service (Pinecone)")
-indexer = PineconeIndexer()
+doc_versions = redis.from_url(REDIS_URL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # uploads are indexed by background workers; /upsert only queues them
+    app.state.jobs = IngestJobs(indexer, doc_versions=doc_versions)
+    app.state.jobs.start()
+    yield
+    await app.state.jobs.close()
+
+app = FastAPI(title="RAG Service (Pinecone)", lifespan=lifespan)
 
 def auth_check(x_api_key: str = Header(...)):
     if x_api_key != API_KEY:
@@ -32,37 +42,39 @@ class RetrieveRequest(BaseModel):
 # -----------------------------
 # Endpoints
 # -----------------------------
-@app.post("/upsert", dependencies=[Depends(auth_check)])
-async def upsert_file(file: UploadFile = File(...)):
+@app.post("/upsert", status_code=202, dependencies=[Depends(auth_check)])
+async def upsert_file(request: Request, file: UploadFile = File(...)):
     """
-    Upload a file, split into chunks and upsert to Pinecone
+    Upload a file and queue it to be split into chunks and upserted to Pinecone.
+    Returns a job id right away; poll /jobs/{job_id} for progress.
     """
-    # save to temp file
+    # save to temp file; the job removes it when done
     tmpdir = tempfile.mkdtemp()
-    path = os.path.join(tmpdir, file.filename)
+    path = os.path.join(tmpdir, os.path.basename(file.filename))
     with open(path, "wb") as f:
-        f.write(await file.read())
+        await asyncio.to_thread(shutil.copyfileobj, file.file, f)
     try:
-        docs = await load_documents_from_file(path)
-        # You will need a text splitter; here assume docs list contains page_content
-        chunks = []
-        for d_idx, d in enumerate(docs):
-            text = getattr(d, "page_content", None) or getattr(d, "text", None) or str(d)
-            # naive chunking: split by 1000 chars. Replace with your splitter strategy.
-            chunk_size = 1000
-            for i in range(0, len(text), chunk_size):
-                chunks.append({
-                    "id": file.filename,
-                    "chunk_id": i // chunk_size,
-                    "text": text[i:i+chunk_size],
-                    "metadata": {"filename": file.filename}
-                })
-        # upsert (run in threadpool)
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, indexer.upsert_documents, chunks)
-        return {"status": "ok", "chunks_indexed": len(chunks)}
-    finally:
+        job = request.app.state.jobs.submit(file.filename, path, tmpdir)
+    except asyncio.QueueFull:
         shutil.rmtree(tmpdir, ignore_errors=True)
+        raise HTTPException(status_code=503, detail="Ingestion queue full", headers={"Retry-After": "30"})
+    return {"status": "queued", "job_id": job.id, "status_url": f"/jobs/{job.id}"}
+
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(auth_check)])
+async def job_status(job_id: str, request: Request):
+    """
+    Progress and throughput of an /upsert job.
+    """
+    job = request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+
+@app.get("/stats/ingest_jobs")
+async def ingest_job_stats(request: Request):
+    return request.app.state.jobs.stats()
 
 
 @app.post("/search", dependencies=[Depends(auth_check)])
@@ -1,10 +1,12 @@
 # rag-service/pipeline/index_build.py
 import os
-import pinecone
 import math
-from typing import List, Dict, Any
-from config import PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX_NAME, PINECONE_NAMESPACE, BATCH_SIZE
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
+from config import PINECONE_NAMESPACE, BATCH_SIZE, EMBED_CONCURRENCY, UPSERT_CONCURRENCY
 from httpx import TimeoutException
+from .vector_store import VectorStore, create_vector_store
 
 # Replace `OpenAIEmbeddings` with your embedder if you have a wrapper
 try:
@@ -14,64 +16,96 @@ except Exception:
     OpenAIEmbeddings = None
 
 class PineconeIndexer:
-    def __init__(self, embedder=None):
-        if not PINECONE_API_KEY:
-            raise RuntimeError("PINECONE_API_KEY not set")
-        pinecone.init(api_key=PINECONE_API_KEY, environment=PINECONE_ENV)
-        self.index_name = PINECONE_INDEX_NAME
-        self.namespace = PINECONE_NAMESPACE or None
+    """
+    Embeds chunks and writes them to the configured VectorStore
+    (VECTOR_STORE: Pinecone or local FAISS), and serves queries from it.
+    """
 
-        # create index if not exists
-        if self.index_name not in pinecone.list_indexes():
-            if embedder is None and OpenAIEmbeddings is not None:
-                embedder_temp = OpenAIEmbeddings()
-                dim = len(embedder_temp.embed_query("test"))
-            else:
-                # fallback dimension, assume 1536 (OpenAI text-embedding-3-small / 1536)
-                dim = int(os.getenv("EMBED_DIM", "1536"))
-            pinecone.create_index(self.index_name, dimension=dim)
-        self.index = pinecone.Index(self.index_name)
+    def __init__(self, embedder=None, store: Optional[VectorStore] = None):
+        self.namespace = PINECONE_NAMESPACE or None
         self.embedder = embedder or (OpenAIEmbeddings() if OpenAIEmbeddings is not None else None)
+        self.store = store or create_vector_store(dimension=self._dimension)
+
+    def _dimension(self) -> int:
+        # only needed to create a new Pinecone index
+        if self.embedder is not None:
+            return len(self.embedder.embed_query("test"))
+        # fallback dimension, assume 1536 (OpenAI text-embedding-3-small / 1536)
+        return int(os.getenv("EMBED_DIM", "1536"))
 
     def _make_id(self, source_id: str, chunk_id: int):
         return f"{source_id}~{chunk_id}"
 
-    def upsert_documents(self, docs: List[Dict[str, Any]]):
+    def _embed_batch(self, batch: List[Dict[str, Any]]) -> list:
+        if not self.embedder:
+            # Placeholder: raise if no embedder
+            raise RuntimeError("No embedder configured for PineconeIndexer")
+        vectors = []
+        for j, emb in enumerate(self.embedder.embed_documents([d["text"] for d in batch])):
+            d = batch[j]
+            vec_id = self._make_id(d["id"], d.get("chunk_id", j))
+            metadata = d.get("metadata", {})
+            # keep a short snippet in metadata for retrieval convenience
+            metadata.setdefault("snippet", d["text"][:500])
+            metadata.update({"source_id": d["id"], "chunk_id": d.get("chunk_id", j)})
+            vectors.append((vec_id, emb, metadata))
+        return vectors
+
+    def upsert_documents(self, docs: List[Dict[str, Any]],
+                         on_batch: Optional[Callable[[int], None]] = None,
+                         embed_concurrency: int = EMBED_CONCURRENCY,
+                         upsert_concurrency: int = UPSERT_CONCURRENCY):
         """
         docs: list of dicts: {id: source_id, chunk_id: int, text: str, metadata: dict}
+
+        Embedding and upserting are pipelined: up to `embed_concurrency`
+        batches are being embedded while up to `upsert_concurrency` earlier
+        batches are being written to Pinecone, so the embedder never waits
+        on the network and vice versa. on_batch(n_chunks) is called as each
+        batch's upsert completes. The first failure is raised.
         """
-        # embed in batches
-        texts = [d["text"] for d in docs]
-        all_vectors = []
-        # compute embeddings in batches
-        for i in range(0, len(texts), BATCH_SIZE):
-            batch_texts = texts[i:i+BATCH_SIZE]
-            if self.embedder:
-                batch_embs = self.embedder.embed_documents(batch_texts)
-            else:
-                # Placeholder: raise if no embedder
-                raise RuntimeError("No embedder configured for PineconeIndexer")
-            vectors = []
-            for j, emb in enumerate(batch_embs):
-                d = docs[i+j]
-                vec_id = self._make_id(d["id"], d.get("chunk_id", j))
-                metadata = d.get("metadata", {})
-                # keep a short snippet in metadata for retrieval convenience
-                metadata.setdefault("snippet", d["text"][:500])
-                metadata.update({"source_id": d["id"], "chunk_id": d.get("chunk_id", j)})
-                vectors.append((vec_id, emb, metadata))
-            # upsert this batch
-            self.index.upsert(vectors=vectors, namespace=self.namespace)
+        batches = iter([docs[i:i+BATCH_SIZE] for i in range(0, len(docs), BATCH_SIZE)])
+        with ThreadPoolExecutor(embed_concurrency, thread_name_prefix="embed") as embed_pool, \
+                ThreadPoolExecutor(upsert_concurrency, thread_name_prefix="upsert") as upsert_pool:
+            embedding = deque()
+            upserting = deque()
+
+            def finish_upsert():
+                size, future = upserting.popleft()
+                future.result()
+                if on_batch:
+                    on_batch(size)
+
+            for batch in batches:
+                embedding.append((len(batch), embed_pool.submit(self._embed_batch, batch)))
+                if len(embedding) >= embed_concurrency:
+                    break
+            while embedding:
+                size, future = embedding.popleft()
+                vectors = future.result()
+                batch = next(batches, None)
+                if batch is not None:
+                    embedding.append((len(batch), embed_pool.submit(self._embed_batch, batch)))
+                if len(upserting) >= upsert_concurrency:
+                    finish_upsert()
+                upserting.append((size, upsert_pool.submit(self.store.upsert, vectors, namespace=self.namespace)))
+            while upserting:
+                finish_upsert()
+        self.store.flush()
+
+    def delete(self, ids: List[str]):
+        self.store.delete(ids, namespace=self.namespace)
+        self.store.flush()
 
     def query(self, query_text: str, top_k: int = 5):
         if self.embedder:
             q_emb = self.embedder.embed_query(query_text)
         else:
             raise RuntimeError("No embedder configured for query")
-        res = self.index.query(vector=q_emb, top_k=top_k, include_metadata=True, namespace=self.namespace)
+        res = self.store.query(q_emb, top_k=top_k, namespace=self.namespace)
         return res
 
     def retrieve_by_ids(self, ids: List[str]):
         # fetch vectors by ids
-        res = self.index.fetch(ids=ids, namespace=self.namespace)
+        res = self.store.fetch(ids, namespace=self.namespace)
         return res
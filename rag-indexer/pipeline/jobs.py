@@ -0,0 +1,169 @@
+# rag-service/pipeline/jobs.py
+import asyncio
+import logging
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import INGEST_WORKERS, INGEST_QUEUE_SIZE, JOB_HISTORY
+from .loader import load_documents_from_file, chunk_documents
+
+logger = logging.getLogger(__name__)
+
+
+class IngestJob:
+    """One uploaded file on its way into the index."""
+
+    def __init__(self, filename: str, path: str, tmpdir: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.tmpdir = tmpdir
+        self.status = "queued"  # queued | loading | indexing | done | failed
+        self.error: Optional[str] = None
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.batches_done = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _indexed(self, n_chunks: int):
+        # called from the indexer's upsert threads
+        self.chunks_done += n_chunks
+        self.batches_done += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "chunks_total": self.chunks_total,
+            "chunks_done": self.chunks_done,
+            "batches_done": self.batches_done,
+            "progress": round(self.chunks_done / self.chunks_total, 3) if self.chunks_total else 0.0,
+            "queued_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_second": round(self.chunks_done / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+class IngestJobs:
+    """
+    Background ingestion for /upsert: a bounded queue drained by
+    `workers` tasks, each running one job's pipelined embed/upsert
+    (PineconeIndexer.upsert_documents) in a thread.
+
+    Jobs live in this process only; the newest `history` are kept for
+    /jobs/{id} once finished.
+    """
+
+    def __init__(self, indexer, doc_versions=None, workers: int = INGEST_WORKERS,
+                 queue_size: int = INGEST_QUEUE_SIZE, history: int = JOB_HISTORY):
+        self.indexer = indexer
+        self.doc_versions = doc_versions  # Redis client for docver:{id} invalidation
+        self.workers = workers
+        self.history = history
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._tasks = []
+        self.completed = 0
+        self.failed = 0
+        self.chunks_indexed = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, filename: str, path: str, tmpdir: str) -> IngestJob:
+        """Queue a saved upload. Raises asyncio.QueueFull when the backlog is full."""
+        job = IngestJob(filename, path, tmpdir)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def _trim(self):
+        finished = [j.id for j in self._jobs.values() if j.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestJob):
+        job.started_at = time.time()
+        try:
+            job.status = "loading"
+            docs = await load_documents_from_file(job.path)
+            chunks = chunk_documents(docs, job.filename)
+            job.chunks_total = len(chunks)
+            job.status = "indexing"
+            await asyncio.to_thread(self.indexer.upsert_documents, chunks, job._indexed)
+            await self._bump_version(job.filename)
+            job.status = "done"
+            self.completed += 1
+            self.chunks_indexed += job.chunks_done
+        except Exception as e:
+            if job.status == "indexing":
+                # a partial upsert changed the document's vectors too
+                await self._bump_version(job.filename)
+            job.status = "failed"
+            job.error = str(e)
+            self.failed += 1
+            logger.warning(f"Ingest job {job.id} ({job.filename}) failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            shutil.rmtree(job.tmpdir, ignore_errors=True)
+            self._trim()
+
+    async def _bump_version(self, document_id: str):
+        """Invalidate cached answers that cite this document; best effort."""
+        if self.doc_versions is None:
+            return
+        try:
+            await self.doc_versions.incr(f"docver:{document_id}")
+        except Exception as e:
+            logger.warning(f"docver:{document_id} not bumped: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "running": sum(1 for j in self._jobs.values() if j.status in ("loading", "indexing")),
+            "completed": self.completed,
+            "failed": self.failed,
+            "chunks_indexed": self.chunks_indexed,
+        }
+
+    async def close(self):
+        """
+        Stop the workers and wait for them to unwind, then fail every job
+        that did not finish (queued or interrupted) and remove queued jobs'
+        upload tmpdirs; running jobs clean up their own in _run.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._queue.task_done()
+            shutil.rmtree(job.tmpdir, ignore_errors=True)
+        for job in self._jobs.values():
+            if job.status not in ("done", "failed"):
+                job.status = "failed"
+                job.error = "service shut down before the job finished"
+                job.finished_at = job.finished_at or time.time()
+                self.failed += 1
@@ -43,3 +43,23 @@ async def load_documents_from_file(path: str):
 
     docs = await asyncio.to_thread(loader.load)
     return docs
+
+
+def chunk_documents(docs, source_id: str, chunk_size: int = 1000):
+    """
+    Naive fixed-size chunking of loaded documents into PineconeIndexer.upsert_documents records.
+    Replace with your splitter strategy.
+    chunk_id runs 0..n-1 across all documents (e.g. PDF pages) of the file,
+    so vector ids are unique per file.
+    """
+    chunks = []
+    for d in docs:
+        text = getattr(d, "page_content", None) or getattr(d, "text", None) or str(d)
+        for i in range(0, len(text), chunk_size):
+            chunks.append({
+                "id": source_id,
+                "chunk_id": len(chunks),
+                "text": text[i:i+chunk_size],
+                "metadata": {"filename": source_id}
+            })
+    return chunks
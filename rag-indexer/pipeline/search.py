@@ -1,8 +1,9 @@
 # rag-service/pipeline/search.py
-from .index_build import PineconeIndexer
+from .index import PineconeIndexer
 from typing import List, Dict, Any
 from config import API_KEY
 
+# the service's one indexer; main.py writes through the same instance
 indexer = PineconeIndexer()
 
 async def pinecone_search(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
@@ -0,0 +1,306 @@
+# rag-service/pipeline/vector_store.py
+"""
+Vector storage behind PineconeIndexer, selected by VECTOR_STORE:
+  - "pinecone": the hosted Pinecone index (PINECONE_INDEX_NAME)
+  - "local":    FAISS indexes on disk under LOCAL_VECTOR_STORE_PATH, served from memory
+
+Both answer in Pinecone's response shapes, so callers do not care which
+one is configured:
+  query -> {"matches": [{"id", "score", "metadata"}]}
+  fetch -> {"vectors": {id: {"id", "values", "metadata"}}}
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import (
+    PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX_NAME, VECTOR_STORE, LOCAL_VECTOR_STORE_PATH,
+)
+
+try:
+    import pinecone
+except ImportError:
+    pinecone = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# (id, values, metadata), as Pinecone's upsert takes them
+Vector = Tuple[str, Sequence[float], Dict[str, Any]]
+
+# namespace names become directory names: same rule as embedding-service partitions
+_NAMESPACE_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+@contextmanager
+def _locked(directory: str, shared: bool = False):
+    """
+    Cross-process lock on a namespace directory: exclusive for the
+    reload -> apply -> save cycle of a flush, shared while reading the files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class VectorStore(ABC):
+    """Namespaced vectors with metadata; namespace None is the default namespace."""
+
+    @abstractmethod
+    def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def query(self, vector: Sequence[float], top_k: int = 5, namespace: Optional[str] = None,
+              include_metadata: bool = True) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        ...
+
+    def flush(self):
+        """Persist pending writes (no-op for remote stores)."""
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self, index_name: str = PINECONE_INDEX_NAME, dimension: Optional[Callable[[], int]] = None):
+        if pinecone is None:
+            raise RuntimeError("pinecone client not installed")
+        if not PINECONE_API_KEY:
+            raise RuntimeError("PINECONE_API_KEY not set")
+        pinecone.init(api_key=PINECONE_API_KEY, environment=PINECONE_ENV)
+        # create index if not exists
+        if index_name not in pinecone.list_indexes():
+            pinecone.create_index(index_name, dimension=dimension())
+        self.index = pinecone.Index(index_name)
+
+    @staticmethod
+    def _dict(res):
+        return res.to_dict() if hasattr(res, "to_dict") else res
+
+    def upsert(self, vectors, namespace=None):
+        self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k=5, namespace=None, include_metadata=True):
+        return self._dict(self.index.query(vector=vector, top_k=top_k,
+                                           include_metadata=include_metadata, namespace=namespace))
+
+    def fetch(self, ids, namespace=None):
+        return self._dict(self.index.fetch(ids=ids, namespace=namespace))
+
+    def delete(self, ids, namespace=None):
+        self.index.delete(ids=ids, namespace=namespace)
+
+
+class _Namespace:
+    """
+    One namespace in memory: a FAISS inner-product index over normalized
+    vectors (cosine score, Pinecone's default metric) keyed by int64 ids,
+    plus the string id <-> int id maps and metadata.
+
+    Writes are applied in memory right away and also kept in `pending`, so
+    flush() can replay them on top of whatever another process saved since.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.faiss")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.index = None
+        self.ids: Dict[str, int] = {}
+        self.keys: Dict[int, str] = {}
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self.next_id = 0
+        self.mtime = 0.0
+        self.dirty = False
+        self.pending: List[Tuple[str, Any]] = []  # ("upsert", (keys, vecs, metadata)) | ("delete", keys)
+
+    def upsert(self, keys: List[str], vecs: np.ndarray, metadata: List[Optional[Dict[str, Any]]]):
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vecs.shape[1]))
+        existing = [self.ids[key] for key in keys if key in self.ids]
+        if existing:
+            self.index.remove_ids(np.asarray(existing, dtype=np.int64))
+        int_ids = []
+        for key, meta in zip(keys, metadata):
+            i = self.ids.get(key)
+            if i is None:
+                i = self.ids[key] = self.next_id
+                self.keys[i] = key
+                self.next_id += 1
+            self.metadata[i] = meta or {}
+            int_ids.append(i)
+        self.index.add_with_ids(vecs, np.asarray(int_ids, dtype=np.int64))
+
+    def delete(self, keys: List[str]) -> bool:
+        gone = [self.ids.pop(key) for key in keys if key in self.ids]
+        if not gone:
+            return False
+        self.index.remove_ids(np.asarray(gone, dtype=np.int64))
+        for i in gone:
+            self.keys.pop(i, None)
+            self.metadata.pop(i, None)
+        return True
+
+    def write_back(self):
+        """
+        Save pending writes under the namespace lock, first reloading the
+        files if another process saved since, so its vectors are kept.
+        """
+        with _locked(self.directory):
+            try:
+                changed = os.path.getmtime(self.index_path) != self.mtime
+            except OSError:
+                changed = False  # nothing on disk yet
+            if changed:
+                self.load()
+                for op, args in self.pending:
+                    if op == "upsert":
+                        self.upsert(*args)
+                    else:
+                        self.delete(args)
+            self.save()
+        self.pending.clear()
+
+    def load(self):
+        self.mtime = os.path.getmtime(self.index_path)
+        self.index = faiss.read_index(self.index_path)
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.keys = {i: key for key, i in self.ids.items()}
+        self.metadata = {int(i): m for i, m in meta["metadata"].items()}
+        self.next_id = meta["next_id"]
+        self.dirty = False
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        # metadata first: readers reload when the FAISS file changes
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump({"next_id": self.next_id, "ids": self.ids, "metadata": self.metadata}, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        faiss.write_index(self.index, self.index_path + ".tmp")
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.mtime = os.path.getmtime(self.index_path)
+        self.dirty = False
+
+
+class LocalVectorStore(VectorStore):
+    """
+    FAISS-on-disk store: each namespace is a directory under `root` with a
+    flat inner-product index and a JSON metadata file, loaded on first use
+    and reloaded when another process (e.g. the reindex script) rewrites it.
+    Writes stay in memory until flush(), which merges them into the files
+    under a per-namespace file lock, so concurrent writers do not lose each
+    other's vectors.
+    """
+
+    def __init__(self, root: str = LOCAL_VECTOR_STORE_PATH):
+        if faiss is None:
+            raise RuntimeError("faiss not installed")
+        self.root = root
+        self._namespaces: Dict[Optional[str], _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: Optional[str]) -> _Namespace:
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            if namespace and not _NAMESPACE_RE.fullmatch(namespace):
+                raise ValueError(f"Invalid namespace: {namespace!r}")
+            # "_default" cannot collide: valid names start with a letter or digit
+            name = namespace or "_default"
+            ns = self._namespaces[namespace] = _Namespace(os.path.join(self.root, name))
+        try:
+            if not ns.dirty and os.path.getmtime(ns.index_path) != ns.mtime:
+                with _locked(ns.directory, shared=True):  # not mid-save
+                    ns.load()
+        except OSError:
+            pass  # nothing on disk yet
+        return ns
+
+    @staticmethod
+    def _normalized(values) -> np.ndarray:
+        vecs = np.asarray(values, dtype=np.float32).reshape(len(values), -1)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs / np.maximum(norms, 1e-12)
+
+    def upsert(self, vectors, namespace=None):
+        if not vectors:
+            return
+        vecs = self._normalized([v[1] for v in vectors])
+        args = ([v[0] for v in vectors], vecs, [v[2] for v in vectors])
+        with self._lock:
+            ns = self._namespace(namespace)
+            ns.upsert(*args)
+            ns.pending.append(("upsert", args))
+            ns.dirty = True
+
+    def query(self, vector, top_k=5, namespace=None, include_metadata=True):
+        q = self._normalized([vector])
+        with self._lock:
+            ns = self._namespace(namespace)
+            if ns.index is None or not ns.index.ntotal:
+                return {"matches": [], "namespace": namespace or ""}
+            scores, int_ids = ns.index.search(q, min(top_k, ns.index.ntotal))
+            matches = []
+            for score, i in zip(scores[0], int_ids[0]):
+                if i < 0:
+                    continue
+                match = {"id": ns.keys[int(i)], "score": float(score)}
+                if include_metadata:
+                    match["metadata"] = ns.metadata.get(int(i), {})
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace=None):
+        with self._lock:
+            ns = self._namespace(namespace)
+            vectors = {}
+            for key in ids:
+                i = ns.ids.get(key)
+                if i is None:
+                    continue
+                vectors[key] = {"id": key, "values": ns.index.reconstruct(i).tolist(),
+                                "metadata": ns.metadata.get(i, {})}
+        return {"vectors": vectors, "namespace": namespace or ""}
+
+    def delete(self, ids, namespace=None):
+        with self._lock:
+            ns = self._namespace(namespace)
+            ns.delete(ids)
+            # kept even for ids unknown here: another writer may have saved them
+            ns.pending.append(("delete", list(ids)))
+            ns.dirty = True
+
+    def flush(self):
+        with self._lock:
+            for ns in self._namespaces.values():
+                if ns.dirty:
+                    ns.write_back()
+
+
+def create_vector_store(dimension: Optional[Callable[[], int]] = None) -> VectorStore:
+    """The VECTOR_STORE backend; `dimension` is only called to create a new Pinecone index."""
+    if VECTOR_STORE == "local":
+        return LocalVectorStore()
+    if VECTOR_STORE == "pinecone":
+        return PineconeVectorStore(dimension=dimension)
+    raise ValueError(f"Unknown VECTOR_STORE: {VECTOR_STORE!r}")
@@ -0,0 +1,76 @@
+# rag-service/scripts/bench_vector_store.py
+"""
+Offline benchmark of the local vector store (VECTOR_STORE=local): upsert
+throughput, flush/load time, and query / fetch latency on random vectors,
+optionally against the configured Pinecone index with the same vectors.
+
+Run from rag-indexer/:
+    python -m scripts.bench_vector_store --vectors 50000 --dim 1536
+    python -m scripts.bench_vector_store --vectors 2000 --pinecone
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from pipeline.vector_store import LocalVectorStore, PineconeVectorStore
+
+
+def _timings(fn, n):
+    out = []
+    for i in range(n):
+        t = time.perf_counter()
+        fn(i)
+        out.append((time.perf_counter() - t) * 1000)
+    out.sort()
+    return out[len(out) // 2], out[int(len(out) * 0.99)]
+
+
+def _bench(name, store, vectors, queries, batch, namespace):
+    ids = [f"doc{i // 20}~{i % 20}" for i in range(len(vectors))]
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        store.upsert([(ids[j], vectors[j].tolist(), {"source_id": f"doc{j // 20}", "chunk_id": j % 20})
+                      for j in range(i, min(i + batch, len(vectors)))], namespace=namespace)
+    store.flush()
+    upsert_s = time.perf_counter() - start
+    q50, q99 = _timings(lambda i: store.query(queries[i].tolist(), top_k=5, namespace=namespace), len(queries))
+    f50, f99 = _timings(lambda i: store.fetch([ids[(i * 7919) % len(ids)]], namespace=namespace), len(queries))
+    print(f"{name:>9} {len(vectors) / upsert_s:>10.0f} {q50:>8.3f} {q99:>8.3f} {f50:>8.3f} {f99:>8.3f}")
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--pinecone", action="store_true", help="also run against PINECONE_INDEX_NAME")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.vectors, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    print(f"{args.vectors} vectors x {args.dim}, {args.queries} queries, top_k=5")
+    print(f"{'store':>9} {'upsert/s':>10} {'q p50':>8} {'q p99':>8} {'get p50':>8} {'get p99':>8}  (ms)")
+    root = tempfile.mkdtemp()
+    local = LocalVectorStore(root)
+    ids = _bench("local", local, vectors, queries, args.batch, "bench")
+
+    # cold start: a fresh process loading the namespace from disk
+    start = time.perf_counter()
+    fresh = LocalVectorStore(root)
+    res = fresh.query(queries[0].tolist(), top_k=5, namespace="bench")
+    print(f"load from disk + first query: {(time.perf_counter() - start) * 1000:.0f} ms")
+    assert res["matches"][0]["id"] == local.query(queries[0].tolist(), top_k=5, namespace="bench")["matches"][0]["id"]
+
+    if args.pinecone:
+        store = PineconeVectorStore(dimension=lambda: args.dim)
+        ids = _bench("pinecone", store, vectors, queries, args.batch, "bench")
+        store.delete(ids, namespace="bench")
+
+
+if __name__ == "__main__":
+    main()
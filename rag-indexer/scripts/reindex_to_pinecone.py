@@ -1,29 +1,153 @@
 # rag-service/scripts/reindex_to_pinecone.py
+"""
+Reindex a folder of documents into the configured vector store (VECTOR_STORE).
+
+Files are parsed and chunked in a process pool; embedding and upserts run
+as async tasks (PineconeIndexer.upsert_documents, pipelined) with up to
+--workers files in flight. A manifest next to the documents records each
+file's content hash and status, so a rerun skips unchanged files and
+resumes after a crash. Files that shrank have their leftover chunk ids
+deleted.
+
+Run from rag-indexer/:
+    python -m scripts.reindex_to_pinecone /data/uploads --workers 8
+    python -m scripts.reindex_to_pinecone /data/uploads --dry-run
+"""
+import argparse
 import asyncio
+import hashlib
+import json
 import os
-from pipeline.loader import load_documents_from_file
-from pipeline.index_build import PineconeIndexer
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import redis.asyncio as redis
+
+from config import PINECONE_INDEX_NAME, REDIS_URL, VECTOR_STORE, LOCAL_VECTOR_STORE_PATH
+from pipeline.loader import load_documents_from_file, chunk_documents
+
+MANIFEST_NAME = ".reindex_manifest.json"
+# manifest entries are only valid for the store they were written to
+STORE_NAME = f"local:{LOCAL_VECTOR_STORE_PATH}" if VECTOR_STORE == "local" else PINECONE_INDEX_NAME
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse(path: str, fname: str):
+    # process pool worker: load + chunk one file
+    docs = asyncio.run(load_documents_from_file(path))
+    return chunk_documents(docs, fname)
+
+
+class Manifest:
+    """
+    {fname: {"sha256", "status", "chunks", "error", "updated_at"}}, rewritten
+    atomically on every status change. Entries only count for the index
+    they were written against.
+    """
 
-async def reindex_folder(folder_path: str):
+    def __init__(self, path: str, index_name: str):
+        self.path = path
+        self.index_name = index_name
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("index") == index_name:
+                self.files = data.get("files", {})
+
+    def unchanged(self, fname: str, sha256: str) -> bool:
+        entry = self.files.get(fname)
+        return bool(entry) and entry["sha256"] == sha256 and entry["status"] == "done"
+
+    def update(self, fname: str, **fields):
+        entry = self.files.setdefault(fname, {"sha256": None, "status": "pending", "chunks": 0, "error": None})
+        entry.update(fields, updated_at=time.time())
+        self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"index": self.index_name, "files": self.files}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+async def reindex_folder(folder_path: str, workers: int = 4, dry_run: bool = False, manifest_path: str = None):
+    manifest = Manifest(manifest_path or os.path.join(folder_path, MANIFEST_NAME), STORE_NAME)
+    names = sorted(f for f in os.listdir(folder_path)
+                   if not f.startswith(".") and os.path.isfile(os.path.join(folder_path, f)))
+    start = time.perf_counter()
+    hashes = await asyncio.gather(*[asyncio.to_thread(_file_hash, os.path.join(folder_path, f)) for f in names])
+    todo = [(f, h) for f, h in zip(names, hashes) if not manifest.unchanged(f, h)]
+    totals = {"scanned": len(names), "skipped": len(names) - len(todo), "indexed": 0, "failed": 0,
+              "chunks": 0, "bytes": sum(os.path.getsize(os.path.join(folder_path, f)) for f, _ in todo)}
+
+    if dry_run:
+        for fname, sha256 in todo:
+            entry = manifest.files.get(fname)
+            reason = "new" if not entry else ("changed" if entry["sha256"] != sha256 else entry["status"])
+            print(f"would index {fname} ({reason})")
+        print(f"dry run: {totals['scanned']} files, {len(todo)} to index "
+              f"({totals['bytes'] / 1e6:.1f} MB), {totals['skipped']} unchanged")
+        return totals
+
+    from pipeline.index import PineconeIndexer
     indexer = PineconeIndexer()
-    for fname in os.listdir(folder_path):
-        path = os.path.join(folder_path, fname)
-        docs = await load_documents_from_file(path)
-        chunks = []
-        for d in docs:
-            text = getattr(d, "page_content", None) or getattr(d, "text", None) or str(d)
-            chunk_size = 1000
-            for i in range(0, len(text), chunk_size):
-                chunks.append({
-                    "id": fname,
-                    "chunk_id": i // chunk_size,
-                    "text": text[i:i+chunk_size],
-                    "metadata": {"filename": fname}
-                })
-        indexer.upsert_documents(chunks)
-        print(f"Indexed {len(chunks)} chunks from {fname}")
+    doc_versions = redis.from_url(REDIS_URL)
+    slots = asyncio.Semaphore(workers)
+    loop = asyncio.get_running_loop()
+
+    async def reindex_file(pool, fname: str, sha256: str):
+        async with slots:
+            manifest.update(fname, status="indexing", error=None)
+            touched = False  # vectors upserted or deleted, even partially
+            try:
+                chunks = await loop.run_in_executor(pool, _parse, os.path.join(folder_path, fname), fname)
+                touched = True
+                await asyncio.to_thread(indexer.upsert_documents, chunks)
+                previous = manifest.files[fname].get("chunks") or 0
+                # chunk ids run 0..n-1 per file (chunk_documents), so ids past the new count are leftovers
+                if previous > len(chunks):
+                    stale = [indexer._make_id(fname, i) for i in range(len(chunks), previous)]
+                    await asyncio.to_thread(indexer.delete, stale)
+                manifest.update(fname, sha256=sha256, status="done", chunks=len(chunks))
+                totals["indexed"] += 1
+                totals["chunks"] += len(chunks)
+                print(f"Indexed {len(chunks)} chunks from {fname}")
+            except Exception as e:
+                manifest.update(fname, sha256=sha256, status="failed", error=str(e))
+                totals["failed"] += 1
+                print(f"❌ {fname}: {e}")
+            if touched:
+                try:
+                    # invalidate cached answers that cite this document
+                    await doc_versions.incr(f"docver:{fname}")
+                except Exception as e:
+                    print(f"⚠️ docver:{fname} not bumped: {e}")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        await asyncio.gather(*[reindex_file(pool, f, h) for f, h in todo])
+    await doc_versions.aclose()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{totals['scanned']} files: {totals['indexed']} indexed, {totals['skipped']} unchanged, "
+          f"{totals['failed']} failed; {totals['chunks']} chunks in {elapsed:.1f}s "
+          f"({totals['indexed'] / elapsed:.2f} files/s, {totals['chunks'] / elapsed:.1f} chunks/s, "
+          f"{totals['bytes'] / 1e6 / elapsed:.2f} MB/s)")
+    return totals
+
 
 if __name__ == "__main__":
-    import sys
-    folder = sys.argv[1] if len(sys.argv) > 1 else "/data/uploads"
-    asyncio.run(reindex_folder(folder))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", default="/data/uploads")
+    parser.add_argument("--workers", type=int, default=4, help="parse processes and files indexed at once")
+    parser.add_argument("--dry-run", action="store_true", help="list files that would be indexed, touch nothing")
+    parser.add_argument("--manifest", help=f"default: <folder>/{MANIFEST_NAME}")
+    args = parser.parse_args()
+    asyncio.run(reindex_folder(args.folder, workers=args.workers, dry_run=args.dry_run, manifest_path=args.manifest))
@@ -7,6 +7,7 @@ Drop-in replacement for direct Kafka publish if Temporal handles orchestration.
 """
 
 import asyncio
+from typing import Optional
 from temporalio.client import Client
 from workflows import IngestDocumentWorkflow, IngestRequest
 
@@ -19,6 +20,7 @@ async def trigger_ingestion(
     s3_key: str,
     source_type: str,
     uploaded_by: str,
+    namespace: Optional[str] = None,
 ) -> str:
     """
     Trigger a durable IngestDocumentWorkflow for a newly uploaded document.
@@ -31,6 +33,7 @@ async def trigger_ingestion(
         s3_key=s3_key,
         source_type=source_type,
         uploaded_by=uploaded_by,
+        namespace=namespace,
     )
 
     # Workflow ID is deterministic — safe to retry on duplicate uploads
@@ -48,4 +51,4 @@ async def trigger_ingestion(
 
 
 # Example: call from upload-service FastAPI endpoint
-# run_id = asyncio.run(trigger_ingestion("doc-001", "uploads/guide.pdf", "guide", "admin"))
+# run_id = asyncio.run(trigger_ingestion("doc-001", "uploads/guide.pdf", "guide", "admin", "customer-a"))
@@ -2,7 +2,7 @@
 temporal-worker/workflows.py
 
 Durable ingestion pipeline using Temporal.
-Orchestrates: upload → chunk → embed (BioBERT) → FAISS index update
+Orchestrates: upload → chunk → embed (BioBERT) → FAISS + document + BM25 index update
 Each activity is retried independently on failure — no full reprocess needed.
 """
 
@@ -10,7 +10,7 @@ from datetime import timedelta
 from temporalio import activity, workflow
 from temporalio.common import RetryPolicy
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
 
 # ── Shared data types ────────────────────────────────────────────────────────
@@ -21,6 +21,7 @@ class IngestRequest:
     s3_key: str          # raw file location in S3
     source_type: str     # "guide" | "ticket" | "doc"
     uploaded_by: str
+    namespace: Optional[str] = None  # customer partition; None = global index
 
 
 @dataclass
@@ -92,13 +93,15 @@ async def chunk_document_activity(request: IngestRequest, raw_text: str) -> Chun
 async def embed_and_index_activity(
     chunk_result: ChunkResult,
     source_type: str,
+    namespace: Optional[str] = None,
 ) -> EmbedResult:
     """
-    Embed chunks with BioBERT and write vectors into FAISS.
+    Embed chunks with BioBERT and write vectors into the namespace's FAISS
+    partition; record the document-level vector and add the chunks to the
+    BM25 lexical index.
     Retried independently — partial FAISS writes are idempotent via doc_id prefix.
     """
     import numpy as np
-    import faiss
     import redis
     import json
     from transformers import AutoTokenizer, AutoModel
@@ -127,21 +130,25 @@ async def embed_and_index_activity(
 
     vectors = np.array(embeddings, dtype="float32")
 
-    # Write to FAISS
-    index_path = "/data/faiss_index/index.faiss"
-    try:
-        index = faiss.read_index(index_path)
-    except Exception:
-        index = faiss.IndexFlatL2(vectors.shape[1])
+    # Write to the namespace's partition: FAISS, raw vectors, chunk text by
+    # vector id, document index (two-stage retrieval) and BM25 index (hybrid
+    # retrieval), under the partition lock
+    from embedding_service.chunk_store import CHUNK_STORE_BACKEND
+    from embedding_service.partitions import INDEX_UPDATES_CHANNEL, write_documents
 
-    index.add(vectors)
-    faiss.write_index(index, index_path)
+    write_documents(namespace, [(chunk_result.document_id, vectors, chunk_result.chunks, source_type)])
 
-    # Store chunk metadata in Redis for retrieval lookup
+    # Store chunk metadata in Redis for retrieval lookup (Redis backend only)
     r = redis.Redis(host="redis", port=6379, decode_responses=True)
-    for i, chunk in enumerate(chunk_result.chunks):
-        key = f"chunk:{chunk_result.document_id}:{i}"
-        r.set(key, json.dumps({"text": chunk, "source_type": source_type}))
+    if CHUNK_STORE_BACKEND == "redis":
+        for i, chunk in enumerate(chunk_result.chunks):
+            key = f"chunk:{chunk_result.document_id}:{i}"
+            r.set(key, json.dumps({"text": chunk, "source_type": source_type}))
+
+    # Bump the document version so cached answers citing it are invalidated
+    r.incr(f"docver:{chunk_result.document_id}")
+    # Let in-process readers reload the partition before their next query
+    r.publish(INDEX_UPDATES_CHANNEL, json.dumps({"namespace": namespace, "document_id": chunk_result.document_id}))
 
     activity.logger.info(
         f"Indexed {len(embeddings)} vectors for document {chunk_result.document_id}"
@@ -215,7 +222,7 @@ class IngestDocumentWorkflow:
         # Step 3 — embed with BioBERT + write to FAISS
         embed_result = await workflow.execute_activity(
             embed_and_index_activity,
-            args=[chunk_result, request.source_type],
+            args=[chunk_result, request.source_type, request.namespace],
             **default_opts.__dict__,
         )
 
@@ -1,12 +1,18 @@
+import logging
+from typing import Optional
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from uuid import UUID
-from app.schemas import UploadResponse
-from app.storage import upload_file
+from app.schemas import UploadResponse, DedupStatsResponse
+from app.storage import upload_file, delete_file
 from app.producer import publish_document_uploaded
 from app.models import Document
+from app.dedup import FileTooLarge, hash_upload, find_canonical, requeue_failed, dedup_stats
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/v1/documents", tags=["documents"])
 
 def validate_file(file: UploadFile):
@@ -22,32 +28,88 @@ async def upload_document(
 ):
     validate_file(file)
 
-    data = await file.read()
-    size_mb = len(data) / (1024 * 1024)
-    if size_mb > settings.max_file_size_mb:
+    try:
+        content_hash, size_bytes, spool = await hash_upload(
+            file, max_bytes=settings.max_file_size_mb * 1024 * 1024
+        )
+    except FileTooLarge:
         raise HTTPException(status_code=413, detail="File too large")
 
-    storage_uri = upload_file(
-        file_obj=iter([data]),
-        content_type=file.content_type,
-    )
+    with spool:
+        canonical = find_canonical(db, namespace, content_hash)
+        if canonical is None:
+            storage_uri = upload_file(
+                file_obj=spool,
+                content_type=file.content_type,
+            )
+            doc = Document(
+                user_id=user_id,
+                namespace=namespace,
+                filename=file.filename,
+                content_type=file.content_type,
+                size_bytes=size_bytes,
+                storage_uri=storage_uri,
+                content_hash=content_hash,
+            )
+            db.add(doc)
+            try:
+                db.commit()
+            except IntegrityError:
+                # a concurrent upload of the same content became canonical first
+                db.rollback()
+                canonical = find_canonical(db, namespace, content_hash)
+                if canonical is None:
+                    raise
+                try:
+                    delete_file(storage_uri)
+                except Exception as e:
+                    logger.warning(f"Orphaned upload {storage_uri} not deleted: {e}")
+            else:
+                db.refresh(doc)
+                publish_document_uploaded({
+                    "document_id": str(doc.id),
+                    "namespace": namespace,
+                    "storage_uri": storage_uri,
+                    "content_hash": content_hash,
+                })
+                return UploadResponse(document_id=doc.id, status=doc.status)
 
+    # Duplicate: reference the existing document and its vectors, no new
+    # S3 object; an ingestion event only to retry a FAILED canonical
+    if canonical.status == "FAILED" and requeue_failed(db, canonical):
+        publish_document_uploaded({
+            "document_id": str(canonical.id),
+            "namespace": namespace,
+            "storage_uri": canonical.storage_uri,
+            "content_hash": content_hash,
+        })
     doc = Document(
         user_id=user_id,
         namespace=namespace,
         filename=file.filename,
         content_type=file.content_type,
-        size_bytes=len(data),
-        storage_uri=storage_uri,
+        size_bytes=size_bytes,
+        storage_uri=canonical.storage_uri,
+        status=canonical.status,
+        content_hash=content_hash,
+        canonical_id=canonical.id,
     )
     db.add(doc)
     db.commit()
     db.refresh(doc)
+    logger.info(
+        f"Deduplicated upload {doc.id} -> {canonical.id} (namespace={namespace})"
+    )
+    return UploadResponse(
+        document_id=doc.id,
+        status=doc.status,
+        deduplicated=True,
+        canonical_id=canonical.id,
+    )
 
-    publish_document_uploaded({
-        "document_id": str(doc.id),
-        "namespace": namespace,
-        "storage_uri": storage_uri,
-    })
-
-    return UploadResponse(document_id=doc.id, status=doc.status)
+@router.get("/dedup-stats", response_model=DedupStatsResponse)
+async def get_dedup_stats(
+    namespace: Optional[str] = None,
+    db: Session = Depends(),
+):
+    return DedupStatsResponse(**dedup_stats(db, namespace))
@@ -0,0 +1,102 @@
+import hashlib
+import tempfile
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.models import Document
+
+READ_CHUNK_BYTES = 1024 * 1024
+# keep small uploads in memory, spill larger ones to disk while hashing
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+async def hash_upload(file: UploadFile, max_bytes: int) -> Tuple[str, int, tempfile.SpooledTemporaryFile]:
+    """
+    Stream the upload once, computing its sha256 and size.
+    The bytes are spooled so they can still be sent to S3 for new documents.
+    Caller owns the returned file and must close it.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        while True:
+            block = await file.read(READ_CHUNK_BYTES)
+            if not block:
+                break
+            size += len(block)
+            if size > max_bytes:
+                raise FileTooLarge()
+            digest.update(block)
+            spool.write(block)
+    except Exception:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return digest.hexdigest(), size, spool
+
+
+def find_canonical(db: Session, namespace: str, content_hash: str) -> Optional[Document]:
+    """
+    Return the original document with the same content in this namespace.
+    There is at most one (unique index on canonical rows). A FAILED one is
+    returned too: the caller re-queues its ingestion instead of storing the
+    same bytes again.
+    """
+    return (
+        db.query(Document)
+        .filter(
+            Document.namespace == namespace,
+            Document.content_hash == content_hash,
+            Document.canonical_id.is_(None),
+        )
+        .first()
+    )
+
+
+def requeue_failed(db: Session, canonical: Document) -> bool:
+    """
+    Reset a FAILED canonical document (and its references) to UPLOADED so
+    its stored object is ingested again. True only for the caller that
+    flipped it, so concurrent re-uploads publish a single event.
+    """
+    requeued = (
+        db.query(Document)
+        .filter(Document.id == canonical.id, Document.status == "FAILED")
+        .update({"status": "UPLOADED"}, synchronize_session=False)
+    )
+    if requeued:
+        db.query(Document).filter(
+            or_(Document.id == canonical.id, Document.canonical_id == canonical.id)
+        ).update({"status": "UPLOADED"}, synchronize_session=False)
+    db.commit()
+    db.refresh(canonical)
+    return bool(requeued)
+
+
+def dedup_stats(db: Session, namespace: Optional[str] = None) -> dict:
+    """
+    Dedup ratio = uploads served by reference / all uploads.
+    Computed from the documents table so it is shared by every replica.
+    """
+    query = db.query(
+        func.count(Document.id),
+        func.count(Document.canonical_id),
+    )
+    if namespace:
+        query = query.filter(Document.namespace == namespace)
+    total, duplicates = query.one()
+    return {
+        "namespace": namespace,
+        "uploads": total,
+        "duplicates": duplicates,
+        "dedup_ratio": round(duplicates / total, 4) if total else 0.0,
+    }
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, BigInteger, TIMESTAMP
+from sqlalchemy import Column, String, BigInteger, TIMESTAMP, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
@@ -18,3 +18,22 @@ class Document(Base):
     storage_uri = Column(String, nullable=False)
     status = Column(String, default="UPLOADED")
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+    # sha256 of the raw upload, used to detect duplicates within a namespace
+    content_hash = Column(String(64), nullable=True)
+    # set when this row is a reference to an already-ingested document;
+    # the canonical document owns the stored object and the vectors
+    canonical_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_documents_namespace_content_hash", "namespace", "content_hash"),
+        # at most one canonical document per content in a namespace; reference
+        # rows repeat the hash. DDL: migrations/001_document_dedup.sql
+        Index(
+            "uq_documents_namespace_content_hash_canonical",
+            "namespace",
+            "content_hash",
+            unique=True,
+            postgresql_where=canonical_id.is_(None),
+        ),
+    )
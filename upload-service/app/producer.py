@@ -13,7 +13,8 @@ def publish_document_uploaded(payload: dict):
     document.uploaded event payload example:{
     "document_id": "uuid",
     "namespace": "customer-a",
-    "storage_uri": "s3://bucket/raw/uuid"
+    "storage_uri": "s3://bucket/raw/uuid",
+    "content_hash": "sha256 hex"
     }   
     '''
 
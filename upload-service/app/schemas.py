@@ -1,6 +1,15 @@
 from pydantic import BaseModel
+from typing import Optional
 from uuid import UUID
 
 class UploadResponse(BaseModel):
     document_id: UUID
     status: str
+    deduplicated: bool = False
+    canonical_id: Optional[UUID] = None
+
+class DedupStatsResponse(BaseModel):
+    namespace: Optional[str] = None
+    uploads: int
+    duplicates: int
+    dedup_ratio: float
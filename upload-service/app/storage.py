@@ -19,3 +19,7 @@ def upload_file(file_obj, content_type: str) -> str:
         ExtraArgs={"ContentType": content_type},
     )
     return f"s3://{settings.s3_bucket}/{key}"
+
+def delete_file(storage_uri: str):
+    bucket, _, key = storage_uri.removeprefix("s3://").partition("/")
+    s3.delete_object(Bucket=bucket, Key=key)
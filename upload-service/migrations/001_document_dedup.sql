@@ -0,0 +1,41 @@
+-- upload-service/migrations/001_document_dedup.sql
+-- Content-hash deduplication for documents (app/models.py, app/dedup.py).
+-- Idempotent; apply with:
+--   psql "$DATABASE_URL" -f migrations/001_document_dedup.sql
+
+BEGIN;
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS canonical_id UUID REFERENCES documents (id);
+
+CREATE INDEX IF NOT EXISTS ix_documents_namespace_content_hash
+    ON documents (namespace, content_hash);
+
+-- Rows that raced in before the unique index existed: keep one canonical per
+-- content (a non-failed one first, then the oldest) and turn the rest into
+-- references to it.
+UPDATE documents d
+SET canonical_id = c.id
+FROM (
+    SELECT DISTINCT ON (namespace, content_hash) id, namespace, content_hash
+    FROM documents
+    WHERE canonical_id IS NULL AND content_hash IS NOT NULL
+    ORDER BY namespace, content_hash, (status = 'FAILED'), created_at
+) c
+WHERE d.canonical_id IS NULL
+  AND d.namespace = c.namespace
+  AND d.content_hash = c.content_hash
+  AND d.id <> c.id;
+
+-- references to a row demoted above now point at its canonical
+UPDATE documents r
+SET canonical_id = d.canonical_id
+FROM documents d
+WHERE r.canonical_id = d.id AND d.canonical_id IS NOT NULL;
+
+-- One canonical document per content in a namespace; reference rows repeat the hash.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_documents_namespace_content_hash_canonical
+    ON documents (namespace, content_hash)
+    WHERE canonical_id IS NULL;
+
+COMMIT;